@@ -1008,6 +1008,14 @@ class CloudController(object):
                                                      sort_dir='asc')
             except exception.NotFound:
                 instances = []
+
+        # NOTE: map every image referenced by these instances in one query
+        image_uuids = set()
+        for instance in instances:
+            image_uuids.update([instance['image_ref'], instance['kernel_id'],
+                                instance['ramdisk_id']])
+        ec2utils.glance_ids_to_ids(context, image_uuids)
+
         for instance in instances:
             if not context.is_admin:
                 if instance['image_ref'] == str(FLAGS.vpn_image_id):
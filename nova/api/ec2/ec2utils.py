@@ -48,9 +48,33 @@ def image_type(image_type):
     return image_type
 
 
+# NOTE: s3_images rows are never changed once created, so the mapping
+# between glance ids and internal ids can be cached for the lifetime of
+# the process.
+_GLANCE_ID_TO_ID = {}
+_ID_TO_GLANCE_ID = {}
+
+
+def reset_cache():
+    """Forget all cached glance id mappings."""
+    _GLANCE_ID_TO_ID.clear()
+    _ID_TO_GLANCE_ID.clear()
+
+
+def _cache_s3_image(s3_image):
+    _GLANCE_ID_TO_ID[s3_image['uuid']] = s3_image['id']
+    _ID_TO_GLANCE_ID[s3_image['id']] = s3_image['uuid']
+
+
 def id_to_glance_id(context, image_id):
     """Convert an internal (db) id to a glance id."""
-    return db.s3_image_get(context, image_id)['uuid']
+    try:
+        return _ID_TO_GLANCE_ID[int(image_id)]
+    except (KeyError, TypeError, ValueError):
+        pass
+    s3_image = db.s3_image_get(context, image_id)
+    _cache_s3_image(s3_image)
+    return s3_image['uuid']
 
 
 def glance_id_to_id(context, glance_id):
@@ -58,9 +82,46 @@ def glance_id_to_id(context, glance_id):
     if glance_id is None:
         return
     try:
-        return db.s3_image_get_by_uuid(context, glance_id)['id']
+        return _GLANCE_ID_TO_ID[glance_id]
+    except KeyError:
+        pass
+    try:
+        s3_image = db.s3_image_get_by_uuid(context, glance_id)
     except exception.NotFound:
-        return db.s3_image_create(context, glance_id)['id']
+        s3_image = db.s3_image_create(context, glance_id)
+    _cache_s3_image(s3_image)
+    return s3_image['id']
+
+
+def glance_ids_to_ids(context, glance_ids):
+    """Convert several glance ids to internal (db) ids at once.
+
+    Ids that are not cached yet are looked up with a single query, and
+    mappings are created for any that do not exist.
+
+    :returns: a dict mapping each glance id to its internal id
+    """
+    result = {}
+    missing = set()
+    for glance_id in glance_ids:
+        if not glance_id:
+            continue
+        try:
+            result[glance_id] = _GLANCE_ID_TO_ID[glance_id]
+        except KeyError:
+            missing.add(glance_id)
+
+    if missing:
+        for s3_image in db.s3_image_get_by_uuids(context, list(missing)):
+            _cache_s3_image(s3_image)
+            result[s3_image['uuid']] = s3_image['id']
+            missing.discard(s3_image['uuid'])
+        for glance_id in missing:
+            s3_image = db.s3_image_create(context, glance_id)
+            _cache_s3_image(s3_image)
+            result[glance_id] = s3_image['id']
+
+    return result
 
 
 def ec2_id_to_glance_id(context, ec2_id):
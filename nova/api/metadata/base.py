@@ -84,6 +84,10 @@ class InstanceMetadata():
 
         self.ec2_ids = {}
 
+        ec2utils.glance_ids_to_ids(ctxt, [instance['image_ref'],
+                                          instance.get('kernel_id'),
+                                          instance.get('ramdisk_id')])
+
         self.ec2_ids['instance-id'] = ec2utils.id_to_ec2_inst_id(
                 instance['id'])
         self.ec2_ids['ami-id'] = ec2utils.glance_id_to_ec2_id(ctxt,
@@ -185,14 +185,24 @@ def limited(items, request, max_limit=FLAGS.osapi_max_limit):
     return items[offset:range_end]
 
 
-def limited_by_marker(items, request, max_limit=FLAGS.osapi_max_limit):
-    """Return a slice of items according to the requested marker and limit."""
+def get_limit_and_marker(request, max_limit=FLAGS.osapi_max_limit):
+    """Return the requested limit, capped at max_limit, and marker.
+
+    The marker is None if the request has none.
+    """
     params = get_pagination_params(request)
 
     limit = params.get('limit', max_limit)
     marker = params.get('marker')
 
     limit = min(max_limit, limit)
+    return limit, marker
+
+
+def limited_by_marker(items, request, max_limit=FLAGS.osapi_max_limit):
+    """Return a slice of items according to the requested marker and limit."""
+    limit, marker = get_limit_and_marker(request, max_limit)
+
     start_index = 0
     if marker:
         start_index = -1
@@ -467,10 +477,23 @@ class ViewBuilder(object):
                               collection_name,
                               id_key="uuid"):
         """Retrieve 'next' link, if applicable."""
+        return self._get_next_links(request,
+                                    len(items),
+                                    items[-1] if items else None,
+                                    collection_name,
+                                    id_key)
+
+    def _get_next_links(self,
+                        request,
+                        count,
+                        last_item,
+                        collection_name,
+                        id_key="uuid"):
+        """Retrieve 'next' link of a collection of count items ending
+        with last_item, if applicable."""
         links = []
         limit = int(request.params.get("limit", 0))
-        if limit and limit == len(items):
-            last_item = items[-1]
+        if limit and limit == count:
             if id_key in last_item:
                 last_item_id = last_item[id_key]
             elif 'id' in last_item:
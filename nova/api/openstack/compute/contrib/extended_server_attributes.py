@@ -35,17 +35,25 @@ class ExtendedServerAttributesController(wsgi.Controller):
                                                                  **kwargs)
         self.compute_api = compute.API()
 
-    def _get_hypervisor_hostname(self, context, instance):
-        compute_node = db.compute_node_get_by_host(context, instance["host"])
+    def _get_compute_nodes(self, req):
+        context = req.environ['nova.context']
+
+        def load_compute_nodes(hosts):
+            return db.compute_node_get_by_hosts(context, hosts)
+
+        return req.get_data_loader('compute_nodes', load_compute_nodes)
+
+    def _get_hypervisor_hostname(self, compute_nodes, instance):
+        compute_node = compute_nodes.get(instance["host"])
 
         try:
             return compute_node["hypervisor_hostname"]
         except TypeError:
             return
 
-    def _extend_server(self, context, server, instance):
+    def _extend_server(self, compute_nodes, server, instance):
         key = "%s:hypervisor_hostname" % Extended_server_attributes.alias
-        server[key] = self._get_hypervisor_hostname(context, instance)
+        server[key] = self._get_hypervisor_hostname(compute_nodes, instance)
 
         for attr in ['host', 'name']:
             if attr == 'name':
@@ -65,7 +73,8 @@ class ExtendedServerAttributesController(wsgi.Controller):
             db_instance = req.get_db_instance(server['id'])
             # server['id'] is guaranteed to be in the cache due to
             # the core API adding it in its 'show' method.
-            self._extend_server(context, server, db_instance)
+            self._extend_server(self._get_compute_nodes(req), server,
+                                db_instance)
 
     @wsgi.extends
     def detail(self, req, resp_obj):
@@ -75,11 +84,16 @@ class ExtendedServerAttributesController(wsgi.Controller):
             resp_obj.attach(xml=ExtendedServerAttributesTemplate())
 
             servers = list(resp_obj.obj['servers'])
-            for server in servers:
-                db_instance = req.get_db_instance(server['id'])
-                # server['id'] is guaranteed to be in the cache due to
-                # the core API adding it in its 'detail' method.
-                self._extend_server(context, server, db_instance)
+            # server['id'] is guaranteed to be in the cache due to
+            # the core API adding it in its 'detail' method.
+            db_instances = [req.get_db_instance(server['id'])
+                            for server in servers]
+
+            # Look up the compute nodes of every server in one go
+            compute_nodes = self._get_compute_nodes(req)
+            compute_nodes.want(instance['host'] for instance in db_instances)
+            for server, db_instance in zip(servers, db_instances):
+                self._extend_server(compute_nodes, server, db_instance)
 
 
 class Extended_server_attributes(extensions.ExtensionDescriptor):
@@ -18,10 +18,11 @@ Module dedicated functions/classes dealing with rate limiting requests.
 """
 
 import collections
-import copy
+import hashlib
 import httplib
 import math
 import re
+import socket
 import time
 import urlparse
 
@@ -31,12 +32,34 @@ import webob.exc
 from nova.api.openstack.compute.views import limits as limits_views
 from nova.api.openstack import wsgi
 from nova.api.openstack import xmlutil
+from nova import flags
+from nova.openstack.common import cfg
 from nova.openstack.common import importutils
 from nova.openstack.common import jsonutils
+from nova.openstack.common import log as logging
 from nova import quota
+from nova import utils
 from nova import wsgi as base_wsgi
 
 
+LOG = logging.getLogger(__name__)
+
+limits_opts = [
+    cfg.StrOpt('rate_limit_store',
+               default='nova.api.openstack.compute.limits.LocalLimitStore',
+               help='Class keeping the rate limit state of each user. '
+                    'LocalLimitStore keeps it in each API worker; '
+                    'nova.api.openstack.compute.limits.MemcachedLimitStore '
+                    'shares it between workers through memcached_servers'),
+    cfg.IntOpt('rate_limit_max_users',
+               default=10000,
+               help='Number of users LocalLimitStore keeps rate limit '
+                    'state for before forgetting the least recently seen'),
+    ]
+
+FLAGS = flags.FLAGS
+FLAGS.register_opts(limits_opts)
+
 QUOTAS = quota.QUOTAS
 
 
@@ -167,32 +190,49 @@ class Limit(object):
         if self.verb != verb or not re.match(self.regex, url):
             return
 
-        now = self._get_time()
+        state = (self.water_level, self.last_request, self.next_request,
+                 self.remaining)
+        delay, state = self.leak(state, self._get_time())
+        (self.water_level, self.last_request, self.next_request,
+         self.remaining) = state
+        return delay
+
+    def initial_state(self):
+        """Return the state of a limit no request has been made against."""
+        return (0, None, None, self.value)
 
-        if self.last_request is None:
-            self.last_request = now
+    def leak(self, state, now):
+        """
+        Record a request against a limit in the given state.
+
+        @param state: Tuple of water level, last request time, next request
+                      time and remaining requests
+        @param now: Time of the request
+        @return: Tuple of the delay (or None) and the new state
+        """
+        water_level, last_request, next_request, remaining = state
 
-        leak_value = now - self.last_request
+        if last_request is None:
+            last_request = now
 
-        self.water_level -= leak_value
-        self.water_level = max(self.water_level, 0)
-        self.water_level += self.request_value
+        leak_value = now - last_request
 
-        difference = self.water_level - self.capacity
+        water_level -= leak_value
+        water_level = max(water_level, 0)
+        water_level += self.request_value
 
-        self.last_request = now
+        difference = water_level - self.capacity
 
         if difference > 0:
-            self.water_level -= self.request_value
-            self.next_request = now + difference
-            return difference
+            water_level -= self.request_value
+            return difference, (water_level, now, now + difference,
+                                remaining)
 
         cap = self.capacity
-        water = self.water_level
         val = self.value
 
-        self.remaining = math.floor(((cap - water) / cap) * val)
-        self.next_request = now
+        remaining = math.floor(((cap - water_level) / cap) * val)
+        return None, (water_level, now, now, remaining)
 
     def _get_time(self):
         """Retrieve the current time. Broken out for testability."""
@@ -202,16 +242,20 @@ class Limit(object):
         """Display the string name of the unit."""
         return self.UNITS.get(self.unit, "UNKNOWN")
 
-    def display(self):
+    def display(self, state=None):
         """Return a useful representation of this class."""
+        if state is None:
+            remaining, next_request = self.remaining, self.next_request
+        else:
+            remaining, next_request = state[3], state[2]
         return {
             "verb": self.verb,
             "URI": self.uri,
             "regex": self.regex,
             "value": self.value,
-            "remaining": int(self.remaining),
+            "remaining": int(remaining),
             "unit": self.display_unit(),
-            "resetTime": int(self.next_request or self._get_time()),
+            "resetTime": int(next_request or self._get_time()),
         }
 
 # "Limit" format is a dictionary with the HTTP verb, human-readable URI,
@@ -288,6 +332,151 @@ class RateLimitingMiddleware(base_wsgi.Middleware):
         return self.application
 
 
+class LimitMatcher(object):
+    """
+    Finds the limits whose verb and regex match a request.
+
+    The regexes of the limits for each verb are combined into one pattern
+    made of an optional lookahead per limit.  A single match of it at the
+    start of the url then tells which of the limits match, rather than
+    matching every limit's regex in turn.  Regexes with groups or flags of
+    their own would interfere with the others, so those are matched on
+    their own.
+    """
+
+    def __init__(self, limits):
+        self._verbs = {}
+        indexes_by_verb = collections.defaultdict(list)
+        for index, limit in enumerate(limits):
+            indexes_by_verb[limit.verb].append(index)
+        for verb, indexes in indexes_by_verb.iteritems():
+            self._verbs[verb] = self._compile(limits, indexes)
+
+    @staticmethod
+    def _compile(limits, indexes):
+        combined = []
+        separate = []
+        for index in indexes:
+            regex = limits[index].regex
+            pattern = re.compile(regex)
+            if pattern.groups or '(?' in regex:
+                separate.append((index, pattern))
+            else:
+                combined.append((index, regex))
+        pattern = None
+        if combined:
+            pattern = re.compile(''.join('(?:(?=(%s)))?' % regex
+                                         for index, regex in combined))
+        return pattern, [index for index, regex in combined], separate
+
+    def match(self, verb, url):
+        """Return the indexes of the limits matching verb and url."""
+        try:
+            pattern, indexes, separate = self._verbs[verb]
+        except KeyError:
+            return []
+        matched = []
+        if pattern is not None:
+            groups = pattern.match(url).groups()
+            matched = [index for index, group in zip(indexes, groups)
+                       if group is not None]
+        for index, pattern in separate:
+            if pattern.match(url):
+                matched.append(index)
+        return matched
+
+
+class LocalLimitStore(object):
+    """
+    Keeps the limit state of each user in memory, for the most recently
+    seen rate_limit_max_users users.  Every API worker has its own.
+    """
+
+    def __init__(self):
+        self.max_users = FLAGS.rate_limit_max_users
+        # username -> (tick of the last update, state).  _updates holds a
+        # (tick, username) pair per update, oldest first; pairs whose tick
+        # is no longer the user's are skipped when evicting.
+        self._states = {}
+        self._updates = collections.deque()
+        self._tick = 0
+
+    def get(self, username):
+        entry = self._states.get(username)
+        if entry is None:
+            return None
+        return entry[1]
+
+    def update(self, username, func, ttl):
+        """
+        Replace the state of a user with func(state).
+
+        @param func: Function of the current state, or None, returning a
+                     tuple of a result and the new state
+        @param ttl: Seconds after which the state no longer matters
+        @return: The result of func
+        """
+        result, state = func(self.get(username))
+        self._tick += 1
+        self._states[username] = (self._tick, state)
+        self._updates.append((self._tick, username))
+
+        while len(self._states) > self.max_users:
+            tick, oldest = self._updates.popleft()
+            if self._is_current(tick, oldest):
+                del self._states[oldest]
+        if len(self._updates) > 2 * len(self._states):
+            self._updates = collections.deque(
+                    (tick, name) for tick, name in self._updates
+                    if self._is_current(tick, name))
+        return result
+
+    def _is_current(self, tick, username):
+        entry = self._states.get(username)
+        return entry is not None and entry[0] == tick
+
+
+class MemcachedLimitStore(object):
+    """
+    Keeps the limit state of each user in memcached_servers, shared by all
+    the API workers using them.  States are updated with check-and-set so
+    concurrent requests from one user are all counted.
+    """
+
+    # Attempts to update a state raced by other workers before giving up
+    cas_attempts = 10
+
+    def __init__(self):
+        if FLAGS.memcached_servers:
+            import memcache
+            self.mc = memcache.Client(FLAGS.memcached_servers, debug=0,
+                                      cache_cas=True)
+        else:
+            from nova.common import memorycache as memcache
+            self.mc = memcache.Client(FLAGS.memcached_servers, debug=0)
+
+    def _key(self, username):
+        username = utils.utf8(username)
+        return 'ratelimit-%s' % hashlib.md5(str(username)).hexdigest()
+
+    def get(self, username):
+        return self.mc.get(self._key(username))
+
+    def update(self, username, func, ttl):
+        key = self._key(username)
+        for attempt in xrange(self.cas_attempts):
+            state = self.mc.gets(key)
+            result, new_state = func(state)
+            if state is None:
+                stored = self.mc.add(key, new_state, time=ttl)
+            else:
+                stored = self.mc.cas(key, new_state, time=ttl)
+            if stored:
+                return result
+        LOG.warn(_("Gave up updating the rate limit state of %s"), username)
+        return result
+
+
 class Limiter(object):
     """
     Rate-limit checking class which handles limits in memory.
@@ -299,8 +488,8 @@ class Limiter(object):
 
         @param limits: List of `Limit` objects
         """
-        self.limits = copy.deepcopy(limits)
-        self.levels = collections.defaultdict(lambda: copy.deepcopy(limits))
+        self.limits = list(limits)
+        self.levels = {}
 
         # Pick up any per-user limit information
         for key, value in kwargs.items():
@@ -308,11 +497,29 @@ class Limiter(object):
                 username = key[5:]
                 self.levels[username] = self.parse_limits(value)
 
+        self._matchers = {None: LimitMatcher(self.limits)}
+        for username, user_limits in self.levels.iteritems():
+            self._matchers[username] = LimitMatcher(user_limits)
+        self._store = importutils.import_object(FLAGS.rate_limit_store)
+
+    def _get_limits_and_matcher(self, username):
+        if username in self.levels:
+            return self.levels[username], self._matchers[username]
+        return self.limits, self._matchers[None]
+
+    def _get_states(self, limits, states):
+        if states is None or len(states) != len(limits):
+            return [limit.initial_state() for limit in limits]
+        return list(states)
+
     def get_limits(self, username=None):
         """
         Return the limits for a given user.
         """
-        return [limit.display() for limit in self.levels[username]]
+        limits, _matcher = self._get_limits_and_matcher(username)
+        states = self._get_states(limits, self._store.get(username))
+        return [limit.display(state)
+                for limit, state in zip(limits, states)]
 
     def check_for_delay(self, verb, url, username=None):
         """
@@ -320,12 +527,24 @@ class Limiter(object):
 
         @return: Tuple of delay (in seconds) and error message (or None, None)
         """
-        delays = []
+        limits, matcher = self._get_limits_and_matcher(username)
+        matched = matcher.match(verb, url)
+        if not matched:
+            return None, None
 
-        for limit in self.levels[username]:
-            delay = limit(verb, url)
-            if delay:
-                delays.append((delay, limit.error_message))
+        def record_request(states):
+            states = self._get_states(limits, states)
+            delays = []
+            for index in matched:
+                limit = limits[index]
+                delay, states[index] = limit.leak(states[index],
+                                                  limit._get_time())
+                if delay:
+                    delays.append((delay, limit.error_message))
+            return delays, states
+
+        ttl = max(limit.capacity for limit in limits)
+        delays = self._store.update(username, record_request, ttl)
 
         if delays:
             delays.sort()
@@ -451,6 +670,9 @@ class WsgiLimiterProxy(object):
     Rate-limit requests based on answers from a remote source.
     """
 
+    # Number of idle connections to the limiter kept for reuse
+    pool_size = 10
+
     def __init__(self, limiter_address):
         """
         Initialize the new `WsgiLimiterProxy`.
@@ -458,24 +680,51 @@ class WsgiLimiterProxy(object):
         @param limiter_address: IP/port combination of where to request limit
         """
         self.limiter_address = limiter_address
+        self._connections = []
+
+    def _post(self, path, body, headers):
+        """
+        POST to the limiter over a pooled connection, trying the next one
+        if a pooled connection turns out to have been closed.
+
+        @return: Tuple of the response and its body
+        """
+        try:
+            conn = self._connections.pop()
+            pooled = True
+        except IndexError:
+            conn = httplib.HTTPConnection(self.limiter_address)
+            pooled = False
+
+        try:
+            conn.request("POST", path, body, headers)
+            resp = conn.getresponse()
+            data = resp.read()
+        except (httplib.HTTPException, socket.error):
+            conn.close()
+            if not pooled:
+                raise
+            return self._post(path, body, headers)
+
+        if resp.will_close or len(self._connections) >= self.pool_size:
+            conn.close()
+        else:
+            self._connections.append(conn)
+        return resp, data
 
     def check_for_delay(self, verb, path, username=None):
         body = jsonutils.dumps({"verb": verb, "path": path})
         headers = {"Content-Type": "application/json"}
 
-        conn = httplib.HTTPConnection(self.limiter_address)
-
         if username:
-            conn.request("POST", "/%s" % (username), body, headers)
+            resp, data = self._post("/%s" % (username), body, headers)
         else:
-            conn.request("POST", "/", body, headers)
-
-        resp = conn.getresponse()
+            resp, data = self._post("/", body, headers)
 
-        if 200 >= resp.status < 300:
+        if 200 <= resp.status < 300:
             return None, None
 
-        return resp.getheader("X-Wait-Seconds"), resp.read() or None
+        return resp.getheader("X-Wait-Seconds"), data or None
 
     # Note: This method gets called before the class is instantiated,
     # so this must be either a static method or a class method.  It is
@@ -15,6 +15,7 @@
 #    under the License.
 
 import base64
+import itertools
 import os
 import socket
 from xml.dom import minidom
@@ -31,14 +32,28 @@ from nova import compute
 from nova.compute import instance_types
 from nova import exception
 from nova import flags
+from nova.openstack.common import cfg
 from nova.openstack.common import log as logging
 from nova.openstack.common.rpc import common as rpc_common
 from nova.openstack.common import timeutils
 from nova import utils
 
 
+servers_opts = [
+    cfg.IntOpt('osapi_server_list_batch_size',
+               default=0,
+               help='Number of servers read from the database and serialized '
+                    'at a time when listing servers, sending the response '
+                    'while it is produced. Errors after the first batch '
+                    'can only be logged, as the 200 status has been sent, '
+                    'and the connection is closed with the response '
+                    'incomplete. Set to 0 to build the whole response '
+                    'before sending it.'),
+    ]
+
 LOG = logging.getLogger(__name__)
 FLAGS = flags.FLAGS
+FLAGS.register_opts(servers_opts)
 
 
 class SecurityGroupsTemplateElement(xmlutil.TemplateElement):
@@ -395,14 +410,12 @@ class Controller(wsgi.Controller):
         return None
 
     def _add_instance_faults(self, ctxt, instances):
-        faults = self.compute_api.get_instance_faults(ctxt, instances)
+        faults = self.compute_api.get_latest_instance_faults(ctxt, instances)
         if faults is not None:
             for instance in instances:
-                faults_list = faults.get(instance['uuid'], [])
-                try:
-                    instance['fault'] = faults_list[0]
-                except IndexError:
-                    pass
+                fault = faults.get(instance['uuid'])
+                if fault is not None:
+                    instance['fault'] = fault
 
         return instances
 
@@ -456,10 +469,19 @@ class Controller(wsgi.Controller):
             else:
                 search_opts['user_id'] = context.user_id
 
-        instance_list = self.compute_api.get_all(context,
-                                                 search_opts=search_opts)
+        if FLAGS.osapi_server_list_batch_size > 0:
+            return self._stream_servers(req, context, search_opts, is_detail)
+
+        limit, marker = common.get_limit_and_marker(req)
+        try:
+            limited_list = self.compute_api.get_all(context,
+                                                    search_opts=search_opts,
+                                                    limit=limit,
+                                                    marker=marker)
+        except exception.MarkerNotFound:
+            msg = _('marker [%s] not found') % marker
+            raise exc.HTTPBadRequest(explanation=msg)
 
-        limited_list = self._limit_items(instance_list, req)
         if is_detail:
             self._add_instance_faults(context, limited_list)
             response = self._view_builder.detail(req, limited_list)
@@ -468,6 +490,49 @@ class Controller(wsgi.Controller):
         req.cache_db_instances(limited_list)
         return response
 
+    def _stream_servers(self, req, context, search_opts, is_detail):
+        """Returns a list of servers that is sent a batch at a time."""
+        batches = self._get_instance_batches(req, context, search_opts,
+                                             is_detail)
+        if is_detail:
+            views = self._view_builder.detail_batches(req, batches)
+        else:
+            views = self._view_builder.index_batches(req, batches)
+
+        try:
+            # Produce the first batch here, so errors reading it are
+            # handled like they are for any other request
+            first = views.next()
+        except exception.MarkerNotFound:
+            msg = _('marker [%s] not found') % req.GET['marker']
+            raise exc.HTTPBadRequest(explanation=msg)
+
+        return wsgi.StreamingResponseObject('servers',
+                                            itertools.chain([first], views))
+
+    def _get_instance_batches(self, req, context, search_opts, is_detail):
+        """Reads the instances to list a batch at a time."""
+        limit, marker = common.get_limit_and_marker(req)
+        batch_size = FLAGS.osapi_server_list_batch_size
+
+        while True:
+            instances = self.compute_api.get_all(context,
+                                                 search_opts=search_opts,
+                                                 limit=min(batch_size, limit),
+                                                 marker=marker)
+            limit -= len(instances)
+
+            # Extensions only need the instances of the batch being sent
+            req.clear_db_instances()
+            req.cache_db_instances(instances)
+            if is_detail:
+                self._add_instance_faults(context, instances)
+            yield instances
+
+            if limit <= 0 or len(instances) < batch_size:
+                break
+            marker = instances[-1]['uuid']
+
     def _get_server(self, context, req, instance_uuid):
         """Utility function for looking up an instance by uuid."""
         try:
@@ -965,9 +1030,6 @@ class Controller(wsgi.Controller):
         self.compute_api.set_admin_password(context, server, password)
         return webob.Response(status_int=202)
 
-    def _limit_items(self, items, req):
-        return common.limited_by_marker(items, req)
-
     def _validate_metadata(self, metadata):
         """Ensure that we can work with the metadata given."""
         try:
@@ -126,6 +126,14 @@ class ViewBuilder(common.ViewBuilder):
         """Detailed view of a list of instance."""
         return self._list_view(self.show, request, instances)
 
+    def index_batches(self, request, batches):
+        """Show a list of servers without many details, a batch at a time."""
+        return self._list_view_batches(self.basic, request, batches)
+
+    def detail_batches(self, request, batches):
+        """Detailed view of a list of instances, a batch at a time."""
+        return self._list_view_batches(self.show, request, batches)
+
     def _list_view(self, func, request, servers):
         """Provide a view for a list of servers."""
         server_list = [func(request, server)["server"] for server in servers]
@@ -139,6 +147,29 @@ class ViewBuilder(common.ViewBuilder):
 
         return servers_dict
 
+    def _list_view_batches(self, func, request, batches):
+        """Provide views for a list of servers read in batches.
+
+        Yields a view of each batch of servers, followed by one with the
+        collection links, if there are any.
+        """
+        count = 0
+        last_server = None
+        for servers in batches:
+            if servers:
+                count += len(servers)
+                last_server = servers[-1]
+            server_list = [func(request, server)["server"]
+                           for server in servers]
+            yield dict(servers=server_list)
+
+        servers_links = self._get_next_links(request,
+                                             count,
+                                             last_server,
+                                             self._collection_name)
+        if servers_links:
+            yield dict(servers=[], servers_links=servers_links)
+
     @staticmethod
     def _get_metadata(instance):
         metadata = instance.get("metadata", [])
@@ -130,8 +130,19 @@ class SnapshotsController(object):
         """Returns a list of snapshots, transformed through entity_maker."""
         context = req.environ['nova.context']
 
-        snapshots = self.volume_api.get_all_snapshots(context)
-        limited_list = common.limited(snapshots, req)
+        if 'offset' in req.GET:
+            snapshots = self.volume_api.get_all_snapshots(context)
+            limited_list = common.limited(snapshots, req)
+        else:
+            # Let the database find the page, rather than reading all the
+            # snapshots to pick it out
+            limit, marker = common.get_limit_and_marker(req)
+            try:
+                limited_list = self.volume_api.get_all_snapshots(context,
+                        limit=limit, marker=marker)
+            except exception.MarkerNotFound:
+                msg = _('marker [%s] not found') % marker
+                raise exc.HTTPBadRequest(explanation=msg)
         res = [entity_maker(context, snapshot) for snapshot in limited_list]
         return {'snapshots': res}
 
@@ -198,8 +198,19 @@ class VolumeController(object):
         """Returns a list of volumes, transformed through entity_maker."""
         context = req.environ['nova.context']
 
-        volumes = self.volume_api.get_all(context)
-        limited_list = common.limited(volumes, req)
+        if 'offset' in req.GET:
+            volumes = self.volume_api.get_all(context)
+            limited_list = common.limited(volumes, req)
+        else:
+            # Let the database find the page, rather than reading all the
+            # volumes to pick it out
+            limit, marker = common.get_limit_and_marker(req)
+            try:
+                limited_list = self.volume_api.get_all(context,
+                        limit=limit, marker=marker)
+            except exception.MarkerNotFound:
+                msg = _('marker [%s] not found') % marker
+                raise exc.HTTPBadRequest(explanation=msg)
         res = [entity_maker(context, vol) for vol in limited_list]
         return {'volumes': res}
 
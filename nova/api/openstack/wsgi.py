@@ -61,12 +61,51 @@ _MEDIA_TYPE_MAP = {
 }
 
 
+class RequestDataLoader(object):
+    """Batches the lookups API extensions make for a single request.
+
+    Extensions declare the keys they are going to need with want(), for
+    instance the host of every server in a detail response, and then fetch
+    them one at a time with get().  The first get() loads every key wanted
+    so far with one call to load_func, which takes a list of keys and
+    returns a dict of the values found for them.  Keys with no value are
+    remembered as None so they are not looked up again.
+    """
+
+    def __init__(self, load_func):
+        self.load_func = load_func
+        self._wanted = set()
+        self._loaded = {}
+
+    def want(self, keys):
+        """Note keys to be loaded with the next batch."""
+        for key in keys:
+            if key is not None and key not in self._loaded:
+                self._wanted.add(key)
+
+    def get(self, key):
+        """Return the value for key, loading any wanted keys first."""
+        if key is None:
+            return None
+        if key not in self._loaded:
+            self._wanted.add(key)
+            self._load()
+        return self._loaded[key]
+
+    def _load(self):
+        keys = list(self._wanted)
+        self._wanted.clear()
+        values = self.load_func(keys)
+        for key in keys:
+            self._loaded[key] = values.get(key)
+
+
 class Request(webob.Request):
     """Add some OpenStack API-specific logic to the base webob.Request."""
 
     def __init__(self, *args, **kwargs):
         super(Request, self).__init__(*args, **kwargs)
-        self._extension_data = {'db_instances': {}}
+        self._extension_data = {'db_instances': {}, 'loaders': {}}
 
     def cache_db_instances(self, instances):
         """
@@ -110,6 +149,28 @@ class Request(webob.Request):
         """
         return self._extension_data['db_instances'].get(instance_uuid)
 
+    def clear_db_instances(self):
+        """
+        Allow API methods that build their response a batch of instances
+        at a time to drop the instances stored for the previous batch.
+        """
+        self._extension_data['db_instances'] = {}
+
+    def get_data_loader(self, name, load_func):
+        """
+        Allow API extensions to share batched lookups within the same
+        API request.
+
+        Returns the RequestDataLoader registered under name, creating it
+        with load_func the first time it is asked for.  Extensions that
+        need the same data should use the same name so it is only loaded
+        once per request.
+        """
+        loaders = self._extension_data['loaders']
+        if name not in loaders:
+            loaders[name] = RequestDataLoader(load_func)
+        return loaders[name]
+
     def best_match_content_type(self):
         """Determine the requested response content-type."""
         if 'nova.best_content_type' not in self.environ:
@@ -292,9 +353,30 @@ class DictSerializer(ActionDispatcher):
 class JSONDictSerializer(DictSerializer):
     """Default JSON request body serialization"""
 
+    # Joins the items returned by serialize_parts()
+    item_separator = ', '
+
     def default(self, data):
         return jsonutils.dumps(data)
 
+    def serialize_parts(self, data, key):
+        """Serialize data in parts.
+
+        Returns the serialized JSON split in three: the start of the
+        document up to the opening bracket of the list under key, a list
+        of the serialized items of that list, and the rest of the
+        document.  This allows the items serialized from several dicts,
+        for instance batches of a long list, to be joined into a single
+        document.
+        """
+        data = data.copy()
+        items = [jsonutils.dumps(item) for item in data.pop(key)]
+        head = '{%s: [' % jsonutils.dumps(key)
+        tail = ']%s}' % ''.join(', %s: %s' % (jsonutils.dumps(k),
+                                              jsonutils.dumps(v))
+                                for k, v in data.iteritems())
+        return head, items, tail
+
 
 class XMLDictSerializer(DictSerializer):
 
@@ -580,6 +662,115 @@ class ResponseObject(object):
         return self._headers.copy()
 
 
+class StreamingResponseObject(ResponseObject):
+    """Bundles a list response produced in batches with serializers.
+
+    Rather than a response dict, app methods pass an iterable of them,
+    each holding one batch of the list under key.  Anything else in the
+    response, such as collection links, is taken from the last one.
+    Each batch goes through the post-processing extensions as a response
+    object of its own and is serialized and sent to the client before the
+    next batch is produced, so the full response is never held in memory.
+    """
+
+    def __init__(self, key, batches, code=None, headers=None, **serializers):
+        super(StreamingResponseObject, self).__init__(None, code, headers,
+                                                      **serializers)
+        self.key = key
+        self.batches = batches
+
+    def can_stream(self):
+        """Return whether the serializer can serialize in batches."""
+
+        return hasattr(self.serializer, 'serialize_parts')
+
+    def collect(self):
+        """Gather all the batches into a response dict.
+
+        For serializers that cannot serialize a batch at a time, this turns
+        the response into a regular one.
+        """
+
+        obj = {self.key: []}
+        for batch in self.batches:
+            items = batch.pop(self.key)
+            obj.update(batch)
+            obj[self.key].extend(items)
+        self.obj = obj
+        self.batches = None
+
+    def serialize(self, request, content_type, default_serializers=None,
+                  extend=None):
+        """Serializes the batches of the response as they are produced.
+
+        Returns a webob.Response object whose body is produced while it is
+        sent.  extend is called with the response object of each batch to
+        run the post-processing extensions; if it returns a response for
+        the first batch, that response is returned instead.  Afterwards it
+        is too late for that, so the response is cut short, as it is if
+        producing a later batch raises an exception.
+        """
+
+        if self.batches is None:
+            return super(StreamingResponseObject, self).serialize(
+                    request, content_type, default_serializers)
+
+        def serialize_batch(batch):
+            resp_obj = ResponseObject(batch, **self.serializers)
+            resp_obj.preserialize(content_type, default_serializers)
+            if extend:
+                response = extend(resp_obj)
+                if response:
+                    return response, None
+            parts = resp_obj.serializer.serialize_parts(resp_obj.obj,
+                                                        self.key)
+            return None, parts
+
+        # Produce the first batch now, so errors can still be returned
+        batches = iter(self.batches)
+        response, parts = serialize_batch(batches.next())
+        if response:
+            return response
+
+        separator = self.serializer.item_separator
+
+        def body(parts):
+            head, items, tail = parts
+            yield head
+            sep = ''
+            while True:
+                for item in items:
+                    yield sep + item
+                    sep = separator
+
+                try:
+                    batch = batches.next()
+                    response, parts = serialize_batch(batch)
+                except StopIteration:
+                    break
+                except Exception:
+                    # The status and the batches sent so far cannot be
+                    # taken back.  Raising drops the connection rather than
+                    # ending the body as if it were complete.
+                    LOG.exception(_("%s response cut short, producing a "
+                                    "batch failed"), request.url)
+                    raise
+                if response:
+                    LOG.error(_("%(url)s response cut short, an extension "
+                                "returned %(response)s"),
+                              {'url': request.url, 'response': response})
+                    return
+                _head, items, tail = parts
+            yield tail
+
+        response = webob.Response(app_iter=body(parts))
+        response.status_int = self.code
+        for hdr, value in self._headers.items():
+            response.headers[hdr] = value
+        response.headers['Content-Type'] = content_type
+        return response
+
+
 def action_peek_json(body):
     """Determine action to invoke."""
 
@@ -924,9 +1115,23 @@ class Resource(wsgi.Application):
                     resp_obj._default_code = meth.wsgi_code
                 resp_obj.preserialize(accept, self.default_serializers)
 
+                if isinstance(resp_obj, StreamingResponseObject):
+                    post = list(post)
+                    # Generators only run their post-processing once
+                    if (not resp_obj.can_stream() or
+                        any(inspect.isgenerator(ext) for ext in post)):
+                        resp_obj.collect()
+                    else:
+                        response = resp_obj.serialize(
+                                request, accept, self.default_serializers,
+                                lambda batch: self.post_process_extensions(
+                                        post, batch, request, action_args))
+
                 # Process post-processing extensions
-                response = self.post_process_extensions(post, resp_obj,
-                                                        request, action_args)
+                if not response:
+                    response = self.post_process_extensions(post, resp_obj,
+                                                            request,
+                                                            action_args)
 
             if resp_obj and not response:
                 response = resp_obj.serialize(request, accept,
@@ -515,6 +515,9 @@ def SubTemplateElement(parent, tag, attrib=None, selector=None,
 class Template(object):
     """Represent a template."""
 
+    # Joins the children returned by serialize_parts()
+    item_separator = ''
+
     def __init__(self, root, nsmap=None):
         """Initialize a template.
 
@@ -592,6 +595,46 @@ class Template(object):
         # Serialize it into XML
         return etree.tostring(elem, *args, **kwargs)
 
+    def serialize_parts(self, obj, key):
+        """Serialize an object in parts.
+
+        Serializes an object against the template and returns the
+        serialized XML split in three: the document up to and including
+        the start tag of the root element, a list of the serialized
+        children of the root element, and the end tag of the root
+        element.  This allows the children serialized from several
+        objects, for instance batches of a long list under key, to be
+        joined into a single document.
+
+        :param obj: The object to serialize.
+        :param key: The key of the list in obj; all children of the root
+                    element are returned whether they come from the list
+                    or not.
+        """
+
+        elem = self.make_tree(obj)
+        if elem is None:
+            return '', [], ''
+
+        # Serialize the whole document, so the children are serialized
+        # exactly as serialize() would, without the namespace declarations
+        # of the root repeated in each, and split it where marker text was
+        # put before and after each child
+        while True:
+            marker = utils.gen_uuid().hex
+            elem.text = (elem.text or '') + marker
+            for child in elem:
+                child.tail = (child.tail or '') + marker
+            doc = etree.tostring(elem, **self.serialize_options)
+            parts = doc.split(marker)
+            if len(parts) == len(elem) + 2:
+                return parts[0], parts[1:-1], parts[-1]
+
+            # The data happened to contain the marker
+            elem.text = elem.text[:-len(marker)]
+            for child in elem:
+                child.tail = child.tail[:-len(marker)]
+
     def make_tree(self, obj):
         """Create a tree.
 
@@ -48,6 +48,16 @@ class Client(object):
         self.cache[key] = (timeout, value)
         return True
 
+    def gets(self, key):
+        """Retrieves the value for a key to check-and-set, or None."""
+        return self.get(key)
+
+    def cas(self, key, value, time=0, min_compress_len=0):
+        """Sets the value for a key.
+
+        Nothing else can have set it since gets() within one process."""
+        return self.set(key, value, time, min_compress_len)
+
     def add(self, key, value, time=0, min_compress_len=0):
         """Sets the value for a key if it doesn't exist."""
         if not self.get(key) is None:
@@ -1028,7 +1028,7 @@ class API(base.Base):
         return inst
 
     def get_all(self, context, search_opts=None, sort_key='created_at',
-                sort_dir='desc'):
+                sort_dir='desc', limit=None, marker=None):
         """Get all instances filtered by one of the given parameters.
 
         If there is no filter and the context is an admin, it will retrieve
@@ -1039,7 +1039,9 @@ class API(base.Base):
 
         The results will be returned sorted in the order specified by the
         'sort_dir' parameter using the key specified in the 'sort_key'
-        parameter.
+        parameter.  If 'limit' is given, no more than that many instances
+        are returned, starting after the instance whose uuid is 'marker',
+        if given.
         """
 
         #TODO(bcwaldon): determine the best argument for target here
@@ -1106,7 +1108,9 @@ class API(base.Base):
                         return []
 
         inst_models = self._get_instances_by_filters(context, filters,
-                                                     sort_key, sort_dir)
+                                                     sort_key, sort_dir,
+                                                     limit=limit,
+                                                     marker=marker)
 
         # Convert the models to dictionaries
         instances = []
@@ -1118,7 +1122,8 @@ class API(base.Base):
 
         return instances
 
-    def _get_instances_by_filters(self, context, filters, sort_key, sort_dir):
+    def _get_instances_by_filters(self, context, filters, sort_key, sort_dir,
+                                  limit=None, marker=None):
         if 'ip6' in filters or 'ip' in filters:
             res = self.network_api.get_instance_uuids_by_ip_filter(context,
                                                                    filters)
@@ -1128,7 +1133,8 @@ class API(base.Base):
             filters['uuid'] = uuids
 
         return self.db.instance_get_all_by_filters(context, filters, sort_key,
-                                                   sort_dir)
+                                                   sort_dir, limit=limit,
+                                                   marker=marker)
 
     @wrap_check_policy
     @check_instance_state(vm_state=[vm_states.ACTIVE, vm_states.STOPPED])
@@ -1699,6 +1705,19 @@ class API(base.Base):
         uuids = [instance['uuid'] for instance in instances]
         return self.db.instance_fault_get_by_instance_uuids(context, uuids)
 
+    def get_latest_instance_faults(self, context, instances):
+        """Get the latest fault of each of a list of instances."""
+
+        if not instances:
+            return {}
+
+        for instance in instances:
+            check_policy(context, 'get_instance_faults', instance)
+
+        uuids = [instance['uuid'] for instance in instances]
+        return self.db.instance_fault_get_latest_by_instance_uuids(context,
+                                                                   uuids)
+
     def get_instance_bdms(self, context, instance):
         """Get all bdm tables for specified instance."""
         return self.db.block_device_mapping_get_all_by_instance(context,
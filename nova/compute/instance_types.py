@@ -114,6 +114,20 @@ def get_all_types(inactive=False, filters=None):
 get_all_flavors = get_all_types
 
 
+def get_all_flavors_sorted_list(inactive=False, filters=None,
+                                sort_key='flavorid', sort_dir='asc',
+                                limit=None, marker=None):
+    """Get a list of non-deleted instance_types, sorted by sort_key.
+
+    If limit is given, at most limit instance_types are returned, starting
+    after the one whose flavorid is marker if it is given.
+    """
+    ctxt = context.get_admin_context()
+    return db.instance_type_get_all(ctxt, inactive=inactive, filters=filters,
+                                    sort_key=sort_key, sort_dir=sort_dir,
+                                    limit=limit, marker=marker)
+
+
 def get_default_instance_type():
     """Get the default instance type."""
     name = FLAGS.default_instance_type
@@ -142,6 +142,14 @@ compute_opts = [
     cfg.BoolOpt('instance_usage_audit',
                default=False,
                help="Generate periodic compute.instance.exists notifications"),
+    cfg.IntOpt('instance_fault_retention_count',
+               default=10,
+               help="Number of the most recent faults kept for each instance "
+                    "on this host; older faults are deleted periodically. "
+                    "Set to 0 to keep all faults."),
+    cfg.IntOpt('instance_fault_prune_interval',
+               default=3600,
+               help="Number of seconds between deleting old instance faults"),
     ]
 
 FLAGS = flags.FLAGS
@@ -244,6 +252,24 @@ def _get_image_meta(context, image_ref):
     return image_service.show(context, image_id)
 
 
+def _vm_state_matches_power_state(vm_state, vm_power_state):
+    """Return False if _sync_power_states would act on this combination."""
+    if vm_state == vm_states.ACTIVE:
+        return vm_power_state not in (power_state.NOSTATE,
+                                      power_state.SHUTDOWN,
+                                      power_state.CRASHED,
+                                      power_state.PAUSED,
+                                      power_state.SUSPENDED)
+    if vm_state == vm_states.STOPPED:
+        return vm_power_state in (power_state.NOSTATE,
+                                  power_state.SHUTDOWN,
+                                  power_state.CRASHED)
+    if vm_state in (vm_states.SOFT_DELETED, vm_states.DELETED):
+        return vm_power_state in (power_state.NOSTATE,
+                                  power_state.SHUTDOWN)
+    return True
+
+
 class ComputeManager(manager.SchedulerDependentManager):
     """Manages the running instances from creation to destruction."""
 
@@ -271,6 +297,7 @@ class ComputeManager(manager.SchedulerDependentManager):
         self._last_host_check = 0
         self._last_bw_usage_poll = 0
         self._last_info_cache_heal = 0
+        self._last_fault_prune = 0
         self.compute_api = compute.API()
         self.compute_rpcapi = compute_rpcapi.ComputeAPI()
         self.scheduler_rpcapi = scheduler_rpcapi.SchedulerAPI()
@@ -590,7 +617,8 @@ class ComputeManager(manager.SchedulerDependentManager):
             return
 
         filters = {'vm_state': vm_states.BUILDING}
-        building_insts = self.db.instance_get_all_by_filters(context, filters)
+        building_insts = self.db.instance_get_all_by_filters(context,
+                filters, columns_to_join=[])
 
         for instance in building_insts:
             if timeutils.is_older_than(instance['created_at'], timeout):
@@ -2443,13 +2471,13 @@ class ComputeManager(manager.SchedulerDependentManager):
                     # Instance is gone.  Try to grab another.
                     continue
             else:
-                # No more in our copy of uuids.  Pull from the DB.
+                # No more in our copy of uuids.  Pull them from the DB
+                # without joins; each instance is fully read in turn.
                 db_instances = self.db.instance_get_all_by_host(
-                        context, self.host)
+                        context, self.host, columns_to_join=[])
                 if not db_instances:
                     # None.. just return.
                     return
-                instance = db_instances.pop(0)
                 instance_uuids = [inst['uuid'] for inst in db_instances]
                 self._instance_uuids_to_heal = instance_uuids
 
@@ -2620,19 +2648,29 @@ class ComputeManager(manager.SchedulerDependentManager):
     def _sync_power_states(self, context):
         """Align power states between the database and the hypervisor.
 
-        To sync power state data we make a DB call to get the number of
-        virtual machines known by the hypervisor and if the number matches the
-        number of virtual machines known by the database, we proceed in a lazy
-        loop, one database record at a time, checking if the hypervisor has the
-        same power state as is in the database. We call eventlet.sleep(0) after
-        each loop to allow the periodic task eventlet to do other work.
+        To sync power state data we make a single DB call to get all the
+        instances on this host and, where the driver supports it, a single
+        call to get the power state of every virtual machine on the
+        hypervisor. Instances whose power state and vm_state already agree
+        with the hypervisor are skipped; only mismatches are re-read from
+        the database and resolved, one record at a time. We call
+        eventlet.sleep(0) after each loop to allow the periodic task
+        eventlet to do other work.
 
         If the instance is not found on the hypervisor, but is in the database,
         then a stop() API will be called on the instance.
         """
-        db_instances = self.db.instance_get_all_by_host(context, self.host)
+        # Only instance columns are compared here; mismatches are re-read
+        # in full below.
+        db_instances = self.db.instance_get_all_by_host(context, self.host,
+                                                        columns_to_join=[])
 
-        num_vm_instances = self.driver.get_num_instances()
+        try:
+            vm_infos = self.driver.get_info_all()
+            num_vm_instances = len(vm_infos)
+        except NotImplementedError:
+            vm_infos = None
+            num_vm_instances = self.driver.get_num_instances()
         num_db_instances = len(db_instances)
 
         if num_vm_instances != num_db_instances:
@@ -2648,12 +2686,23 @@ class ComputeManager(manager.SchedulerDependentManager):
                            "pending task. Skip."), instance=db_instance)
                 continue
             # No pending tasks. Now try to figure out the real vm_power_state.
-            try:
-                vm_instance = self.driver.get_info(db_instance)
-                vm_power_state = vm_instance['state']
-            except exception.InstanceNotFound:
-                vm_power_state = power_state.NOSTATE
-            # Note(maoy): the above get_info call might take a long time,
+            if vm_infos is not None:
+                vm_info = vm_infos.get(db_instance['name'])
+                if vm_info is not None:
+                    vm_power_state = vm_info['state']
+                else:
+                    vm_power_state = power_state.NOSTATE
+            else:
+                try:
+                    vm_instance = self.driver.get_info(db_instance)
+                    vm_power_state = vm_instance['state']
+                except exception.InstanceNotFound:
+                    vm_power_state = power_state.NOSTATE
+            if (vm_power_state == db_power_state and
+                _vm_state_matches_power_state(db_instance['vm_state'],
+                                              vm_power_state)):
+                continue
+            # Note(maoy): the above hypervisor query might take a long time,
             # for example, because of a broken libvirt driver.
             # We re-query the DB to get the latest instance info to minimize
             # (not eliminate) race condition.
@@ -2712,7 +2761,7 @@ class ComputeManager(manager.SchedulerDependentManager):
                         # Note(maoy): here we call the API instead of
                         # brutally updating the vm_state in the database
                         # to allow all the hooks and checks to be performed.
-                        self.compute_api.stop(context, db_instance)
+                        self.compute_api.stop(context, u)
                     except Exception:
                         # Note(maoy): there is no need to propergate the error
                         # because the same power_state will be retrieved next
@@ -2727,7 +2776,7 @@ class ComputeManager(manager.SchedulerDependentManager):
                                "unexpectedly. Calling "
                                "the stop API."), instance=db_instance)
                     try:
-                        self.compute_api.stop(context, db_instance)
+                        self.compute_api.stop(context, u)
                     except Exception:
                         LOG.exception(_("error during stop() in "
                                         "sync_power_state."),
@@ -2741,7 +2790,7 @@ class ComputeManager(manager.SchedulerDependentManager):
                     try:
                         # Note(maoy): this assumes that the stop API is
                         # idempotent.
-                        self.compute_api.stop(context, db_instance)
+                        self.compute_api.stop(context, u)
                     except Exception:
                         LOG.exception(_("error during stop() in "
                                         "sync_power_state."),
@@ -2774,6 +2823,31 @@ class ComputeManager(manager.SchedulerDependentManager):
                 LOG.info(_('Reclaiming deleted instance'), instance=instance)
                 self._delete_instance(context, instance)
 
+    @manager.periodic_task
+    def _prune_instance_faults(self, context):
+        """Delete all but the most recent faults of instances on this host.
+
+        Instances stuck failing the same operation can record thousands of
+        faults, and only the latest one is shown to users.
+        """
+        keep = FLAGS.instance_fault_retention_count
+        if keep <= 0:
+            return
+
+        curr_time = time.time()
+        if (curr_time - self._last_fault_prune <
+            FLAGS.instance_fault_prune_interval):
+            return
+        self._last_fault_prune = curr_time
+
+        instances = self.db.instance_get_all_by_host(context, self.host,
+                                                     columns_to_join=[])
+        uuids = [instance['uuid'] for instance in instances]
+        pruned = self.db.instance_fault_prune(context, uuids, keep)
+        if pruned:
+            LOG.info(_("Deleted %(pruned)d old faults of instances on "
+                       "this host"), locals())
+
     @manager.periodic_task
     def update_available_resource(self, context):
         """See driver.update_available_resource()
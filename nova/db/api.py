@@ -138,6 +138,17 @@ def service_get_all_by_topic(context, topic):
     return IMPL.service_get_all_by_topic(context, topic)
 
 
+def service_get_all_updated_since(context, since):
+    """Get all services, deleted ones included, changed since a time."""
+    return IMPL.service_get_all_updated_since(context, since)
+
+
+def service_get_all_added_or_removed_since(context, since):
+    """Get the services created or deleted since a time, and the disabled
+    services updated since then. Deleted services are included."""
+    return IMPL.service_get_all_added_or_removed_since(context, since)
+
+
 def service_get_all_by_host(context, host):
     """Get all services for a given host."""
     return IMPL.service_get_all_by_host(context, host)
@@ -185,6 +196,17 @@ def service_update(context, service_id, values):
     return IMPL.service_update(context, service_id, values)
 
 
+def service_heartbeat(context, service_id, values=None):
+    """Bump the report count of a service without reading it first.
+
+    Any values given are written along with the heartbeat.
+
+    Raises NotFound if service does not exist.
+
+    """
+    return IMPL.service_heartbeat(context, service_id, values)
+
+
 ###################
 
 
@@ -220,6 +242,11 @@ def compute_node_get_by_host(context, host):
     return IMPL.compute_node_get_by_host(context, host)
 
 
+def compute_node_get_by_hosts(context, hosts):
+    """Get the compute nodes of a list of hosts, keyed by host."""
+    return IMPL.compute_node_get_by_hosts(context, hosts)
+
+
 def compute_node_utilization_update(context, host, free_ram_mb_delta=0,
                           free_disk_gb_delta=0, work_delta=0, vm_delta=0):
     return IMPL.compute_node_utilization_update(context, host,
@@ -580,14 +607,20 @@ def instance_destroy(context, instance_uuid, constraint=None):
     return IMPL.instance_destroy(context, instance_uuid, constraint)
 
 
-def instance_get_by_uuid(context, uuid):
+# NOTE: the instance get functions take an optional columns_to_join, the
+# relationships of the instances to load along with them.  By default the
+# info cache, security groups, metadata and instance type are loaded;
+# callers that need less should say so, as each one is another join.
+def instance_get_by_uuid(context, uuid, columns_to_join=None):
     """Get an instance or raise if it does not exist."""
-    return IMPL.instance_get_by_uuid(context, uuid)
+    return IMPL.instance_get_by_uuid(context, uuid,
+                                     columns_to_join=columns_to_join)
 
 
-def instance_get(context, instance_id):
+def instance_get(context, instance_id, columns_to_join=None):
     """Get an instance or raise if it does not exist."""
-    return IMPL.instance_get(context, instance_id)
+    return IMPL.instance_get(context, instance_id,
+                             columns_to_join=columns_to_join)
 
 
 def instance_get_all(context, columns_to_join=None):
@@ -596,10 +629,17 @@ def instance_get_all(context, columns_to_join=None):
 
 
 def instance_get_all_by_filters(context, filters, sort_key='created_at',
-                                sort_dir='desc'):
-    """Get all instances that match all filters."""
+                                sort_dir='desc', limit=None, marker=None,
+                                columns_to_join=None):
+    """Get all instances that match all filters.
+
+    At most limit instances are returned if it is given, starting after
+    the instance whose uuid is marker, if it is given.
+    """
     return IMPL.instance_get_all_by_filters(context, filters, sort_key,
-                                            sort_dir)
+                                            sort_dir, limit=limit,
+                                            marker=marker,
+                                            columns_to_join=columns_to_join)
 
 
 def instance_get_active_by_window(context, begin, end=None, project_id=None,
@@ -624,24 +664,38 @@ def instance_get_active_by_window_joined(context, begin, end=None,
                                               project_id, host)
 
 
-def instance_get_all_by_project(context, project_id):
+def instance_get_all_by_project(context, project_id, columns_to_join=None):
     """Get all instances belonging to a project."""
-    return IMPL.instance_get_all_by_project(context, project_id)
+    return IMPL.instance_get_all_by_project(context, project_id,
+                                            columns_to_join=columns_to_join)
 
 
-def instance_get_all_by_host(context, host):
+def instance_get_all_by_host(context, host, columns_to_join=None):
     """Get all instances belonging to a host."""
-    return IMPL.instance_get_all_by_host(context, host)
+    return IMPL.instance_get_all_by_host(context, host,
+                                         columns_to_join=columns_to_join)
 
 
-def instance_get_all_by_host_and_not_type(context, host, type_id=None):
+def instance_get_all_by_host_and_not_type(context, host, type_id=None,
+                                          columns_to_join=None):
     """Get all instances belonging to a host with a different type_id."""
-    return IMPL.instance_get_all_by_host_and_not_type(context, host, type_id)
+    return IMPL.instance_get_all_by_host_and_not_type(
+            context, host, type_id, columns_to_join=columns_to_join)
 
 
-def instance_get_all_by_reservation(context, reservation_id):
+def instance_get_all_by_reservation(context, reservation_id,
+                                    columns_to_join=None):
     """Get all instances belonging to a reservation."""
-    return IMPL.instance_get_all_by_reservation(context, reservation_id)
+    return IMPL.instance_get_all_by_reservation(
+            context, reservation_id, columns_to_join=columns_to_join)
+
+
+def instance_get_hosts_by_uuids(context, uuids):
+    """Get a dict mapping each of the given instance uuids to its host.
+
+    Uuids of instances that do not exist are left out.
+    """
+    return IMPL.instance_get_hosts_by_uuids(context, uuids)
 
 
 def instance_get_floating_address(context, instance_id):
@@ -1158,9 +1212,11 @@ def volume_get(context, volume_id):
     return IMPL.volume_get(context, volume_id)
 
 
-def volume_get_all(context):
-    """Get all volumes."""
-    return IMPL.volume_get_all(context)
+def volume_get_all(context, sort_key='created_at', sort_dir='asc',
+                   limit=None, marker=None):
+    """Get all volumes, or a page of limit volumes after the marker id."""
+    return IMPL.volume_get_all(context, sort_key, sort_dir, limit=limit,
+                               marker=marker)
 
 
 def volume_get_all_by_host(context, host):
@@ -1173,9 +1229,12 @@ def volume_get_all_by_instance_uuid(context, instance_uuid):
     return IMPL.volume_get_all_by_instance_uuid(context, instance_uuid)
 
 
-def volume_get_all_by_project(context, project_id):
-    """Get all volumes belonging to a project."""
-    return IMPL.volume_get_all_by_project(context, project_id)
+def volume_get_all_by_project(context, project_id, sort_key='created_at',
+                              sort_dir='asc', limit=None, marker=None):
+    """Get all volumes belonging to a project, or a page of them."""
+    return IMPL.volume_get_all_by_project(context, project_id, sort_key,
+                                          sort_dir, limit=limit,
+                                          marker=marker)
 
 
 def volume_get_by_ec2_id(context, ec2_id):
@@ -1239,14 +1298,19 @@ def snapshot_get(context, snapshot_id):
     return IMPL.snapshot_get(context, snapshot_id)
 
 
-def snapshot_get_all(context):
-    """Get all snapshots."""
-    return IMPL.snapshot_get_all(context)
+def snapshot_get_all(context, sort_key='created_at', sort_dir='asc',
+                     limit=None, marker=None):
+    """Get all snapshots, or a page of limit snapshots after the marker id."""
+    return IMPL.snapshot_get_all(context, sort_key, sort_dir, limit=limit,
+                                 marker=marker)
 
 
-def snapshot_get_all_by_project(context, project_id):
-    """Get all snapshots belonging to a project."""
-    return IMPL.snapshot_get_all_by_project(context, project_id)
+def snapshot_get_all_by_project(context, project_id, sort_key='created_at',
+                                sort_dir='asc', limit=None, marker=None):
+    """Get all snapshots belonging to a project, or a page of them."""
+    return IMPL.snapshot_get_all_by_project(context, project_id, sort_key,
+                                            sort_dir, limit=limit,
+                                            marker=marker)
 
 
 def snapshot_get_all_for_volume(context, volume_id):
@@ -1494,10 +1558,14 @@ def instance_type_create(context, values):
     return IMPL.instance_type_create(context, values)
 
 
-def instance_type_get_all(context, inactive=False, filters=None):
-    """Get all instance types."""
+def instance_type_get_all(context, inactive=False, filters=None,
+                          sort_key='name', sort_dir='asc', limit=None,
+                          marker=None):
+    """Get all instance types, or a page of limit of them after the one
+    whose flavorid is marker."""
     return IMPL.instance_type_get_all(
-        context, inactive=inactive, filters=filters)
+        context, inactive=inactive, filters=filters, sort_key=sort_key,
+        sort_dir=sort_dir, limit=limit, marker=marker)
 
 
 def instance_type_get(context, id):
@@ -1716,6 +1784,11 @@ def s3_image_get_by_uuid(context, image_uuid):
     return IMPL.s3_image_get_by_uuid(context, image_uuid)
 
 
+def s3_image_get_by_uuids(context, image_uuids):
+    """Find local s3 images represented by any of the provided uuids"""
+    return IMPL.s3_image_get_by_uuids(context, image_uuids)
+
+
 def s3_image_create(context, image_uuid):
     """Create local s3 image represented by provided uuid"""
     return IMPL.s3_image_create(context, image_uuid)
@@ -1892,6 +1965,17 @@ def instance_fault_get_by_instance_uuids(context, instance_uuids):
     return IMPL.instance_fault_get_by_instance_uuids(context, instance_uuids)
 
 
+def instance_fault_get_latest_by_instance_uuids(context, instance_uuids):
+    """Get the latest fault of each of the provided instance_uuids."""
+    return IMPL.instance_fault_get_latest_by_instance_uuids(context,
+                                                            instance_uuids)
+
+
+def instance_fault_prune(context, instance_uuids, keep):
+    """Delete all but the latest keep faults of the provided instance_uuids."""
+    return IMPL.instance_fault_prune(context, instance_uuids, keep)
+
+
 ####################
 
 
@@ -1957,3 +2041,26 @@ def task_log_get(context, task_name, period_beginning,
                  period_ending, host, state=None, session=None):
     return IMPL.task_log_get(context, task_name, period_beginning,
                  period_ending, host, state, session)
+
+
+####################
+
+
+def archive_deleted_rows(context, max_rows, before=None):
+    """Move up to max_rows soft deleted rows from the tables to their
+    shadow tables, returning the number of rows moved by table name.
+
+    Only rows deleted before the datetime before are moved, if it is given.
+    """
+    return IMPL.archive_deleted_rows(context, max_rows, before)
+
+
+def archive_deleted_rows_for_table(context, tablename, max_rows,
+                                   before=None):
+    """Move up to max_rows soft deleted rows from a table to its shadow
+    table, returning the number of rows moved.
+
+    Only rows deleted before the datetime before are moved, if it is given.
+    """
+    return IMPL.archive_deleted_rows_for_table(context, tablename, max_rows,
+                                               before)
@@ -22,6 +22,7 @@
 import copy
 import datetime
 import functools
+import operator
 import re
 import warnings
 
@@ -29,6 +30,7 @@ from nova import block_device
 from nova.compute import vm_states
 from nova import db
 from nova.db.sqlalchemy import models
+from nova.db.sqlalchemy.session import get_engine
 from nova.db.sqlalchemy.session import get_session
 from nova import exception
 from nova import flags
@@ -37,14 +39,20 @@ from nova.openstack.common import timeutils
 from nova import utils
 from sqlalchemy import and_
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy import ForeignKeyConstraint
+from sqlalchemy import MetaData
 from sqlalchemy import or_
+from sqlalchemy.orm import contains_eager
 from sqlalchemy.orm import joinedload
 from sqlalchemy.orm import joinedload_all
 from sqlalchemy.sql.expression import asc
 from sqlalchemy.sql.expression import desc
+from sqlalchemy.sql.expression import exists
 from sqlalchemy.sql.expression import literal_column
 from sqlalchemy.sql.expression import or_
+from sqlalchemy.sql.expression import select
 from sqlalchemy.sql import func
+from sqlalchemy import Table
 
 FLAGS = flags.FLAGS
 flags.DECLARE('reserved_host_disk_mb', 'nova.scheduler.host_manager')
@@ -261,6 +269,65 @@ def exact_filter(query, model, filters, legal_keys):
     return query
 
 
+def paginate_query(query, model, limit, sort_key, sort_dir, marker=None):
+    """Returns a query for a page of rows.
+
+    The rows are ordered by sort_key and then by id, both in sort_dir, so
+    the order is the same from one query to the next.  Rather than using
+    an offset, the page is found with a condition on the sort key and id
+    of the marker row, so the database can seek straight to it using an
+    index on those columns.
+
+    :param query: query to paginate
+    :param model: model object the query applies to
+    :param limit: maximum number of rows to return, or None for all
+    :param sort_key: name of the column to sort by
+    :param sort_dir: 'asc' or 'desc'
+    :param marker: row the page starts after, or None for the first page
+    """
+
+    sort_fn = {'asc': asc, 'desc': desc}[sort_dir]
+    after = {'asc': operator.gt, 'desc': operator.lt}[sort_dir]
+
+    sort_column = getattr(model, sort_key)
+    query = query.order_by(sort_fn(sort_column))
+    if sort_key != 'id':
+        query = query.order_by(sort_fn(model.id))
+
+    if marker is not None:
+        criterion = after(model.id, marker['id'])
+        if sort_key != 'id':
+            criterion = or_(after(sort_column, marker[sort_key]),
+                            and_(sort_column == marker[sort_key], criterion))
+        query = query.filter(criterion)
+
+    if limit is not None:
+        query = query.limit(limit)
+
+    return query
+
+
+def _pagination_marker_get(context, model, column, value, session=None,
+                           project_only=False):
+    """Returns the row a page starts after, whose column is value.
+
+    Deleted rows are found too, so paging can carry on when the last row
+    of the previous page has since been deleted.  As values like flavorids
+    can be used again once their row is deleted, a row that is not deleted
+    is preferred, then the one deleted last.
+    """
+
+    marker = model_query(context, model, session=session, read_deleted="yes",
+                         project_only=project_only).\
+                     filter(getattr(model, column) == value).\
+                     order_by(asc(model.deleted)).\
+                     order_by(desc(model.deleted_at)).\
+                     first()
+    if not marker:
+        raise exception.MarkerNotFound(marker=value)
+    return marker
+
+
 ###################
 
 
@@ -351,6 +418,24 @@ def service_get_all_by_topic(context, topic):
                 all()
 
 
+@require_admin_context
+def service_get_all_updated_since(context, since):
+    return model_query(context, models.Service, read_deleted="yes").\
+                filter(or_(models.Service.updated_at >= since,
+                           models.Service.created_at >= since)).\
+                all()
+
+
+@require_admin_context
+def service_get_all_added_or_removed_since(context, since):
+    return model_query(context, models.Service, read_deleted="yes").\
+                filter(or_(models.Service.created_at >= since,
+                           models.Service.deleted_at >= since,
+                           and_(models.Service.disabled == True,
+                                models.Service.updated_at >= since))).\
+                all()
+
+
 @require_admin_context
 def service_get_by_host_and_topic(context, host, topic):
     return model_query(context, models.Service, read_deleted="no").\
@@ -469,6 +554,21 @@ def service_update(context, service_id, values):
         service_ref.save(session=session)
 
 
+@require_admin_context
+def service_heartbeat(context, service_id, values=None):
+    values = dict(values or {})
+    values['report_count'] = models.Service.report_count + 1
+    values['updated_at'] = timeutils.utcnow()
+    session = get_session()
+    with session.begin():
+        count = model_query(context, models.Service, session=session,
+                            read_deleted="no").\
+                        filter_by(id=service_id).\
+                        update(values, synchronize_session=False)
+    if not count:
+        raise exception.ServiceNotFound(service_id=service_id)
+
+
 ###################
 
 def compute_node_get(context, compute_id, session=None):
@@ -565,6 +665,21 @@ def compute_node_get_by_host(context, host):
         return node.first()
 
 
+def compute_node_get_by_hosts(context, hosts):
+    """Get the compute nodes of a list of hosts, keyed by host."""
+    if not hosts:
+        return {}
+
+    nodes = model_query(context, models.ComputeNode).\
+                    join(models.ComputeNode.service).\
+                    options(contains_eager(models.ComputeNode.service)).\
+                    filter(models.Service.host.in_(hosts)).\
+                    filter(models.Service.deleted == False).\
+                    all()
+
+    return dict((node.service.host, node) for node in nodes)
+
+
 def compute_node_utilization_update(context, host, free_ram_mb_delta=0,
                           free_disk_gb_delta=0, work_delta=0, vm_delta=0):
     """Update a specific ComputeNode entry by a series of deltas.
@@ -1466,8 +1581,9 @@ def instance_destroy(context, instance_uuid, constraint=None):
 
 
 @require_context
-def instance_get_by_uuid(context, uuid, session=None):
-    result = _build_instance_get(context, session=session).\
+def instance_get_by_uuid(context, uuid, session=None, columns_to_join=None):
+    result = _build_instance_get(context, session=session,
+                                 columns_to_join=columns_to_join).\
                 filter_by(uuid=uuid).\
                 first()
 
@@ -1478,8 +1594,9 @@ def instance_get_by_uuid(context, uuid, session=None):
 
 
 @require_context
-def instance_get(context, instance_id, session=None):
-    result = _build_instance_get(context, session=session).\
+def instance_get(context, instance_id, session=None, columns_to_join=None):
+    result = _build_instance_get(context, session=session,
+                                 columns_to_join=columns_to_join).\
                 filter_by(id=instance_id).\
                 first()
 
@@ -1490,13 +1607,27 @@ def instance_get(context, instance_id, session=None):
 
 
 @require_context
-def _build_instance_get(context, session=None):
-    return model_query(context, models.Instance, session=session,
-                        project_only=True).\
-            options(joinedload_all('security_groups.rules')).\
-            options(joinedload('info_cache')).\
-            options(joinedload('metadata')).\
-            options(joinedload('instance_type'))
+def _build_instance_get(context, session=None, columns_to_join=None):
+    if columns_to_join is None:
+        columns_to_join = ['security_groups.rules', 'info_cache',
+                           'metadata', 'instance_type']
+    query = model_query(context, models.Instance, session=session,
+                        project_only=True)
+    return _instance_join_columns(query, columns_to_join)
+
+
+def _instance_join_columns(query, columns_to_join):
+    """Eager load the relationships of the instances in columns_to_join.
+
+    Dotted names, like 'security_groups.rules', load the relationships of
+    the related rows as well.  Relationships that are not loaded here are
+    loaded when they are first used, if the session is still around, so
+    callers that do not use them should not ask for them: each one joins
+    another table in and multiplies the rows read.
+    """
+    for column in columns_to_join:
+        query = query.options(joinedload_all(column))
+    return query
 
 
 @require_admin_context
@@ -1505,16 +1636,21 @@ def instance_get_all(context, columns_to_join=None):
         columns_to_join = ['info_cache', 'security_groups',
                            'metadata', 'instance_type']
     query = model_query(context, models.Instance)
-    for column in columns_to_join:
-        query = query.options(joinedload(column))
-    return query.all()
+    return _instance_join_columns(query, columns_to_join).all()
 
 
 @require_context
-def instance_get_all_by_filters(context, filters, sort_key, sort_dir):
+def instance_get_all_by_filters(context, filters, sort_key, sort_dir,
+                                limit=None, marker=None,
+                                columns_to_join=None):
     """Return instances that match all filters.  Deleted instances
     will be returned by default, unless there's a filter that says
-    otherwise"""
+    otherwise.
+
+    If limit is given, no more than limit instances are returned.  If
+    marker is given, only the instances that come after the instance with
+    that uuid in the sort order are returned.
+    """
 
     def _regexp_filter_by_metadata(instance, meta):
         inst_metadata = [{node['key']: node['value']}
@@ -1538,15 +1674,36 @@ def instance_get_all_by_filters(context, filters, sort_key, sort_dir):
             return True
         return False
 
-    sort_fn = {'desc': desc, 'asc': asc}
+    def _regexp_filter(instances):
+        # Now filter on everything else for regexp matching..
+        # For filters not in the list, we'll attempt to use the filter_name
+        # as a column name in Instance..
+        regexp_filter_funcs = {}
+
+        for filter_name in filters.iterkeys():
+            filter_func = regexp_filter_funcs.get(filter_name, None)
+            filter_re = re.compile(str(filters[filter_name]))
+            if filter_func:
+                filter_l = lambda instance: filter_func(instance, filter_re)
+            elif filter_name == 'metadata':
+                filter_l = lambda instance: _regexp_filter_by_metadata(
+                        instance, filters[filter_name])
+            else:
+                filter_l = lambda instance: _regexp_filter_by_column(
+                        instance, filter_name, filter_re)
+            instances = filter(filter_l, instances)
+            if not instances:
+                break
+
+        return instances
+
+    if columns_to_join is None:
+        columns_to_join = ['info_cache', 'security_groups',
+                           'metadata', 'instance_type']
 
     session = get_session()
-    query_prefix = session.query(models.Instance).\
-            options(joinedload('info_cache')).\
-            options(joinedload('security_groups')).\
-            options(joinedload('metadata')).\
-            options(joinedload('instance_type')).\
-            order_by(sort_fn[sort_dir](getattr(models.Instance, sort_key)))
+    query_prefix = _instance_join_columns(session.query(models.Instance),
+                                          columns_to_join)
 
     # Make a copy of the filters dictionary to use going forward, as we'll
     # be modifying it and we shouldn't affect the caller's use of it.
@@ -1585,31 +1742,25 @@ def instance_get_all_by_filters(context, filters, sort_key, sort_dir):
     query_prefix = exact_filter(query_prefix, models.Instance,
                                 filters, exact_match_filter_names)
 
-    instances = query_prefix.all()
-    if not instances:
-        return []
-
-    # Now filter on everything else for regexp matching..
-    # For filters not in the list, we'll attempt to use the filter_name
-    # as a column name in Instance..
-    regexp_filter_funcs = {}
-
-    for filter_name in filters.iterkeys():
-        filter_func = regexp_filter_funcs.get(filter_name, None)
-        filter_re = re.compile(str(filters[filter_name]))
-        if filter_func:
-            filter_l = lambda instance: filter_func(instance, filter_re)
-        elif filter_name == 'metadata':
-            filter_l = lambda instance: _regexp_filter_by_metadata(instance,
-                    filters[filter_name])
-        else:
-            filter_l = lambda instance: _regexp_filter_by_column(instance,
-                    filter_name, filter_re)
-        instances = filter(filter_l, instances)
-        if not instances:
+    if marker is not None:
+        marker = _pagination_marker_get(context, models.Instance, 'uuid',
+                                        marker, session=session,
+                                        project_only=True)
+
+    # The regexp filters are applied to each page of instances read, so
+    # keep reading pages until there are enough instances that match
+    instances = []
+    while True:
+        query = paginate_query(query_prefix, models.Instance, limit,
+                               sort_key, sort_dir, marker=marker)
+        rows = query.all()
+        instances.extend(_regexp_filter(rows))
+
+        if limit is None or len(rows) < limit or len(instances) >= limit:
             break
+        marker = rows[-1]
 
-    return instances
+    return instances[:limit]
 
 
 @require_context
@@ -1655,40 +1806,62 @@ def instance_get_active_by_window_joined(context, begin, end=None,
 
 
 @require_admin_context
-def _instance_get_all_query(context, project_only=False):
-    return model_query(context, models.Instance, project_only=project_only).\
-                   options(joinedload('info_cache')).\
-                   options(joinedload('security_groups')).\
-                   options(joinedload('metadata')).\
-                   options(joinedload('instance_type'))
+def _instance_get_all_query(context, project_only=False,
+                            columns_to_join=None):
+    if columns_to_join is None:
+        columns_to_join = ['info_cache', 'security_groups',
+                           'metadata', 'instance_type']
+    query = model_query(context, models.Instance, project_only=project_only)
+    return _instance_join_columns(query, columns_to_join)
 
 
 @require_admin_context
-def instance_get_all_by_host(context, host):
-    return _instance_get_all_query(context).filter_by(host=host).all()
+def instance_get_all_by_host(context, host, columns_to_join=None):
+    return _instance_get_all_query(context,
+                                   columns_to_join=columns_to_join).\
+                   filter_by(host=host).\
+                   all()
 
 
 @require_admin_context
-def instance_get_all_by_host_and_not_type(context, host, type_id=None):
-    return _instance_get_all_query(context).filter_by(host=host).\
-                   filter(models.Instance.instance_type_id != type_id).all()
+def instance_get_all_by_host_and_not_type(context, host, type_id=None,
+                                          columns_to_join=None):
+    return _instance_get_all_query(context,
+                                   columns_to_join=columns_to_join).\
+                   filter_by(host=host).\
+                   filter(models.Instance.instance_type_id != type_id).\
+                   all()
 
 
 @require_context
-def instance_get_all_by_project(context, project_id):
+def instance_get_all_by_project(context, project_id, columns_to_join=None):
     authorize_project_context(context, project_id)
-    return _instance_get_all_query(context).\
+    return _instance_get_all_query(context,
+                                   columns_to_join=columns_to_join).\
                     filter_by(project_id=project_id).\
                     all()
 
 
 @require_context
-def instance_get_all_by_reservation(context, reservation_id):
-    return _instance_get_all_query(context, project_only=True).\
+def instance_get_all_by_reservation(context, reservation_id,
+                                    columns_to_join=None):
+    return _instance_get_all_query(context, project_only=True,
+                                   columns_to_join=columns_to_join).\
                     filter_by(reservation_id=reservation_id).\
                     all()
 
 
+@require_context
+def instance_get_hosts_by_uuids(context, uuids):
+    if not uuids:
+        return {}
+    result = model_query(context, models.Instance.uuid, models.Instance.host,
+                         project_only=True).\
+                    filter(models.Instance.uuid.in_(uuids)).\
+                    all()
+    return dict(result)
+
+
 # NOTE(jkoelker) This is only being left here for compat with floating
 #                ips. Currently the network_api doesn't return floaters
 #                in network_info. Once it starts return the model. This
@@ -3145,8 +3318,10 @@ def volume_get(context, volume_id, session=None):
 
 
 @require_admin_context
-def volume_get_all(context):
-    return _volume_get_query(context).all()
+def volume_get_all(context, sort_key='created_at', sort_dir='asc',
+                   limit=None, marker=None):
+    return _volume_get_page(context, _volume_get_query(context), sort_key,
+                            sort_dir, limit, marker)
 
 
 @require_admin_context
@@ -3169,9 +3344,20 @@ def volume_get_all_by_instance_uuid(context, instance_uuid):
 
 
 @require_context
-def volume_get_all_by_project(context, project_id):
+def volume_get_all_by_project(context, project_id, sort_key='created_at',
+                              sort_dir='asc', limit=None, marker=None):
     authorize_project_context(context, project_id)
-    return _volume_get_query(context).filter_by(project_id=project_id).all()
+    query = _volume_get_query(context).filter_by(project_id=project_id)
+    return _volume_get_page(context, query, sort_key, sort_dir, limit,
+                            marker)
+
+
+def _volume_get_page(context, query, sort_key, sort_dir, limit, marker):
+    if marker is not None:
+        marker = _pagination_marker_get(context, models.Volume, 'id', marker,
+                                        project_only=True)
+    return paginate_query(query, models.Volume, limit, sort_key, sort_dir,
+                          marker=marker).all()
 
 
 @require_admin_context
@@ -3396,8 +3582,11 @@ def snapshot_get(context, snapshot_id, session=None):
 
 
 @require_admin_context
-def snapshot_get_all(context):
-    return model_query(context, models.Snapshot).all()
+def snapshot_get_all(context, sort_key='created_at', sort_dir='asc',
+                     limit=None, marker=None):
+    query = model_query(context, models.Snapshot)
+    return _snapshot_get_page(context, query, sort_key, sort_dir, limit,
+                              marker)
 
 
 @require_context
@@ -3408,11 +3597,21 @@ def snapshot_get_all_for_volume(context, volume_id):
 
 
 @require_context
-def snapshot_get_all_by_project(context, project_id):
+def snapshot_get_all_by_project(context, project_id, sort_key='created_at',
+                                sort_dir='asc', limit=None, marker=None):
     authorize_project_context(context, project_id)
-    return model_query(context, models.Snapshot).\
-                   filter_by(project_id=project_id).\
-                   all()
+    query = model_query(context, models.Snapshot).\
+                   filter_by(project_id=project_id)
+    return _snapshot_get_page(context, query, sort_key, sort_dir, limit,
+                              marker)
+
+
+def _snapshot_get_page(context, query, sort_key, sort_dir, limit, marker):
+    if marker is not None:
+        marker = _pagination_marker_get(context, models.Snapshot, 'id',
+                                        marker, project_only=True)
+    return paginate_query(query, models.Snapshot, limit, sort_key, sort_dir,
+                          marker=marker).all()
 
 
 @require_context
@@ -4046,9 +4245,12 @@ def _instance_type_get_query(context, session=None, read_deleted=None):
 
 
 @require_context
-def instance_type_get_all(context, inactive=False, filters=None):
+def instance_type_get_all(context, inactive=False, filters=None,
+                          sort_key='name', sort_dir='asc', limit=None,
+                          marker=None):
     """
-    Returns all instance types.
+    Returns all instance types, or at most limit of them after the one
+    whose flavorid is marker.
     """
     filters = filters or {}
 
@@ -4072,7 +4274,13 @@ def instance_type_get_all(context, inactive=False, filters=None):
         query = query.filter(
                 models.InstanceTypes.disabled == filters['disabled'])
 
-    inst_types = query.order_by("name").all()
+    if marker is not None:
+        marker = _pagination_marker_get(context, models.InstanceTypes,
+                                        'flavorid', marker)
+
+    query = paginate_query(query, models.InstanceTypes, limit, sort_key,
+                           sort_dir, marker=marker)
+    inst_types = query.all()
 
     return [_dict_with_extra_specs(i) for i in inst_types]
 
@@ -4660,6 +4868,15 @@ def s3_image_get_by_uuid(context, image_uuid):
     return result
 
 
+def s3_image_get_by_uuids(context, image_uuids):
+    """Find local s3 images represented by any of the provided uuids"""
+    if not image_uuids:
+        return []
+    return model_query(context, models.S3Image, read_deleted="yes").\
+                 filter(models.S3Image.uuid.in_(image_uuids)).\
+                 all()
+
+
 def s3_image_create(context, image_uuid):
     """Create local s3 image represented by provided uuid"""
     try:
@@ -5139,6 +5356,71 @@ def instance_fault_get_by_instance_uuids(context, instance_uuids):
     return output
 
 
+def instance_fault_get_latest_by_instance_uuids(context, instance_uuids):
+    """Get the latest fault of each of the provided instance_uuids."""
+    if not instance_uuids:
+        return {}
+
+    session = get_session()
+    # Fault ids only ever go up, so the latest fault of an instance is
+    # the one with the highest id
+    latest = model_query(context, models.InstanceFault.instance_uuid,
+                         func.max(models.InstanceFault.id).label('id'),
+                         session=session, read_deleted='no').\
+                     filter(models.InstanceFault.instance_uuid.in_(
+                         instance_uuids)).\
+                     group_by(models.InstanceFault.instance_uuid).\
+                     subquery()
+    rows = model_query(context, models.InstanceFault,
+                       session=session, read_deleted='no').\
+                   join((latest, models.InstanceFault.id == latest.c.id)).\
+                   all()
+
+    return dict((row['instance_uuid'], dict(row.iteritems()))
+                for row in rows)
+
+
+def instance_fault_prune(context, instance_uuids, keep):
+    """Delete all but the latest keep faults of the provided instance_uuids.
+
+    Returns the number of faults deleted.
+    """
+    if not instance_uuids:
+        return 0
+
+    session = get_session()
+    with session.begin():
+        counts = model_query(context, models.InstanceFault.instance_uuid,
+                             func.count(models.InstanceFault.id),
+                             session=session, read_deleted='no').\
+                         filter(models.InstanceFault.instance_uuid.in_(
+                             instance_uuids)).\
+                         group_by(models.InstanceFault.instance_uuid).\
+                         having(func.count(models.InstanceFault.id) > keep).\
+                         all()
+
+        pruned = 0
+        for instance_uuid, _count in counts:
+            # The id of the newest fault that is not kept
+            newest = model_query(context, models.InstanceFault.id,
+                                 session=session, read_deleted='no').\
+                             filter_by(instance_uuid=instance_uuid).\
+                             order_by(desc(models.InstanceFault.id)).\
+                             offset(keep).\
+                             first()
+            pruned += model_query(context, models.InstanceFault,
+                                  session=session, read_deleted='no').\
+                              filter_by(instance_uuid=instance_uuid).\
+                              filter(models.InstanceFault.id <= newest[0]).\
+                              update({'deleted': True,
+                                      'deleted_at': timeutils.utcnow(),
+                                      'updated_at':
+                                            literal_column('updated_at')},
+                                     synchronize_session=False)
+
+    return pruned
+
+
 ##################
 
 
@@ -5270,3 +5552,156 @@ def task_log_end_task(context, task_name,
         task.errors = errors
         task.save(session=session)
     return task
+
+
+####################
+
+
+_SHADOW_TABLE_PREFIX = 'shadow_'
+
+
+# Columns referring to rows of other tables without a foreign key, by the
+# table and column they refer to.  Rows they refer to are not archived.
+_LOGICAL_REFERENCES = {
+    ('instance_types', 'id'): [('instances', 'instance_type_id'),
+                               ('migrations', 'old_instance_type_id'),
+                               ('migrations', 'new_instance_type_id')],
+    ('instances', 'uuid'): [('fixed_ips', 'instance_uuid'),
+                            ('virtual_interfaces', 'instance_uuid')],
+}
+
+
+def _referred_clauses(table):
+    """Return EXISTS clauses matching rows of table other rows refer to.
+
+    The foreign keys are those of the tables reflected in the metadata of
+    table, along with the columns in _LOGICAL_REFERENCES.
+    """
+    clauses = []
+    for (name, column), references in _LOGICAL_REFERENCES.items():
+        if name != table.name:
+            continue
+        for other_name, other_column in references:
+            other = table.metadata.tables.get(other_name)
+            if other is None:
+                continue
+            referrer = other.alias()
+            clauses.append(exists([literal_column('1')],
+                                  referrer.c[other_column] ==
+                                  table.c[column],
+                                  from_obj=[referrer]))
+
+    for other in table.metadata.tables.values():
+        for constraint in other.constraints:
+            if (not isinstance(constraint, ForeignKeyConstraint) or
+                not constraint.elements[0].references(table)):
+                continue
+            # An alias, so tables referring to themselves work too
+            referrer = other.alias()
+            clauses.append(exists([literal_column('1')],
+                                  and_(*[referrer.c[fkey.parent.name] ==
+                                         fkey.column
+                                         for fkey in constraint.elements]),
+                                  from_obj=[referrer]))
+    return clauses
+
+
+def _archive_deleted_rows_for_table(engine, table, shadow_table, max_rows,
+                                    before=None):
+    """Move up to max_rows soft deleted rows of table to shadow_table.
+
+    The rows are copied and deleted in a single transaction, so they are
+    either in one table or the other.  Returns the number of rows moved.
+    """
+    key = list(table.primary_key.columns)[0]
+    query = select([key]).\
+                where(table.c.deleted == True).\
+                order_by(key).\
+                limit(max_rows)
+    if before is not None:
+        query = query.where(table.c.deleted_at < before)
+    # Rows that other rows still refer to cannot be deleted yet, for
+    # instance a deleted instance whose faults have not been archived or
+    # a deleted flavor instances still use.  Skip them rather than have
+    # them fail every batch they are in or break the rows using them.
+    for referred in _referred_clauses(table):
+        query = query.where(~referred)
+
+    conn = engine.connect()
+    try:
+        with conn.begin():
+            keys = [row[0] for row in conn.execute(query)]
+            if not keys:
+                return 0
+            rows = conn.execute(table.select().where(key.in_(keys)))
+            conn.execute(shadow_table.insert(), [dict(row) for row in rows])
+            conn.execute(table.delete().where(key.in_(keys)))
+    except IntegrityError:
+        # Rows referring to some of these rows were added since they were
+        # selected.  Leave them for a later run.
+        LOG.warn(_("Not archiving deleted rows of %s, other rows still "
+                   "refer to them"), table.name)
+        return 0
+    finally:
+        conn.close()
+
+    return len(keys)
+
+
+def _get_archivable_tables(engine):
+    """Return (table, shadow_table) pairs of the tables to archive.
+
+    Tables come before the tables they refer to, so the rows referring to
+    a deleted row are archived first.
+    """
+    meta = MetaData(bind=engine)
+    meta.reflect()
+    tables = []
+    for table in reversed(meta.sorted_tables):
+        shadow_name = _SHADOW_TABLE_PREFIX + table.name
+        if (shadow_name in meta.tables and
+            len(table.primary_key.columns) == 1):
+            tables.append((table, meta.tables[shadow_name]))
+    return tables
+
+
+@require_admin_context
+def archive_deleted_rows_for_table(context, tablename, max_rows,
+                                   before=None):
+    """Move up to max_rows soft deleted rows of a table to its shadow table.
+
+    :param before: if given, only rows deleted before this datetime are
+                   moved.
+    :returns: the number of rows moved.
+    """
+    engine = get_engine()
+    meta = MetaData(bind=engine)
+    table = Table(tablename, meta, autoload=True)
+    shadow_table = Table(_SHADOW_TABLE_PREFIX + tablename, meta,
+                         autoload=True)
+    # The tables referring to this one
+    meta.reflect()
+    return _archive_deleted_rows_for_table(engine, table, shadow_table,
+                                           max_rows, before)
+
+
+@require_admin_context
+def archive_deleted_rows(context, max_rows, before=None):
+    """Move up to max_rows soft deleted rows in total to the shadow tables.
+
+    :param before: if given, only rows deleted before this datetime are
+                   moved.
+    :returns: a dict of the number of rows moved by table name.
+    """
+    engine = get_engine()
+    archived = {}
+    remaining = max_rows
+    for table, shadow_table in _get_archivable_tables(engine):
+        if remaining <= 0:
+            break
+        count = _archive_deleted_rows_for_table(engine, table, shadow_table,
+                                                remaining, before)
+        if count:
+            archived[table.name] = count
+            remaining -= count
+    return archived
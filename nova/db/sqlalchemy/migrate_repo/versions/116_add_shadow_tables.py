@@ -0,0 +1,77 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack LLC.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from nova.openstack.common import log as logging
+from sqlalchemy import BigInteger, Column, MetaData, Table
+from sqlalchemy.types import NullType
+
+LOG = logging.getLogger(__name__)
+
+SHADOW_TABLE_PREFIX = 'shadow_'
+
+
+def _soft_deleted_tables(meta):
+    for table in meta.sorted_tables:
+        if table.name.startswith(SHADOW_TABLE_PREFIX):
+            continue
+        if 'deleted' in table.columns:
+            yield table
+
+
+def upgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+    meta.reflect(migrate_engine)
+
+    # Every table with soft deleted rows gets a shadow table with the same
+    # columns for `nova-manage db archive` to move those rows to.  Shadow
+    # tables have no keys, constraints or indexes: rows can be archived in
+    # any order, and an id the database handed out again after its row
+    # was archived can be archived a second time.
+    for table in list(_soft_deleted_tables(meta)):
+        columns = []
+        for column in table.columns:
+            column_type = column.type
+            # NOTE: sqlite reflects BigInteger columns as NullType
+            if isinstance(column_type, NullType):
+                column_type = BigInteger()
+            columns.append(Column(column.name, column_type,
+                                  nullable=column.nullable))
+
+        shadow_table = Table(SHADOW_TABLE_PREFIX + table.name, meta,
+                             *columns,
+                             mysql_engine='InnoDB',
+                             mysql_charset='utf8')
+        try:
+            shadow_table.create()
+        except Exception:
+            LOG.error(_("Table |%s| not created!"), repr(shadow_table))
+            raise
+
+
+def downgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+    meta.reflect(migrate_engine)
+
+    for table in meta.sorted_tables:
+        if not table.name.startswith(SHADOW_TABLE_PREFIX):
+            continue
+        try:
+            table.drop()
+        except Exception:
+            LOG.error(_("%s table not dropped"), table.name)
+            raise
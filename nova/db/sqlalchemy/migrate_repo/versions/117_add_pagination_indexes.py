@@ -0,0 +1,57 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack LLC.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from sqlalchemy import Index, MetaData, Table
+
+
+# Listings are paged by their sort key and then id, either across all
+# projects or within one, so index both orders.
+INDEXES = [
+    ('instances', 'instances_created_at_id_idx',
+     ['created_at', 'id']),
+    ('instances', 'instances_project_id_created_at_id_idx',
+     ['project_id', 'created_at', 'id']),
+    ('instance_types', 'instance_types_flavorid_id_idx',
+     ['flavorid', 'id']),
+    ('volumes', 'volumes_created_at_id_idx',
+     ['created_at', 'id']),
+    ('volumes', 'volumes_project_id_created_at_id_idx',
+     ['project_id', 'created_at', 'id']),
+    ('snapshots', 'snapshots_created_at_id_idx',
+     ['created_at', 'id']),
+    ('snapshots', 'snapshots_project_id_created_at_id_idx',
+     ['project_id', 'created_at', 'id']),
+    ]
+
+
+def _indexes(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+
+    for table_name, index_name, column_names in INDEXES:
+        table = Table(table_name, meta, autoload=True)
+        columns = [getattr(table.c, name) for name in column_names]
+        yield Index(index_name, *columns)
+
+
+def upgrade(migrate_engine):
+    for index in _indexes(migrate_engine):
+        index.create(migrate_engine)
+
+
+def downgrade(migrate_engine):
+    for index in _indexes(migrate_engine):
+        index.drop(migrate_engine)
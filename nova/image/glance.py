@@ -19,6 +19,7 @@
 
 from __future__ import absolute_import
 
+import collections
 import copy
 import itertools
 import random
@@ -31,13 +32,29 @@ from glance.common import exception as glance_exception
 
 from nova import exception
 from nova import flags
+from nova.openstack.common import cfg
 from nova.openstack.common import jsonutils
 from nova.openstack.common import log as logging
 from nova.openstack.common import timeutils
 
 
+glance_opts = [
+    cfg.IntOpt('glance_server_retry_interval',
+               default=30,
+               help='Number of seconds a glance api server that failed to '
+                    'respond is skipped before it is tried again'),
+    cfg.IntOpt('glance_image_meta_cache_ttl',
+               default=30,
+               help='Number of seconds metadata of active images fetched '
+                    'from glance is cached for. Set to 0 to disable'),
+    cfg.IntOpt('glance_image_meta_cache_size',
+               default=1000,
+               help='Maximum number of image metadata entries to cache'),
+    ]
+
 LOG = logging.getLogger(__name__)
 FLAGS = flags.FLAGS
+FLAGS.register_opts(glance_opts)
 
 
 def _parse_image_ref(image_href):
@@ -58,28 +75,127 @@ def _parse_image_ref(image_href):
 def _create_glance_client(context, host, port):
     params = {}
     if FLAGS.auth_strategy == 'keystone':
-        params['creds'] = {
-            'strategy': 'keystone',
-            'username': context.user_id,
-            'tenant': context.project_id,
-        }
+        params['creds'] = _glance_creds(context)
         params['auth_tok'] = context.auth_token
 
     return glance.client.Client(host, port, **params)
 
 
+def _glance_creds(context):
+    return {
+        'strategy': 'keystone',
+        'username': context.user_id,
+        'tenant': context.project_id,
+    }
+
+
 def get_api_servers():
     """
     Shuffle a list of FLAGS.glance_api_servers and return an iterator
     that will cycle through the list, looping around to the beginning
     if necessary.
     """
+    return itertools.cycle(_parse_api_servers())
+
+
+def _parse_api_servers():
     api_servers = []
     for api_server in FLAGS.glance_api_servers:
         host, port_str = api_server.split(':')
         api_servers.append((host, int(port_str)))
     random.shuffle(api_servers)
-    return itertools.cycle(api_servers)
+    return api_servers
+
+
+class GlanceServer(object):
+    """Utilization and health state for a single glance api server."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.in_use = 0
+        self.calls = 0
+        self.failures = 0
+        self.failed_at = None
+
+    def is_up(self):
+        if self.failed_at is None:
+            return True
+        return timeutils.is_older_than(self.failed_at,
+                                       FLAGS.glance_server_retry_interval)
+
+    def get_stats(self):
+        return {'host': self.host,
+                'port': self.port,
+                'up': self.is_up(),
+                'in_use': self.in_use,
+                'calls': self.calls,
+                'failures': self.failures}
+
+
+class GlanceServerPool(object):
+    """Per-process pool of the configured glance api servers.
+
+    The server list is parsed and shuffled once per process and handed out
+    in round robin order.  A server that fails to respond is skipped until
+    FLAGS.glance_server_retry_interval has passed.
+
+    Only endpoints are pooled.  Glance clients hold the credentials and
+    auth plugin state of the context they were built for, so every call
+    gets a client of its own.
+    """
+
+    def __init__(self, api_servers):
+        self.servers = [GlanceServer(host, port)
+                        for host, port in api_servers]
+        self._next = 0
+
+    def next_server(self):
+        """Return the next server in round robin order that is up.
+
+        If every server is marked down, the one that failed longest ago
+        is returned so that a call is still attempted.
+        """
+        num_servers = len(self.servers)
+        for i in xrange(num_servers):
+            server = self.servers[(self._next + i) % num_servers]
+            if server.is_up():
+                self._next = (self._next + i + 1) % num_servers
+                return server
+        return min(self.servers, key=lambda server: server.failed_at)
+
+    def get(self, context, server):
+        """Return a client for the given server bound to context."""
+        client = _create_glance_client(context, server.host, server.port)
+        server.in_use += 1
+        server.calls += 1
+        return client
+
+    def put(self, server):
+        """Record that a call to the server completed."""
+        server.in_use -= 1
+        server.failed_at = None
+
+    def discard(self, server):
+        """Record that the server failed to respond and mark it down."""
+        server.in_use -= 1
+        server.failures += 1
+        server.failed_at = timeutils.utcnow()
+
+    def get_stats(self):
+        """Return utilization and health counters for each server."""
+        return [server.get_stats() for server in self.servers]
+
+
+_SERVER_POOL = None
+
+
+def get_server_pool():
+    """Return the process wide pool for FLAGS.glance_api_servers."""
+    global _SERVER_POOL
+    if _SERVER_POOL is None:
+        _SERVER_POOL = GlanceServerPool(_parse_api_servers())
+    return _SERVER_POOL
 
 
 class GlanceClientWrapper(object):
@@ -88,9 +204,10 @@ class GlanceClientWrapper(object):
     def __init__(self, context=None, host=None, port=None):
         if host is not None:
             self.client = self._create_static_client(context, host, port)
+            self.endpoint = (host, port)
         else:
             self.client = None
-        self.api_servers = None
+            self.endpoint = None
 
     def _create_static_client(self, context, host, port):
         """Create a client that we'll use for every call."""
@@ -98,28 +215,33 @@ class GlanceClientWrapper(object):
         self.port = port
         return _create_glance_client(context, self.host, self.port)
 
-    def _create_onetime_client(self, context):
-        """Create a client that will be used for one call."""
-        if self.api_servers is None:
-            self.api_servers = get_api_servers()
-        self.host, self.port = self.api_servers.next()
-        return _create_glance_client(context, self.host, self.port)
-
     def call(self, context, method, *args, **kwargs):
         """
         Call a glance client method.  If we get a connection error,
         retry the request according to FLAGS.glance_num_retries.
+
+        Without a static host, each attempt goes to the next glance api
+        server that is not marked down, so no sleep is needed between
+        attempts.
         """
         retry_excs = (glance_exception.ClientConnectionError,
                 glance_exception.ServiceUnavailable)
 
         num_attempts = 1 + FLAGS.glance_num_retries
+        pool = None if self.client else get_server_pool()
 
         for attempt in xrange(1, num_attempts + 1):
-            client = self.client or self._create_onetime_client(context)
+            if pool is None:
+                client = self.client
+            else:
+                server = pool.next_server()
+                self.host, self.port = server.host, server.port
+                client = pool.get(context, server)
             try:
-                return getattr(client, method)(*args, **kwargs)
+                result = getattr(client, method)(*args, **kwargs)
             except retry_excs as e:
+                if pool is not None:
+                    pool.discard(server)
                 host = self.host
                 port = self.port
                 extra = "retrying"
@@ -131,7 +253,103 @@ class GlanceClientWrapper(object):
                     raise exception.GlanceConnectionFailed(
                             host=host, port=port, reason=str(e))
                 LOG.exception(error_msg, locals())
-                time.sleep(1)
+                if pool is None:
+                    time.sleep(1)
+            except Exception:
+                if pool is not None:
+                    pool.put(server)
+                raise
+            else:
+                if pool is not None:
+                    pool.put(server)
+                return result
+
+
+class ImageMetaCache(object):
+    """Time limited, least recently used cache of glance image metadata.
+
+    Entries are keyed by the glance endpoint, the image id and the
+    visibility scope of the requesting context, since glance answers
+    differently depending on who is asking.
+    """
+
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # key -> [expiry, tick of the last use, value].  _uses holds a
+        # (tick, key) pair per use, oldest first; pairs whose tick is no
+        # longer the entry's are skipped when evicting.
+        self._entries = {}
+        self._uses = collections.deque()
+        self._tick = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and timeutils.utcnow_ts() >= entry[0]:
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._use(key, entry)
+        return entry[2]
+
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return
+        entry = [timeutils.utcnow_ts() + self.ttl, None, value]
+        self._entries[key] = entry
+        self._use(key, entry)
+        while len(self._entries) > self.max_size:
+            tick, oldest = self._uses.popleft()
+            if self._is_current(tick, oldest):
+                del self._entries[oldest]
+                self.evictions += 1
+
+    def _use(self, key, entry):
+        self._tick += 1
+        entry[1] = self._tick
+        self._uses.append((self._tick, key))
+        if len(self._uses) > 2 * max(len(self._entries), self.max_size):
+            self._uses = collections.deque(
+                    (tick, key) for tick, key in self._uses
+                    if self._is_current(tick, key))
+
+    def _is_current(self, tick, key):
+        entry = self._entries.get(key)
+        return entry is not None and entry[1] == tick
+
+    def invalidate(self, image_id):
+        """Drop every cached entry for image_id."""
+        image_id = str(image_id)
+        for key in self._entries.keys():
+            if key[1] == image_id:
+                del self._entries[key]
+
+    def get_stats(self):
+        lookups = self.hits + self.misses
+        return {'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': float(self.hits) / lookups if lookups else 0.0}
+
+
+_IMAGE_META_CACHE = None
+
+
+def get_image_meta_cache():
+    """Return the process wide image metadata cache."""
+    global _IMAGE_META_CACHE
+    if _IMAGE_META_CACHE is None:
+        _IMAGE_META_CACHE = ImageMetaCache(
+                FLAGS.glance_image_meta_cache_ttl,
+                FLAGS.glance_image_meta_cache_size)
+    return _IMAGE_META_CACHE
 
 
 class GlanceImageService(object):
@@ -203,12 +421,23 @@ class GlanceImageService(object):
             yield image
 
     def show(self, context, image_id):
-        """Returns a dict with image data for the given opaque image id."""
-        try:
-            image_meta = self._client.call(context, 'get_image_meta',
-                    image_id)
-        except Exception:
-            _reraise_translated_image_exception(image_id)
+        """Returns a dict with image data for the given opaque image id.
+
+        Metadata of active images is served from the image metadata
+        cache when possible, so repeated lookups of the same image while
+        handling a request only reach glance once.
+        """
+        cache = get_image_meta_cache()
+        cache_key = self._cache_key(context, image_id)
+        image_meta = cache.get(cache_key)
+        if image_meta is None:
+            try:
+                image_meta = self._client.call(context, 'get_image_meta',
+                        image_id)
+            except Exception:
+                _reraise_translated_image_exception(image_id)
+            if image_meta.get('status') == 'active':
+                cache.set(cache_key, image_meta)
 
         if not self._is_image_available(context, image_meta):
             raise exception.ImageNotFound(image_id=image_id)
@@ -248,11 +477,17 @@ class GlanceImageService(object):
         # NOTE(vish): show is to check if image is available
         self.show(context, image_id)
         image_meta = self._translate_to_glance(image_meta)
+        get_image_meta_cache().invalidate(image_id)
         try:
-            image_meta = self._client.call(context, 'update_image',
-                    image_id, image_meta, data, features)
-        except Exception:
-            _reraise_translated_image_exception(image_id)
+            try:
+                image_meta = self._client.call(context, 'update_image',
+                        image_id, image_meta, data, features)
+            except Exception:
+                _reraise_translated_image_exception(image_id)
+        finally:
+            # A show() while the call was in progress may have cached the
+            # old metadata again
+            get_image_meta_cache().invalidate(image_id)
 
         base_image_meta = self._translate_from_glance(image_meta)
         return base_image_meta
@@ -266,12 +501,23 @@ class GlanceImageService(object):
         """
         # NOTE(vish): show is to check if image is available
         self.show(context, image_id)
+        get_image_meta_cache().invalidate(image_id)
         try:
-            result = self._client.call(context, 'delete_image', image_id)
-        except glance_exception.NotFound:
-            raise exception.ImageNotFound(image_id=image_id)
+            try:
+                result = self._client.call(context, 'delete_image', image_id)
+            except glance_exception.NotFound:
+                raise exception.ImageNotFound(image_id=image_id)
+        finally:
+            # A show() while the call was in progress may have cached the
+            # old metadata again
+            get_image_meta_cache().invalidate(image_id)
         return result
 
+    def _cache_key(self, context, image_id):
+        scope = (context.project_id, context.is_admin)
+        endpoint = getattr(self._client, 'endpoint', None)
+        return (endpoint, str(image_id), scope)
+
     @staticmethod
     def _translate_to_glance(image_meta):
         image_meta = _convert_to_string(image_meta)
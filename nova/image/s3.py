@@ -73,6 +73,13 @@ class S3ImageService(object):
         self.service.__init__(*args, **kwargs)
 
     def _translate_uuids_to_ids(self, context, images):
+        image_uuids = set()
+        for image in images:
+            properties = image.get('properties') or {}
+            image_uuids.update([image.get('id'),
+                                properties.get('kernel_id'),
+                                properties.get('ramdisk_id')])
+        ec2utils.glance_ids_to_ids(context, image_uuids)
         return [self._translate_uuid_to_id(context, img) for img in images]
 
     def _translate_uuid_to_id(self, context, image):
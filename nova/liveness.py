@@ -0,0 +1,124 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""In-memory view of which services are up.
+
+Every service heartbeats into the services table each report_interval.
+Rather than reading the whole table each time it needs to know which hosts
+are alive, a consumer keeps a ServiceLivenessView.  The view loads the
+table once and after that only fetches the services changed since its
+last refresh.  Heartbeats are picked up every
+service_liveness_refresh_interval, but services that were created,
+deleted or disabled are looked up every service_liveness_check_interval
+in between, so those take effect sooner.  Re-enabled services cannot be
+told apart from heartbeats, so they wait for the next refresh.
+"""
+
+import datetime
+
+from nova import db
+from nova import flags
+from nova.openstack.common import cfg
+from nova.openstack.common import log as logging
+from nova.openstack.common import timeutils
+from nova import utils
+
+
+LOG = logging.getLogger(__name__)
+
+liveness_opts = [
+    cfg.IntOpt('service_liveness_refresh_interval',
+               default=5,
+               help='Seconds an in-memory view of service liveness is used '
+                    'for before the services changed since are fetched'),
+    cfg.IntOpt('service_liveness_check_interval',
+               default=1,
+               help='Seconds between the checks for services created, '
+                    'deleted or disabled in between refreshes of the '
+                    'in-memory view of service liveness'),
+    ]
+
+FLAGS = flags.FLAGS
+FLAGS.register_opts(liveness_opts)
+flags.DECLARE('report_interval', 'nova.service')
+
+
+class ServiceLivenessView(object):
+    """Tracks the services table to answer which hosts are up."""
+
+    def __init__(self):
+        self._services = {}
+        self._last_refresh = None
+        self._last_checked = None
+
+    def refresh(self, context, full=False):
+        """Bring the view up to date with the services table.
+
+        Only the services changed since the last refresh are read, unless
+        this is the first refresh or full is set.
+        """
+        now = timeutils.utcnow()
+        if full or self._last_refresh is None:
+            services = db.service_get_all(context)
+            self._services = {}
+        else:
+            services = db.service_get_all_updated_since(
+                    context, self._allow_for_skew(self._last_refresh))
+        self._update(services)
+
+        LOG.debug(_("Refreshed %(count)d of %(total)d services"),
+                  {'count': len(services), 'total': len(self._services)})
+        self._last_refresh = now
+        self._last_checked = now
+
+    def _allow_for_skew(self, since):
+        # Services are stamped with the clock of the host writing them,
+        # so look back far enough to allow for some skew
+        return since - datetime.timedelta(seconds=FLAGS.report_interval)
+
+    def _update(self, services):
+        for service in services:
+            if service['deleted']:
+                self._services.pop(service['id'], None)
+            else:
+                self._services[service['id']] = service
+
+    def _check_added_or_removed(self, context):
+        """Fetch the services created, deleted or disabled since the last
+        check, which must not wait for the next refresh."""
+        now = timeutils.utcnow()
+        self._update(db.service_get_all_added_or_removed_since(
+                context, self._allow_for_skew(self._last_checked)))
+        self._last_checked = now
+
+    def _refresh_if_stale(self, context):
+        if (self._last_refresh is None or
+            timeutils.is_older_than(self._last_refresh,
+                                    FLAGS.service_liveness_refresh_interval)):
+            self.refresh(context)
+        elif timeutils.is_older_than(self._last_checked,
+                                     FLAGS.service_liveness_check_interval):
+            self._check_added_or_removed(context)
+
+    def hosts_up(self, context, topic):
+        """Return the hosts with an enabled, running service for topic."""
+        self._refresh_if_stale(context)
+        return [service['host']
+                for _id, service in sorted(self._services.iteritems())
+                if (service['topic'] == topic and
+                    not service['disabled'] and
+                    utils.service_is_up(service))]
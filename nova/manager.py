@@ -53,8 +53,13 @@ This module provides Manager, a base class for managers.
 
 """
 
+import time
+
+import eventlet
+
 from nova.db import base
 from nova import flags
+from nova.openstack.common import cfg
 from nova.openstack.common import log as logging
 from nova.openstack.common.plugin import pluginmanager
 from nova.openstack.common.rpc import dispatcher as rpc_dispatcher
@@ -62,7 +67,16 @@ from nova.scheduler import rpcapi as scheduler_rpcapi
 from nova import version
 
 
+manager_opts = [
+    cfg.IntOpt('periodic_task_pool_size',
+               default=4,
+               help='Number of periodic tasks of a manager that may run at '
+                    'the same time, each in its own green thread. Set to 0 '
+                    'to run the tasks one after another'),
+    ]
+
 FLAGS = flags.FLAGS
+FLAGS.register_opts(manager_opts)
 
 
 LOG = logging.getLogger(__name__)
@@ -78,10 +92,21 @@ def periodic_task(*args, **kwargs):
 
         2. With arguments, @periodic_task(ticks_between_runs=N), this will be
            run on every N ticks of the periodic scheduler.
+
+    Other optional arguments:
+
+        spacing: run the task at most once every `spacing` seconds, no
+                 matter how often the periodic scheduler ticks.
+
+        deadline: number of seconds the task is expected to finish in.
+                  Runs that take longer are logged and counted in the
+                  task's stats.
     """
     def decorator(f):
         f._periodic_task = True
         f._ticks_between_runs = kwargs.pop('ticks_between_runs', 0)
+        f._periodic_spacing = kwargs.pop('spacing', 0)
+        f._periodic_deadline = kwargs.pop('deadline', 0)
         return f
 
     # NOTE(sirp): The `if` is necessary to allow the decorator to be used with
@@ -139,6 +164,10 @@ class Manager(base.Base):
         if not host:
             host = FLAGS.host
         self.host = host
+        self._periodic_pool = None
+        self._periodic_running = set()
+        self._periodic_last_run = {}
+        self._periodic_stats = {}
         self.load_plugins()
         super(Manager, self).__init__(db_driver)
 
@@ -155,7 +184,14 @@ class Manager(base.Base):
         return rpc_dispatcher.RpcDispatcher([self])
 
     def periodic_tasks(self, context, raise_on_error=False):
-        """Tasks to be run at a periodic interval."""
+        """Tasks to be run at a periodic interval.
+
+        Unless FLAGS.periodic_task_pool_size is 0 or raise_on_error is set,
+        each task that is due is spawned in its own green thread, so a slow
+        task does not hold up the others. A task that is still running
+        when it comes due again is skipped for that tick.
+        """
+        concurrent = FLAGS.periodic_task_pool_size > 0 and not raise_on_error
         for task_name, task in self._periodic_tasks:
             full_task_name = '.'.join([self.__class__.__name__, task_name])
 
@@ -166,16 +202,75 @@ class Manager(base.Base):
                 self._ticks_to_skip[task_name] -= 1
                 continue
 
+            spacing = task._periodic_spacing
+            last_run = self._periodic_last_run.get(task_name)
+            if (spacing and last_run is not None and
+                    time.time() - last_run < spacing):
+                continue
+
+            if task_name in self._periodic_running:
+                LOG.debug(_("Skipping %(full_task_name)s, previous run is "
+                            "still in progress"), locals())
+                self._periodic_task_stats(task_name)['skipped'] += 1
+                continue
+
             self._ticks_to_skip[task_name] = task._ticks_between_runs
-            LOG.debug(_("Running periodic task %(full_task_name)s"), locals())
-
-            try:
-                task(self, context)
-            except Exception as e:
-                if raise_on_error:
-                    raise
-                LOG.exception(_("Error during %(full_task_name)s: %(e)s"),
-                              locals())
+            self._periodic_running.add(task_name)
+            if concurrent:
+                if self._periodic_pool is None:
+                    self._periodic_pool = eventlet.GreenPool(
+                            FLAGS.periodic_task_pool_size)
+                self._periodic_pool.spawn_n(self._run_periodic_task,
+                                            context, task_name, task)
+            else:
+                self._run_periodic_task(context, task_name, task,
+                                        raise_on_error=raise_on_error)
+
+    def _run_periodic_task(self, context, task_name, task,
+                           raise_on_error=False):
+        full_task_name = '.'.join([self.__class__.__name__, task_name])
+        LOG.debug(_("Running periodic task %(full_task_name)s"), locals())
+
+        stats = self._periodic_task_stats(task_name)
+        start = time.time()
+        self._periodic_last_run[task_name] = start
+        try:
+            task(self, context)
+        except Exception as e:
+            stats['failures'] += 1
+            if raise_on_error:
+                raise
+            LOG.exception(_("Error during %(full_task_name)s: %(e)s"),
+                          locals())
+        finally:
+            self._periodic_running.discard(task_name)
+            duration = time.time() - start
+            stats['runs'] += 1
+            stats['last_duration'] = duration
+            stats['total_duration'] += duration
+            stats['max_duration'] = max(stats['max_duration'], duration)
+
+            deadline = task._periodic_deadline
+            if deadline and duration > deadline:
+                stats['overruns'] += 1
+                LOG.warn(_("%(full_task_name)s took %(duration).2f seconds, "
+                           "more than its deadline of %(deadline)s seconds"),
+                         locals())
+
+    def _periodic_task_stats(self, task_name):
+        return self._periodic_stats.setdefault(task_name,
+                {'runs': 0,
+                 'failures': 0,
+                 'skipped': 0,
+                 'overruns': 0,
+                 'last_duration': 0.0,
+                 'total_duration': 0.0,
+                 'max_duration': 0.0})
+
+    def get_periodic_task_stats(self):
+        """Return run counts and durations for each periodic task."""
+        return dict((task_name, stats.copy())
+                    for task_name, stats in self._periodic_stats.iteritems())
 
     def init_host(self):
         """Handle initialization if this is a standalone service.
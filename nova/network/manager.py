@@ -354,7 +354,8 @@ class FloatingIP(object):
         # deleted before the IPs are released, so we need to get deleted
         # instances too
         read_deleted_context = context.elevated(read_deleted='yes')
-        instance = self.db.instance_get(read_deleted_context, instance_id)
+        instance = self.db.instance_get(read_deleted_context, instance_id,
+                                        columns_to_join=[])
 
         LOG.debug(_("floating IP deallocation for instance |%s|"),
                   instance=instance, context=read_deleted_context)
@@ -513,7 +514,8 @@ class FloatingIP(object):
                                           fixed_ip['network_id'])
         if network['multi_host']:
             instance = self.db.instance_get_by_uuid(context,
-                                                    fixed_ip['instance_uuid'])
+                                                    fixed_ip['instance_uuid'],
+                                                    columns_to_join=[])
             host = instance['host']
         else:
             host = network['host']
@@ -587,7 +589,8 @@ class FloatingIP(object):
         network = self._get_network_by_id(context, fixed_ip['network_id'])
         if network['multi_host']:
             instance = self.db.instance_get_by_uuid(context,
-                                                    fixed_ip['instance_uuid'])
+                                                    fixed_ip['instance_uuid'],
+                                                    columns_to_join=[])
             host = instance['host']
         else:
             host = network['host']
@@ -861,9 +864,10 @@ class NetworkManager(manager.SchedulerDependentManager):
         admin_context = context.get_admin_context(read_deleted='yes')
         if utils.is_uuid_like(instance_id):
             instance_ref = self.db.instance_get_by_uuid(admin_context,
-                                                        instance_id)
+                    instance_id, columns_to_join=['security_groups'])
         else:
-            instance_ref = self.db.instance_get(admin_context, instance_id)
+            instance_ref = self.db.instance_get(admin_context, instance_id,
+                    columns_to_join=['security_groups'])
 
         groups = instance_ref['security_groups']
         group_ids = [group['id'] for group in groups]
@@ -989,7 +993,8 @@ class NetworkManager(manager.SchedulerDependentManager):
         read_deleted_context = context.elevated(read_deleted='yes')
 
         instance_id = kwargs.pop('instance_id')
-        instance = self.db.instance_get(read_deleted_context, instance_id)
+        instance = self.db.instance_get(read_deleted_context, instance_id,
+                                        columns_to_join=[])
 
         try:
             fixed_ips = (kwargs.get('fixed_ips') or
@@ -1238,7 +1243,8 @@ class NetworkManager(manager.SchedulerDependentManager):
         #             and use that network here with a method like
         #             network_get_by_compute_host
         address = None
-        instance_ref = self.db.instance_get(context, instance_id)
+        instance_ref = self.db.instance_get(context, instance_id,
+                                            columns_to_join=[])
 
         if network['cidr']:
             address = kwargs.get('address', None)
@@ -1277,7 +1283,8 @@ class NetworkManager(manager.SchedulerDependentManager):
         fixed_ip_ref = self.db.fixed_ip_get_by_address(context, address)
         vif_id = fixed_ip_ref['virtual_interface_id']
         instance = self.db.instance_get_by_uuid(context,
-                                                fixed_ip_ref['instance_uuid'])
+                                                fixed_ip_ref['instance_uuid'],
+                                                columns_to_join=[])
 
         self._do_trigger_security_group_members_refresh_for_instance(
             instance['uuid'])
@@ -1549,7 +1556,8 @@ class NetworkManager(manager.SchedulerDependentManager):
         else:
             call_func = self._setup_network_on_host
 
-        instance = self.db.instance_get(context, instance_id)
+        instance = self.db.instance_get(context, instance_id,
+                                        columns_to_join=[])
         vifs = self.db.virtual_interface_get_by_instance(context,
                                                          instance['uuid'])
         for vif in vifs:
@@ -1633,7 +1641,8 @@ class NetworkManager(manager.SchedulerDependentManager):
     @wrap_check_policy
     def get_vifs_by_instance(self, context, instance_id):
         """Returns the vifs associated with an instance"""
-        instance = self.db.instance_get(context, instance_id)
+        instance = self.db.instance_get(context, instance_id,
+                                        columns_to_join=[])
         vifs = self.db.virtual_interface_get_by_instance(context,
                                                          instance['uuid'])
         return [dict(vif.iteritems()) for vif in vifs]
@@ -1653,7 +1662,8 @@ class NetworkManager(manager.SchedulerDependentManager):
         if not uuid:
             return uuid
 
-        instance = self.db.instance_get_by_uuid(context, uuid)
+        instance = self.db.instance_get_by_uuid(context, uuid,
+                                                columns_to_join=[])
         return instance['id']
 
     @wrap_check_policy
@@ -1876,7 +1886,8 @@ class VlanManager(RPCAllocateFixedIP, FloatingIP, NetworkManager):
 
     def allocate_fixed_ip(self, context, instance_id, network, **kwargs):
         """Gets a fixed ip from the pool."""
-        instance = self.db.instance_get(context, instance_id)
+        instance = self.db.instance_get(context, instance_id,
+                                        columns_to_join=[])
 
         if kwargs.get('vpn', None):
             address = network['vpn_private_address']
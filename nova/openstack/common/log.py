@@ -161,15 +161,71 @@ def _get_log_file_path(binary=None):
 
 
 class ContextAdapter(logging.LoggerAdapter):
-    warn = logging.LoggerAdapter.warning
+    """Adds the request context and instance to log records.
+
+    Unlike logging.LoggerAdapter, the level is checked before the context
+    is processed, so calls below the enabled level cost next to nothing.
+    """
 
     def __init__(self, logger, project_name, version_string):
         self.logger = logger
         self.project = project_name
         self.version = version_string
 
+    def isEnabledFor(self, level):
+        return self.logger.isEnabledFor(level)
+
+    def _log(self, level, msg, args, kwargs):
+        msg, kwargs = self.process(msg, kwargs)
+        exc_info = kwargs.get('exc_info')
+        if exc_info and not isinstance(exc_info, tuple):
+            exc_info = sys.exc_info()
+
+        # NOTE: logging would report this module as the caller since the
+        # record is no longer made from logging.LoggerAdapter, so look up
+        # the frame which called the adapter here instead
+        frame = sys._getframe(2)
+        record = self.logger.makeRecord(self.logger.name, level,
+                                        frame.f_code.co_filename,
+                                        frame.f_lineno, msg, args, exc_info,
+                                        frame.f_code.co_name,
+                                        kwargs.get('extra'))
+        self.logger.handle(record)
+
+    def debug(self, msg, *args, **kwargs):
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self._log(logging.DEBUG, msg, args, kwargs)
+
+    def info(self, msg, *args, **kwargs):
+        if self.logger.isEnabledFor(logging.INFO):
+            self._log(logging.INFO, msg, args, kwargs)
+
     def audit(self, msg, *args, **kwargs):
-        self.log(logging.AUDIT, msg, *args, **kwargs)
+        if self.logger.isEnabledFor(logging.AUDIT):
+            self._log(logging.AUDIT, msg, args, kwargs)
+
+    def warning(self, msg, *args, **kwargs):
+        if self.logger.isEnabledFor(logging.WARNING):
+            self._log(logging.WARNING, msg, args, kwargs)
+
+    warn = warning
+
+    def error(self, msg, *args, **kwargs):
+        if self.logger.isEnabledFor(logging.ERROR):
+            self._log(logging.ERROR, msg, args, kwargs)
+
+    def exception(self, msg, *args, **kwargs):
+        if self.logger.isEnabledFor(logging.ERROR):
+            kwargs['exc_info'] = 1
+            self._log(logging.ERROR, msg, args, kwargs)
+
+    def critical(self, msg, *args, **kwargs):
+        if self.logger.isEnabledFor(logging.CRITICAL):
+            self._log(logging.CRITICAL, msg, args, kwargs)
+
+    def log(self, level, msg, *args, **kwargs):
+        if self.logger.isEnabledFor(level):
+            self._log(level, msg, args, kwargs)
 
     def process(self, msg, kwargs):
         if 'extra' not in kwargs:
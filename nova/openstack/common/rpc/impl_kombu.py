@@ -255,25 +255,67 @@ class FanoutConsumer(ConsumerBase):
                                              **options)
 
 
+# NOTE: The publisher cache of Connection.publisher_send and the declared
+# registry publishers share are not in oslo-incubator's rpc yet and have to
+# be proposed there.  Until they merge, carry them over by hand when
+# syncing with update.py, or the sync drops them.
 class Publisher(object):
     """Base Publisher class"""
 
     def __init__(self, channel, exchange_name, routing_key, **kwargs):
         """Init the Publisher class with the exchange_name, routing_key,
         and other options
+
+        'declared' is an optional set shared by all publishers on a
+        connection.  Exchanges and queues recorded in it have already
+        been declared on the broker and are not declared again.
         """
         self.exchange_name = exchange_name
         self.routing_key = routing_key
+        self.declared = kwargs.pop('declared', None)
         self.kwargs = kwargs
         self.reconnect(channel)
 
+    @property
+    def cacheable(self):
+        """Publishers for exchanges the broker may delete on its own
+        must redeclare them, so they are neither cached nor recorded
+        as declared.
+        """
+        return not self.kwargs.get('auto_delete', False)
+
+    def _declared_key(self, kind, name):
+        return (kind, name, tuple(sorted(self.kwargs.items())))
+
+    def _needs_declare(self, key):
+        if self.declared is None or not self.cacheable:
+            return True
+        return key not in self.declared
+
+    def _mark_declared(self, key):
+        if self.declared is not None and self.cacheable:
+            self.declared.add(key)
+
+    def forget_declared(self):
+        """Forget that our entities were declared, after an error"""
+        if self.declared is not None:
+            self.declared.discard(self._declared_key('exchange',
+                                                     self.exchange_name))
+            self.declared.discard(self._declared_key('queue',
+                                                     self.routing_key))
+
     def reconnect(self, channel):
         """Re-establish the Producer after a rabbit reconnection"""
+        self.channel = channel
         self.exchange = kombu.entity.Exchange(name=self.exchange_name,
                                               **self.kwargs)
-        self.producer = kombu.messaging.Producer(exchange=self.exchange,
-                                                 channel=channel,
-                                                 routing_key=self.routing_key)
+        key = self._declared_key('exchange', self.exchange_name)
+        self.producer = kombu.messaging.Producer(
+                exchange=self.exchange,
+                channel=channel,
+                routing_key=self.routing_key,
+                auto_declare=self._needs_declare(key))
+        self._mark_declared(key)
 
     def send(self, msg):
         """Send a message"""
@@ -339,12 +381,16 @@ class NotifyPublisher(TopicPublisher):
         # NOTE(jerdfelt): Normally the consumer would create the queue, but
         # we do this to ensure that messages don't get dropped if the
         # consumer is started after we do
+        key = self._declared_key('queue', self.routing_key)
+        if not self._needs_declare(key):
+            return
         queue = kombu.entity.Queue(channel=channel,
                                    exchange=self.exchange,
                                    durable=self.durable,
                                    name=self.routing_key,
                                    routing_key=self.routing_key)
         queue.declare()
+        self._mark_declared(key)
 
 
 class Connection(object):
@@ -443,6 +489,9 @@ class Connection(object):
             # Kludge to speed up tests.
             self.connection.transport.polling_interval = 0.0
         self.consumer_num = itertools.count(1)
+        # A new broker connection may have lost anything we declared
+        self.publishers = {}
+        self.declared = set()
         self.connection.connect()
         self.channel = self.connection.channel()
         # work around 'memory' transport bug in 1.1.3
@@ -613,8 +662,23 @@ class Connection(object):
                           "'%(topic)s': %(err_str)s") % log_info)
 
         def _publish():
-            publisher = cls(self.conf, self.channel, topic, **kwargs)
-            publisher.send(msg)
+            key = (cls, topic, tuple(sorted(kwargs.items())))
+            publisher = self.publishers.get(key)
+            if publisher is None:
+                publisher = cls(self.conf, self.channel, topic,
+                                declared=self.declared, **kwargs)
+                if publisher.cacheable:
+                    self.publishers[key] = publisher
+            elif publisher.channel is not self.channel:
+                # The channel was replaced by reset(); rebinding does
+                # not redeclare anything already in self.declared
+                publisher.reconnect(self.channel)
+            try:
+                publisher.send(msg)
+            except Exception:
+                self.publishers.pop(key, None)
+                publisher.forget_declared()
+                raise
 
         self.ensure(_error_callback, _publish)
 
@@ -14,7 +14,6 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-import pprint
 import socket
 import string
 import sys
@@ -33,7 +32,6 @@ from nova.openstack.common.rpc import common as rpc_common
 
 
 # for convenience, are not modified.
-pformat = pprint.pformat
 Timeout = eventlet.timeout.Timeout
 LOG = rpc_common.LOG
 RemoteError = rpc_common.RemoteError
@@ -61,6 +59,10 @@ zmq_opts = [
     cfg.IntOpt('rpc_zmq_contexts', default=1,
                help='Number of ZeroMQ contexts, defaults to 1'),
 
+    cfg.IntOpt('rpc_zmq_client_pool_size', default=8,
+               help='Maximum number of idle outbound sockets kept open '
+                    'per address. 0 closes each socket after use'),
+
     cfg.StrOpt('rpc_zmq_ipc_dir', default='/var/run/openstack',
                help='Directory for holding IPC sockets'),
 
@@ -75,6 +77,8 @@ zmq_opts = [
 CONF = None
 ZMQ_CTX = None  # ZeroMQ Context, must be global.
 matchmaker = None  # memoized matchmaker object
+client_pool = None  # memoized pool of outbound sockets
+reply_waiter = None  # memoized subscriber for call replies
 
 
 def _serialize(data):
@@ -94,8 +98,9 @@ def _deserialize(data):
     """
     Deserialization wrapper
     """
-    LOG.debug(_("Deserializing: %s"), data)
-    return jsonutils.loads(data)
+    msg = jsonutils.loads(data)
+    rpc_common._safe_log(LOG.debug, _("Deserializing: %s"), msg)
+    return msg
 
 
 class ZmqSocket(object):
@@ -203,6 +208,7 @@ class ZmqClient(object):
     """Client for ZMQ sockets."""
 
     def __init__(self, addr, socket_type=zmq.PUSH, bind=False):
+        self.addr = addr
         self.outq = ZmqSocket(addr, socket_type, bind=bind)
 
     def cast(self, msg_id, topic, data):
@@ -213,6 +219,128 @@ class ZmqClient(object):
         self.outq.close()
 
 
+# NOTE: ZmqClientPool and ZmqReplyWaiter are not in oslo-incubator's rpc
+# yet and have to be proposed there.  Until they merge, carry them over by
+# hand when syncing with update.py, or the sync drops them.
+class ZmqClientPool(object):
+    """
+    Pool of outbound ZmqClients, keyed by address.
+
+    Clients are checked out exclusively, as a multipart send may yield
+    between frames.  A client whose send failed or timed out is closed
+    rather than returned, as it may hold messages queued for a peer
+    that has gone away.
+    """
+
+    def __init__(self):
+        self.idle = {}
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+
+    def get(self, addr):
+        """Get an idle client for addr, or connect a new one."""
+        idle = self.idle.get(addr)
+        if idle:
+            self.reused += 1
+            return idle.pop()
+        self.created += 1
+        return ZmqClient(addr)
+
+    def put(self, client):
+        """Return a healthy client to the pool."""
+        idle = self.idle.setdefault(client.addr, [])
+        if len(idle) < CONF.rpc_zmq_client_pool_size:
+            idle.append(client)
+        else:
+            client.close()
+
+    def discard(self, client):
+        """Close a client that must not be reused."""
+        self.discarded += 1
+        client.close()
+
+    def close(self):
+        for clients in self.idle.values():
+            for client in clients:
+                client.close()
+        self.idle = {}
+
+    def get_stats(self):
+        return {'addresses': len(self.idle),
+                'idle': sum(len(c) for c in self.idle.values()),
+                'created': self.created,
+                'reused': self.reused,
+                'discarded': self.discarded}
+
+
+class ZmqReplyWaiter(object):
+    """
+    A single long-lived SUB socket on the local reply endpoint,
+    shared by all calls made from this process.
+
+    Each call subscribes to its msg_id and waits on an event, which
+    the receiving thread fires when the reply arrives.
+    """
+
+    def __init__(self):
+        self.sock = None
+        self.thread = None
+        self.waiters = {}
+
+    def listen(self, msg_id):
+        """Start waiting for the reply to msg_id."""
+        if self.sock is None:
+            addr = "ipc://%s/zmq_topic_zmq_replies" % CONF.rpc_zmq_ipc_dir
+            self.sock = ZmqSocket(addr, zmq.SUB, bind=False)
+            self.thread = eventlet.spawn(self._receive, self.sock)
+        waiter = eventlet.event.Event()
+        self.waiters[msg_id] = waiter
+        self.sock.subscribe(msg_id)
+        return waiter
+
+    def unlisten(self, msg_id):
+        """Stop waiting for the reply to msg_id."""
+        self.waiters.pop(msg_id, None)
+        if self.sock is not None:
+            self.sock.unsubscribe(msg_id)
+
+    def _receive(self, sock):
+        while True:
+            try:
+                msg = sock.recv()
+            except greenlet.GreenletExit:
+                return
+            except Exception:
+                LOG.exception(_("Reply subscriber failed. Reconnecting."))
+                self._reset(RPCException(_("ZMQ Socket Error")))
+                return
+
+            LOG.debug(_("Received reply for %s"), msg[0])
+            waiter = self.waiters.get(msg[0])
+            if waiter is not None and not waiter.ready():
+                waiter.send(msg)
+
+    def _reset(self, exc):
+        """Drop the socket and fail every call still waiting on it."""
+        sock, self.sock = self.sock, None
+        self.thread = None
+        if sock is not None:
+            sock.close()
+        for waiter in self.waiters.values():
+            if not waiter.ready():
+                waiter.send_exception(exc)
+
+    def close(self):
+        thread, self.thread = self.thread, None
+        if thread is not None:
+            thread.kill()
+        sock, self.sock = self.sock, None
+        if sock is not None:
+            sock.close()
+        self.waiters = {}
+
+
 class RpcContext(rpc_common.CommonRpcContext):
     """Context that supports replying to a rpc.call."""
     def __init__(self, **kwargs):
@@ -248,7 +376,8 @@ class InternalContext(object):
 
     def _get_response(self, ctx, proxy, topic, data):
         """Process a curried message and cast the result to topic."""
-        LOG.debug(_("Running func with context: %s"), ctx.to_dict())
+        rpc_common._safe_log(LOG.debug, _("Running func with context: %s"),
+                             ctx.to_dict())
         data.setdefault('version', None)
         data.setdefault('args', [])
 
@@ -419,7 +548,7 @@ class ZmqProxy(ZmqBaseReactor):
         msg_id, topic, style, in_msg = data
         topic = topic.split('.', 1)[0]
 
-        LOG.debug(_("CONSUMER GOT %s"), ' '.join(map(pformat, data)))
+        LOG.debug(_("CONSUMER GOT %s"), data)
 
         # Handle zmq_replies magic
         if topic.startswith('fanout~'):
@@ -446,9 +575,9 @@ class ZmqProxy(ZmqBaseReactor):
             if sock_type == zmq.PUB:
                 eventlet.sleep(.5)
 
-        LOG.debug(_("ROUTER RELAY-OUT START %(data)s") % {'data': data})
+        LOG.debug(_("ROUTER RELAY-OUT START %(data)s"), {'data': data})
         self.topic_proxy[topic].send(data)
-        LOG.debug(_("ROUTER RELAY-OUT SUCCEEDED %(data)s") % {'data': data})
+        LOG.debug(_("ROUTER RELAY-OUT SUCCEEDED %(data)s"), {'data': data})
 
 
 class ZmqReactor(ZmqBaseReactor):
@@ -466,8 +595,7 @@ class ZmqReactor(ZmqBaseReactor):
         data = sock.recv()
         LOG.debug(_("CONSUMER RECEIVED DATA: %s"), data)
         if sock in self.mapping:
-            LOG.debug(_("ROUTER RELAY-OUT %(data)s") % {
-                'data': data})
+            LOG.debug(_("ROUTER RELAY-OUT %(data)s"), {'data': data})
             self.mapping[sock].send(data)
             return
 
@@ -529,16 +657,22 @@ def _cast(addr, context, msg_id, topic, msg, timeout=None):
     payload = [RpcContext.marshal(context), msg]
 
     with Timeout(timeout_cast, exception=rpc_common.Timeout):
+        conn = None
+        sent = False
         try:
-            conn = ZmqClient(addr)
+            conn = client_pool.get(addr)
 
             # assumes cast can't return an exception
             conn.cast(msg_id, topic, payload)
+            sent = True
         except zmq.ZMQError:
             raise RPCException("Cast failed. ZMQ Socket Exception")
         finally:
-            if 'conn' in vars():
-                conn.close()
+            if conn is not None:
+                if sent:
+                    client_pool.put(conn)
+                else:
+                    client_pool.discard(conn)
 
 
 def _call(addr, context, msg_id, topic, msg, timeout=None):
@@ -564,23 +698,18 @@ def _call(addr, context, msg_id, topic, msg, timeout=None):
         }
     }
 
-    LOG.debug(_("Creating queue socket for reply waiter"))
-
-    # Messages arriving async.
-    # TODO(ewindisch): have reply consumer with dynamic subscription mgmt
+    # Messages arriving async, on the subscriber shared by all calls.
     with Timeout(timeout, exception=rpc_common.Timeout):
         try:
-            msg_waiter = ZmqSocket(
-                "ipc://%s/zmq_topic_zmq_replies" % CONF.rpc_zmq_ipc_dir,
-                zmq.SUB, subscribe=msg_id, bind=False
-            )
+            LOG.debug(_("Subscribing to reply for %s"), msg_id)
+            msg_waiter = reply_waiter.listen(msg_id)
 
             LOG.debug(_("Sending cast"))
             _cast(addr, context, msg_id, topic, payload)
 
             LOG.debug(_("Cast sent; Waiting reply"))
             # Blocks until receives reply
-            msg = msg_waiter.recv()
+            msg = msg_waiter.wait()
             LOG.debug(_("Received message: %s"), msg)
             LOG.debug(_("Unpacking response"))
             responses = _deserialize(msg[-1])
@@ -588,8 +717,7 @@ def _call(addr, context, msg_id, topic, msg, timeout=None):
         except zmq.ZMQError:
             raise RPCException("ZMQ Socket Error")
         finally:
-            if 'msg_waiter' in vars():
-                msg_waiter.close()
+            reply_waiter.unlisten(msg_id)
 
     # It seems we don't need to do all of the following,
     # but perhaps it would be useful for multicall?
@@ -609,7 +737,8 @@ def _multi_send(method, context, topic, msg, timeout=None):
     message to all relevant hosts.
     """
     conf = CONF
-    LOG.debug(_("%(msg)s") % {'msg': ' '.join(map(pformat, (topic, msg)))})
+    rpc_common._safe_log(LOG.debug, _("Sending message: %s"),
+                         {'topic': topic, 'msg': msg})
 
     queues = matchmaker.queues(topic)
     LOG.debug(_("Sending message(s) to: %s"), queues)
@@ -681,7 +810,15 @@ def cleanup():
     """Clean up resources in use by implementation."""
     global ZMQ_CTX
     global matchmaker
+    global client_pool
+    global reply_waiter
     matchmaker = None
+    if reply_waiter:
+        reply_waiter.close()
+        reply_waiter = None
+    if client_pool:
+        client_pool.close()
+        client_pool = None
     ZMQ_CTX.destroy()
     ZMQ_CTX = None
 
@@ -695,6 +832,8 @@ def register_opts(conf):
     # We memoize through these globals
     global ZMQ_CTX
     global matchmaker
+    global client_pool
+    global reply_waiter
     global CONF
 
     if not CONF:
@@ -703,6 +842,10 @@ def register_opts(conf):
     # Don't re-set, if this method is called twice.
     if not ZMQ_CTX:
         ZMQ_CTX = zmq.Context(conf.rpc_zmq_contexts)
+    if not client_pool:
+        client_pool = ZmqClientPool()
+    if not reply_waiter:
+        reply_waiter = ZmqReplyWaiter()
     if not matchmaker:
         # rpc_zmq_matchmaker should be set to a 'module.Class'
         mm_path = conf.rpc_zmq_matchmaker.split('.')
@@ -28,6 +28,7 @@ from nova.compute import task_states
 from nova import db
 from nova import exception
 from nova import flags
+from nova import liveness
 from nova import notifications
 from nova.openstack.common import cfg
 from nova.openstack.common import importutils
@@ -67,7 +68,7 @@ def cast_to_volume_host(context, host, method, update_db=True, **kwargs):
     rpc.cast(context,
              rpc.queue_get_for(context, 'volume', host),
              {"method": method, "args": kwargs})
-    LOG.debug(_("Casted '%(method)s' to volume '%(host)s'") % locals())
+    LOG.debug(_("Casted '%(method)s' to volume '%(host)s'"), locals())
 
 
 def instance_update_db(context, instance_uuid, host):
@@ -91,7 +92,7 @@ def cast_to_compute_host(context, host, method, update_db=True, **kwargs):
     rpc.cast(context,
              rpc.queue_get_for(context, 'compute', host),
              {"method": method, "args": kwargs})
-    LOG.debug(_("Casted '%(method)s' to compute '%(host)s'") % locals())
+    LOG.debug(_("Casted '%(method)s' to compute '%(host)s'"), locals())
 
 
 def cast_to_network_host(context, host, method, update_db=False, **kwargs):
@@ -100,7 +101,7 @@ def cast_to_network_host(context, host, method, update_db=False, **kwargs):
     rpc.cast(context,
              rpc.queue_get_for(context, 'network', host),
              {"method": method, "args": kwargs})
-    LOG.debug(_("Casted '%(method)s' to network '%(host)s'") % locals())
+    LOG.debug(_("Casted '%(method)s' to network '%(host)s'"), locals())
 
 
 def cast_to_host(context, topic, host, method, update_db=True, **kwargs):
@@ -118,8 +119,8 @@ def cast_to_host(context, topic, host, method, update_db=True, **kwargs):
         rpc.cast(context,
                  rpc.queue_get_for(context, topic, host),
                  {"method": method, "args": kwargs})
-        LOG.debug(_("Casted '%(method)s' to %(topic)s '%(host)s'")
-                % locals())
+        LOG.debug(_("Casted '%(method)s' to %(topic)s '%(host)s'"),
+                  locals())
 
 
 def encode_instance(instance, local=True):
@@ -148,6 +149,7 @@ class Scheduler(object):
                 FLAGS.scheduler_host_manager)
         self.compute_api = compute_api.API()
         self.compute_rpcapi = compute_rpcapi.ComputeAPI()
+        self.liveness = liveness.ServiceLivenessView()
 
     def update_service_capabilities(self, service_name, host, capabilities):
         """Process a capability update from a service node."""
@@ -156,11 +158,7 @@ class Scheduler(object):
 
     def hosts_up(self, context, topic):
         """Return the list of hosts that have a running service for topic."""
-
-        services = db.service_get_all_by_topic(context, topic)
-        return [service['host']
-                for service in services
-                if utils.service_is_up(service)]
+        return self.liveness.hosts_up(context, topic)
 
     def create_instance_db_entry(self, context, request_spec, reservations):
         """Create instance DB entry based on request_spec"""
@@ -335,7 +333,8 @@ class Scheduler(object):
         # Getting total used memory and disk of host
         # It should be sum of memories that are assigned as max value,
         # because overcommiting is risky.
-        instance_refs = db.instance_get_all_by_host(context, dest)
+        instance_refs = db.instance_get_all_by_host(context, dest,
+                                                    columns_to_join=[])
         used = sum([i['memory_mb'] for i in instance_refs])
 
         mem_inst = instance_ref['memory_mb']
@@ -63,8 +63,8 @@ class FilterScheduler(driver.Scheduler):
         """
         elevated = context.elevated()
         num_instances = request_spec.get('num_instances', 1)
-        LOG.debug(_("Attempting to build %(num_instances)d instance(s)") %
-                locals())
+        LOG.debug(_("Attempting to build %(num_instances)d instance(s)"),
+                  locals())
 
         payload = dict(request_spec=request_spec)
         notifier.notify(context, notifier.publisher_id("scheduler"),
@@ -259,15 +259,17 @@ class FilterScheduler(driver.Scheduler):
 
         num_instances = request_spec.get('num_instances', 1)
         selected_hosts = []
+        filter_request = self.host_manager.filter_request_cls(
+                filter_properties)
         for num in xrange(num_instances):
             # Filter local hosts based on requirements ...
             hosts = self.host_manager.filter_hosts(hosts,
-                    filter_properties)
+                    filter_properties, filter_request=filter_request)
             if not hosts:
                 # Can't get any more locally.
                 break
 
-            LOG.debug(_("Filtered %(hosts)s") % locals())
+            LOG.debug(_("Filtered %(hosts)s"), locals())
 
             # weighted_host = WeightedHost() ... the best
             # host for the job.
@@ -277,7 +279,7 @@ class FilterScheduler(driver.Scheduler):
             # variable at that time.
             weighted_host = least_cost.weighted_sum(cost_functions,
                     hosts, filter_properties)
-            LOG.debug(_("Weighted %(weighted_host)s") % locals())
+            LOG.debug(_("Weighted %(weighted_host)s"), locals())
             selected_hosts.append(weighted_host)
 
             # Now consume the resources so the filter/weights
@@ -24,9 +24,36 @@ from nova import exception
 from nova.openstack.common import importutils
 
 
+class FilterRequest(object):
+    """State kept for the filters across one scheduling request.
+
+    A request for several instances filters the hosts once per instance.
+    Anything a filter works out that does not change between those passes
+    can be stored here so it is only worked out once.
+    """
+
+    def __init__(self, filter_properties):
+        self.filter_properties = filter_properties
+        self._cache = {}
+
+    def cached(self, key, func, *args, **kwargs):
+        """Return func(*args, **kwargs), calling it once per request."""
+        if key not in self._cache:
+            self._cache[key] = func(*args, **kwargs)
+        return self._cache[key]
+
+
 class BaseHostFilter(object):
     """Base class for host filters."""
 
+    def prepare(self, filter_request, hosts):
+        """Do the per-request work the filter needs.
+
+        Called with the FilterRequest and the list of host states about
+        to be filtered, before host_passes() is called for any of them.
+        """
+        pass
+
     def host_passes(self, host_state, filter_properties):
         raise NotImplementedError()
 
@@ -17,36 +17,57 @@
 
 import netaddr
 
-from nova.compute import api as compute
+from nova import db
 from nova.scheduler import filters
 
 
 class AffinityFilter(filters.BaseHostFilter):
     def __init__(self):
-        self.compute_api = compute.API()
+        self.affinity_hosts = None
+        self._prepared = False
 
-    def _all_hosts(self, context):
-        all_hosts = {}
-        for instance in self.compute_api.get_all(context):
-            all_hosts[instance['uuid']] = instance['host']
-        return all_hosts
+    def _instance_hosts(self, filter_request, hint):
+        """Return the hosts of the instances named by a scheduler hint.
+
+        The hosts are looked up once per request, in a single query for
+        just the hinted uuids.
+        """
+        filter_properties = filter_request.filter_properties
+        scheduler_hints = filter_properties.get('scheduler_hints') or {}
+        affinity_uuids = scheduler_hints.get(hint, [])
+        if isinstance(affinity_uuids, basestring):
+            affinity_uuids = [affinity_uuids]
+        if not affinity_uuids:
+            return None
+        hosts = filter_request.cached(
+                ('instance_hosts', tuple(affinity_uuids)),
+                db.instance_get_hosts_by_uuids,
+                filter_properties['context'], affinity_uuids)
+        return set(hosts.itervalues())
+
+    def _prepare_hint(self, filter_request, hint):
+        self.affinity_hosts = self._instance_hosts(filter_request, hint)
+        self._prepared = True
+
+    def _affinity_hosts(self, filter_properties, hint):
+        if self._prepared:
+            return self.affinity_hosts
+        # prepare() was not called, so look the hosts up on every call
+        return self._instance_hosts(filters.FilterRequest(filter_properties),
+                                    hint)
 
 
 class DifferentHostFilter(AffinityFilter):
     '''Schedule the instance on a different host from a set of instances.'''
 
-    def host_passes(self, host_state, filter_properties):
-        context = filter_properties['context']
-        scheduler_hints = filter_properties.get('scheduler_hints') or {}
-        me = host_state.host
+    def prepare(self, filter_request, hosts):
+        self._prepare_hint(filter_request, 'different_host')
 
-        affinity_uuids = scheduler_hints.get('different_host', [])
-        if isinstance(affinity_uuids, basestring):
-            affinity_uuids = [affinity_uuids]
-        if affinity_uuids:
-            all_hosts = self._all_hosts(context)
-            return not any([i for i in affinity_uuids
-                              if all_hosts.get(i) == me])
+    def host_passes(self, host_state, filter_properties):
+        affinity_hosts = self._affinity_hosts(filter_properties,
+                                              'different_host')
+        if affinity_hosts is not None:
+            return host_state.host not in affinity_hosts
         # With no different_host key
         return True
 
@@ -56,19 +77,14 @@ class SameHostFilter(AffinityFilter):
     of instances.
     '''
 
-    def host_passes(self, host_state, filter_properties):
-        context = filter_properties['context']
-        scheduler_hints = filter_properties.get('scheduler_hints') or {}
-        me = host_state.host
+    def prepare(self, filter_request, hosts):
+        self._prepare_hint(filter_request, 'same_host')
 
-        affinity_uuids = scheduler_hints.get('same_host', [])
-        if isinstance(affinity_uuids, basestring):
-            affinity_uuids = [affinity_uuids]
-        if affinity_uuids:
-            all_hosts = self._all_hosts(context)
-            return any([i for i
-                          in affinity_uuids
-                          if all_hosts.get(i) == me])
+    def host_passes(self, host_state, filter_properties):
+        affinity_hosts = self._affinity_hosts(filter_properties,
+                                              'same_host')
+        if affinity_hosts is not None:
+            return host_state.host in affinity_hosts
         # With no same_host key
         return True
 
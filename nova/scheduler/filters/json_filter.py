@@ -24,6 +24,10 @@ class JsonFilter(filters.BaseHostFilter):
     """Host Filter to allow simple JSON-based grammar for
     selecting hosts.
     """
+
+    def __init__(self):
+        self._compiled_queries = {}
+
     def _op_compare(self, args, op):
         """Returns True if the specified operator can successfully
         compare the first item in the args with all the rest. Will
@@ -86,63 +90,108 @@ class JsonFilter(filters.BaseHostFilter):
         'and': _and,
     }
 
-    def _parse_string(self, string, host_state):
+    def _compile_string(self, string):
         """Strings prefixed with $ are capability lookups in the
         form '$variable' where 'variable' is an attribute in the
         HostState class.  If $variable is a dictionary, you may
         use: $variable.dictkey
+
+        Returns a function giving the value of string for a host state.
         """
-        if not string:
-            return None
         if not string.startswith("$"):
-            return string
+            return self._constant(string)
 
         path = string[1:].split(".")
-        obj = getattr(host_state, path[0], None)
-        if obj is None:
-            return None
-        for item in path[1:]:
-            obj = obj.get(item, None)
+        attr = path[0]
+        keys = path[1:]
+
+        def lookup(host_state):
+            obj = getattr(host_state, attr, None)
             if obj is None:
                 return None
-        return obj
-
-    def _process_filter(self, query, host_state):
-        """Recursively parse the query structure."""
+            for item in keys:
+                obj = obj.get(item, None)
+                if obj is None:
+                    return None
+            return obj
+        return lookup
+
+    def _compile_filter(self, query):
+        """Compile the query structure into a function of a host state.
+
+        The whole query is checked here, so an unknown command raises
+        before any host is looked at.  Arguments that can only ever be
+        None are dropped here rather than for each host.
+        """
         if not query:
-            return True
+            return lambda host_state: True
         cmd = query[0]
         method = self.commands[cmd]
-        cooked_args = []
+        arg_fns = []
         for arg in query[1:]:
             if isinstance(arg, list):
-                arg = self._process_filter(arg, host_state)
+                arg_fns.append(self._compile_filter(arg))
             elif isinstance(arg, basestring):
-                arg = self._parse_string(arg, host_state)
-            if arg is not None:
-                cooked_args.append(arg)
-        result = method(self, cooked_args)
-        return result
+                if arg:
+                    arg_fns.append(self._compile_string(arg))
+            elif arg is not None:
+                arg_fns.append(self._constant(arg))
+
+        def evaluate(host_state):
+            cooked_args = []
+            for arg_fn in arg_fns:
+                arg = arg_fn(host_state)
+                if arg is not None:
+                    cooked_args.append(arg)
+            return method(self, cooked_args)
+        return evaluate
+
+    @staticmethod
+    def _constant(value):
+        return lambda host_state: value
+
+    def _compile_query(self, query):
+        """Parse and compile the query hint.
+
+        Returns a function telling whether a host state satisfies it.
+        """
+        evaluate = self._compile_filter(jsonutils.loads(query))
+
+        def matches(host_state):
+            result = evaluate(host_state)
+            if isinstance(result, list):
+                # If any succeeded, include the host
+                result = any(result)
+            return bool(result)
+        return matches
+
+    def _get_query(self, filter_properties):
+        try:
+            return filter_properties['scheduler_hints']['query']
+        except KeyError:
+            return None
+
+    def _get_compiled_query(self, query):
+        if query not in self._compiled_queries:
+            self._compiled_queries[query] = self._compile_query(query)
+        return self._compiled_queries[query]
+
+    def prepare(self, filter_request, hosts):
+        """Compile the query once for the whole request."""
+        query = self._get_query(filter_request.filter_properties)
+        if query:
+            self._compiled_queries[query] = filter_request.cached(
+                    ('json_filter', query), self._compile_query, query)
 
     def host_passes(self, host_state, filter_properties):
         """Return a list of hosts that can fulfill the requirements
         specified in the query.
         """
-        try:
-            query = filter_properties['scheduler_hints']['query']
-        except KeyError:
-            query = None
+        query = self._get_query(filter_properties)
         if not query:
             return True
 
         # NOTE(comstud): Not checking capabilities or service for
         # enabled/disabled so that a provided json filter can decide
 
-        result = self._process_filter(jsonutils.loads(query), host_state)
-        if isinstance(result, list):
-            # If any succeeded, include the host
-            result = any(result)
-        if result:
-            # Filter it out.
-            return True
-        return False
+        return self._get_compiled_query(query)(host_state)
@@ -35,8 +35,8 @@ class RetryFilter(filters.BaseHostFilter):
         hosts = retry.get('hosts', [])
         host = host_state.host
 
-        LOG.debug(_("Previously tried hosts: %(hosts)s.  (host=%(host)s)") %
-                locals())
+        LOG.debug(_("Previously tried hosts: %(hosts)s.  (host=%(host)s)"),
+                  locals())
 
         # Host passes if it's not in the list of previously attempted hosts:
         return host not in hosts
@@ -38,6 +38,11 @@ the config file will look something like:
 
 Details on the specific parameters can be found in the file `trust_attest.py'.
 
+Trust levels are cached for `attestation_cache_ttl' seconds.  The hosts
+being filtered that are not cached are attested together in one request,
+and cached hosts are attested again in the background once their result
+is half way to expiring.
+
 Details on setting up and using an Attestation Service can be found at
 the Open Attestation project at:
 
@@ -48,10 +53,13 @@ import httplib
 import socket
 import ssl
 
+from eventlet import greenthread
+
 from nova import flags
 from nova.openstack.common import cfg
 from nova.openstack.common import jsonutils
 from nova.openstack.common import log as logging
+from nova.openstack.common import timeutils
 from nova.scheduler import filters
 
 
@@ -73,6 +81,10 @@ trusted_opts = [
     cfg.StrOpt('auth_blob',
                default=None,
                help='attestation authorization blob - must change'),
+    cfg.IntOpt('attestation_cache_ttl',
+               default=60,
+               help='seconds a host trust level is cached for, 0 to '
+                    'attest the hosts on every request'),
 ]
 
 FLAGS = flags.FLAGS
@@ -151,10 +163,10 @@ class AttestationService(httplib.HTTPSConnection):
         except (socket.error, IOError) as e:
             return IOError, None
 
-    def _request(self, cmd, subcmd, host):
+    def _request(self, cmd, subcmd, hosts):
         body = {}
-        body['count'] = 1
-        body['hosts'] = host
+        body['count'] = len(hosts)
+        body['hosts'] = hosts
         cooked = jsonutils.dumps(body)
         headers = {}
         headers['content-type'] = 'application/json'
@@ -168,38 +180,123 @@ class AttestationService(httplib.HTTPSConnection):
         else:
             return status, None
 
-    def _check_trust(self, data, host):
-        for item in data:
-            for state in item['hosts']:
-                if state['host_name'] == host:
-                    return state['trust_lvl']
-        return ""
+    def attest_hosts(self, hosts):
+        """Get the trust levels of hosts in a single request.
 
-    def do_attestation(self, host):
-        state = []
-        status, data = self._request("POST", "PollHosts", host)
+        Returns a dict of the trust level of each host, which is empty
+        for hosts the attestation server does not know, or None if the
+        request failed.
+        """
+        status, data = self._request("POST", "PollHosts", hosts)
         if status != httplib.OK:
+            return None
+        levels = dict((host, "") for host in hosts)
+        for state in data['hosts']:
+            if state['host_name'] in levels:
+                levels[state['host_name']] = state['trust_lvl']
+        return levels
+
+    def do_attestation(self, host):
+        levels = self.attest_hosts([host])
+        if levels is None:
             return {}
-        state.append(data)
-        return self._check_trust(state, host)
+        return levels[host]
+
+
+class ComputeAttestationCache(object):
+    """Cache of the trust levels of compute hosts."""
+
+    def __init__(self):
+        self.attestation_service = AttestationService()
+        self._levels = {}  # { <host> : (<trust level>, <attested at>) }
+        self._refreshing = set()
+
+    def _attest(self, hosts):
+        levels = self.attestation_service.attest_hosts(hosts)
+        if levels is None:
+            LOG.warn(_("TCP: failed to attest %(count)d hosts"),
+                     {'count': len(hosts)})
+            return {}
+        now = timeutils.utcnow_ts()
+        for host, level in levels.iteritems():
+            self._levels[host] = (level, now)
+        return levels
+
+    def _refresh(self, hosts):
+        try:
+            self._attest(hosts)
+        except Exception:
+            LOG.exception(_("TCP: background attestation failed"))
+        finally:
+            self._refreshing.difference_update(hosts)
+
+    def get_levels(self, hosts):
+        """Return a dict of the trust level of each of hosts.
+
+        Hosts that could not be attested are left out.
+        """
+        ttl = FLAGS.trusted_computing.attestation_cache_ttl
+        now = timeutils.utcnow_ts()
+        levels = {}
+        expired = []
+        refresh = []
+        for host in hosts:
+            entry = self._levels.get(host)
+            if entry is None or now - entry[1] >= ttl:
+                expired.append(host)
+                continue
+            levels[host] = entry[0]
+            if now - entry[1] >= ttl / 2.0 and host not in self._refreshing:
+                refresh.append(host)
+
+        if expired:
+            levels.update(self._attest(expired))
+        if refresh:
+            self._refreshing.update(refresh)
+            greenthread.spawn_n(self._refresh, refresh)
+        return levels
+
+
+_ATTESTATION_CACHE = None
+
+
+def get_attestation_cache():
+    """Return the process wide cache of compute host trust levels."""
+    global _ATTESTATION_CACHE
+    if _ATTESTATION_CACHE is None:
+        _ATTESTATION_CACHE = ComputeAttestationCache()
+    return _ATTESTATION_CACHE
 
 
 class TrustedFilter(filters.BaseHostFilter):
     """Trusted filter to support Trusted Compute Pools."""
 
     def __init__(self):
-        self.attestation_service = AttestationService()
+        self.compute_attestation = get_attestation_cache()
+        self._levels = None
+
+    def _get_trust(self, filter_properties):
+        instance = filter_properties.get('instance_type', {})
+        extra = instance.get('extra_specs', {})
+        return extra.get('trusted_host')
+
+    def prepare(self, filter_request, hosts):
+        """Look up the trust levels of all the hosts at once."""
+        if self._get_trust(filter_request.filter_properties):
+            self._levels = self.compute_attestation.get_levels(
+                    [host_state.host for host_state in hosts])
 
     def _is_trusted(self, host, trust):
-        level = self.attestation_service.do_attestation(host)
+        if self._levels is not None:
+            level = self._levels.get(host)
+        else:
+            level = self.compute_attestation.get_levels([host]).get(host)
         LOG.debug(_("TCP: trust state of "
-                    "%(host)s:%(level)s(%(trust)s)") % locals())
+                    "%(host)s:%(level)s(%(trust)s)"), locals())
         return trust == level
 
     def host_passes(self, host_state, filter_properties):
-        instance = filter_properties.get('instance_type', {})
-        extra = instance.get('extra_specs', {})
-        trust = extra.get('trusted_host')
+        trust = self._get_trust(filter_properties)
         host = host_state.host
         if trust:
             return self._is_trusted(host, trust)
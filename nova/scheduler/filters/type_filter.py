@@ -35,5 +35,6 @@ class TypeAffinityFilter(filters.BaseHostFilter):
         instance_type = filter_properties.get('instance_type')
         context = filter_properties['context'].elevated()
         instances_other_type = db.instance_get_all_by_host_and_not_type(
-                     context, host_state.host, instance_type['id'])
+                     context, host_state.host, instance_type['id'],
+                     columns_to_join=[])
         return len(instances_other_type) == 0
@@ -159,8 +159,7 @@ class HostState(object):
             if not filter_fn(self, filter_properties):
                 LOG.debug(_('Host filter function %(func)s failed for '
                             '%(host)s'),
-                          {'func': repr(filter_fn),
-                           'host': self.host})
+                          {'func': filter_fn, 'host': self.host})
                 return False
 
         LOG.debug(_('Host filter passes for %(host)s'), {'host': self.host})
@@ -176,6 +175,7 @@ class HostManager(object):
 
     # Can be overriden in a subclass
     host_state_cls = HostState
+    filter_request_cls = filters.FilterRequest
 
     def __init__(self):
         self.service_states = {}  # { <host> : { <service> : { cap k : v }}}
@@ -199,12 +199,7 @@ class HostManager(object):
             for cls in self.filter_classes:
                 if cls.__name__ == filter_name:
                     found_class = True
-                    filter_instance = cls()
-                    # Get the filter function
-                    filter_func = getattr(filter_instance,
-                            'host_passes', None)
-                    if filter_func:
-                        good_filters.append(filter_func)
+                    good_filters.append(cls())
                     break
             if not found_class:
                 bad_filters.append(filter_name)
@@ -213,10 +208,22 @@ class HostManager(object):
             raise exception.SchedulerHostFilterNotFound(filter_name=msg)
         return good_filters
 
-    def filter_hosts(self, hosts, filter_properties, filters=None):
-        """Filter hosts and return only ones passing all filters"""
+    def filter_hosts(self, hosts, filter_properties, filters=None,
+                     filter_request=None):
+        """Filter hosts and return only ones passing all filters.
+
+        Pass the same filter_request to every call made for one scheduling
+        request so that what the filters cache in it is shared between the
+        calls.
+        """
+        if filter_request is None:
+            filter_request = self.filter_request_cls(filter_properties)
+        hosts = list(hosts)
         filtered_hosts = []
-        filter_fns = self._choose_host_filters(filters)
+        filter_objs = self._choose_host_filters(filters)
+        for filter_obj in filter_objs:
+            filter_obj.prepare(filter_request, hosts)
+        filter_fns = [filter_obj.host_passes for filter_obj in filter_objs]
         for host in hosts:
             if host.passes_filters(filter_fns, filter_properties):
                 filtered_hosts.append(host)
@@ -225,7 +232,7 @@ class HostManager(object):
     def update_service_capabilities(self, service_name, host, capabilities):
         """Update the per-service capabilities based on this notification."""
         LOG.debug(_("Received %(service_name)s service update from "
-                    "%(host)s.") % locals())
+                    "%(host)s."), locals())
         service_caps = self.service_states.get(host, {})
         # Copy the capabilities, so we don't modify the original dict
         capab_copy = dict(capabilities)
@@ -268,8 +275,8 @@ class HostManager(object):
             host_state_map[host] = host_state
 
         # "Consume" resources from the host the instance resides on.
-        instances = db.instance_get_all(context,
-                columns_to_join=['instance_type'])
+        # Only the instances' own columns are used.
+        instances = db.instance_get_all(context, columns_to_join=[])
         for instance in instances:
             host = instance['host']
             if not host:
@@ -239,7 +239,8 @@ class SchedulerManager(manager.Manager):
         compute_ref = db.service_get_all_compute_by_host(context, host)
         compute_ref = compute_ref[0]
         instance_refs = db.instance_get_all_by_host(context,
-                                                    compute_ref['host'])
+                                                    compute_ref['host'],
+                                                    columns_to_join=[])
 
         # Getting total available/used resource
         compute_ref = compute_ref['compute_node'][0]
@@ -530,23 +530,17 @@ class Service(object):
     def report_state(self):
         """Update the state of this service in the datastore."""
         ctxt = context.get_admin_context()
-        zone = FLAGS.node_availability_zone
-        state_catalog = {}
+        # NOTE: the heartbeat is a single blind update; the zone is sent
+        # along every time rather than read back to see if it changed
+        state_catalog = {'availability_zone': FLAGS.node_availability_zone}
         try:
             try:
-                service_ref = db.service_get(ctxt, self.service_id)
+                db.service_heartbeat(ctxt, self.service_id, state_catalog)
             except exception.NotFound:
                 LOG.debug(_('The service database object disappeared, '
                             'Recreating it.'))
                 self._create_service_ref(ctxt)
-                service_ref = db.service_get(ctxt, self.service_id)
-
-            state_catalog['report_count'] = service_ref['report_count'] + 1
-            if zone != service_ref['availability_zone']:
-                state_catalog['availability_zone'] = zone
-
-            db.service_update(ctxt,
-                             self.service_id, state_catalog)
+                db.service_heartbeat(ctxt, self.service_id, state_catalog)
 
             # TODO(termie): make this pattern be more elegant.
             if getattr(self, 'model_disconnected', False):
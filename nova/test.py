@@ -54,6 +54,18 @@ FLAGS.register_opts(test_opts)
 
 LOG = logging.getLogger(__name__)
 
+_RESET_HOOKS = []
+
+
+def add_reset_hook(func):
+    """Have func called at the start of every test.
+
+    For test modules whose code under test keeps process wide caches of
+    database rows, which go stale when the database is reset.
+    """
+    if func not in _RESET_HOOKS:
+        _RESET_HOOKS.append(func)
+
 
 class skip_test(object):
     """Decorator that skips a test."""
@@ -131,6 +143,8 @@ class TestCase(unittest.TestCase):
         #             to work properly.
         self.start = timeutils.utcnow()
         tests.reset_db()
+        for reset_hook in _RESET_HOOKS:
+            reset_hook()
 
         # emulate some of the mox stuff, we can't use the metaclass
         # because it screws with our generators
@@ -17,3 +17,8 @@
 
 # NOTE(vish): this forces the fixtures from tests/__init.py:setup() to work
 from nova.tests import *
+
+from nova.api.ec2 import ec2utils
+from nova import test
+
+test.add_reset_hook(ec2utils.reset_cache)
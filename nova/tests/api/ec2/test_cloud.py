@@ -1120,6 +1120,29 @@ class CloudTestCase(test.TestCase):
 
         self._tearDownBlockDeviceMapping(inst1, inst2, volumes)
 
+    def test_glance_ids_to_ids_batches_lookups(self):
+        known = ['cedef40a-ed67-4d10-800e-17455edce175',
+                 '76fa36fc-c930-4bf3-8c8a-ea2a2420deb6']
+        new = 'b9a4b8e5-cbd3-4bb3-9bd1-4e9f3f9e1b0e'
+
+        def fake_lookup(*args, **kwargs):
+            self.fail('unexpected s3_images lookup')
+
+        self.stubs.Set(db, 's3_image_get_by_uuid', fake_lookup)
+        ids = ec2utils.glance_ids_to_ids(self.context, known + [new, None])
+        self.assertEqual(ids, {known[0]: 1, known[1]: 2, new: 3})
+
+        # Mappings never change, so later lookups are served from memory
+        self.stubs.Set(db, 's3_image_get_by_uuids', fake_lookup)
+        self.stubs.Set(db, 's3_image_get', fake_lookup)
+        self.assertEqual(ec2utils.glance_ids_to_ids(self.context, known),
+                         {known[0]: 1, known[1]: 2})
+        self.assertEqual(ec2utils.glance_id_to_ec2_id(self.context, new),
+                         'ami-00000003')
+        self.assertEqual(ec2utils.ec2_id_to_glance_id(self.context,
+                                                      'ami-00000001'),
+                         known[0])
+
     def test_describe_images(self):
         describe_images = self.cloud.describe_images
 
@@ -18,6 +18,7 @@ import webob
 
 from nova.api.openstack.compute.contrib import extended_server_attributes
 from nova import compute
+from nova import db
 from nova import exception
 from nova import flags
 from nova.openstack.common import jsonutils
@@ -44,6 +45,11 @@ def fake_compute_get_all(*args, **kwargs):
     ]
 
 
+def fake_compute_node_get_by_hosts(context, hosts):
+    return dict((host, {'hypervisor_hostname': 'node-%s' % host})
+                for host in hosts)
+
+
 class ExtendedServerAttributesTest(test.TestCase):
     content_type = 'application/json'
     prefix = 'OS-EXT-SRV-ATTR:'
@@ -53,6 +59,8 @@ class ExtendedServerAttributesTest(test.TestCase):
         fakes.stub_out_nw_api(self.stubs)
         self.stubs.Set(compute.api.API, 'get', fake_compute_get)
         self.stubs.Set(compute.api.API, 'get_all', fake_compute_get_all)
+        self.stubs.Set(db, 'compute_node_get_by_hosts',
+                       fake_compute_node_get_by_hosts)
 
     def _make_request(self, url):
         req = webob.Request.blank(url)
@@ -90,6 +98,21 @@ class ExtendedServerAttributesTest(test.TestCase):
                                     host='host-%s' % (i + 1),
                                     instance_name='instance-%s' % (i + 1))
 
+    def test_detail_looks_up_compute_nodes_once(self):
+        calls = []
+
+        def compute_node_get_by_hosts(context, hosts):
+            calls.append(sorted(hosts))
+            return fake_compute_node_get_by_hosts(context, hosts)
+
+        self.stubs.Set(db, 'compute_node_get_by_hosts',
+                       compute_node_get_by_hosts)
+        url = '/v2/fake/servers/detail'
+        res = self._make_request(url)
+
+        self.assertEqual(res.status_int, 200)
+        self.assertEqual(calls, [['host-1', 'host-2']])
+
     def test_no_instance_passthrough_404(self):
 
         def fake_compute_get(*args, **kwargs):
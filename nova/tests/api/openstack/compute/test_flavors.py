@@ -60,26 +60,38 @@ def fake_instance_type_get_by_flavor_id(flavorid):
     return FAKE_FLAVORS['flavor %s' % flavorid]
 
 
-def fake_instance_type_get_all(inactive=False, filters=None):
+def fake_get_all_flavors_sorted_list(inactive=False, filters=None,
+                                     sort_key='flavorid', sort_dir='asc',
+                                     limit=None, marker=None):
     def reject_min(db_attr, filter_attr):
         return (filter_attr in filters and
                 int(flavor[db_attr]) < int(filters[filter_attr]))
 
     filters = filters or {}
-    output = {}
-    for (flavor_name, flavor) in FAKE_FLAVORS.items():
+    output = []
+    for flavor in sorted(FAKE_FLAVORS.values(),
+                         key=lambda item: item[sort_key],
+                         reverse=sort_dir == 'desc'):
+        if marker is not None:
+            if flavor['flavorid'] == marker:
+                marker = None
+            continue
         if reject_min('memory_mb', 'min_memory_mb'):
             continue
         elif reject_min('root_gb', 'min_root_gb'):
             continue
 
-        output[flavor_name] = flavor
+        output.append(flavor)
 
-    return output
+    if marker is not None:
+        raise exception.MarkerNotFound(marker=marker)
+    return output[:limit]
 
 
-def empty_instance_type_get_all(inactive=False, filters=None):
-    return {}
+def empty_get_all_flavors_sorted_list(inactive=False, filters=None,
+                                      sort_key='flavorid', sort_dir='asc',
+                                      limit=None, marker=None):
+    return []
 
 
 def return_instance_type_not_found(flavor_id):
@@ -91,8 +103,9 @@ class FlavorsTest(test.TestCase):
         super(FlavorsTest, self).setUp()
         fakes.stub_out_networking(self.stubs)
         fakes.stub_out_rate_limiting(self.stubs)
-        self.stubs.Set(nova.compute.instance_types, "get_all_types",
-                       fake_instance_type_get_all)
+        self.stubs.Set(nova.compute.instance_types,
+                       "get_all_flavors_sorted_list",
+                       fake_get_all_flavors_sorted_list)
         self.stubs.Set(nova.compute.instance_types,
                        "get_instance_type_by_flavor_id",
                        fake_instance_type_get_by_flavor_id)
@@ -228,6 +241,11 @@ class FlavorsTest(test.TestCase):
         }
         self.assertDictMatch(flavor, expected)
 
+    def test_get_flavor_list_with_bad_marker(self):
+        req = fakes.HTTPRequest.blank('/v2/fake/flavors?marker=asdf')
+        self.assertRaises(webob.exc.HTTPBadRequest,
+                          self.controller.index, req)
+
     def test_get_flavor_detail_with_limit(self):
         req = fakes.HTTPRequest.blank('/v2/fake/flavors/detail?limit=1')
         response = self.controller.index(req)
@@ -356,8 +374,9 @@ class FlavorsTest(test.TestCase):
         self.assertEqual(flavor, expected)
 
     def test_get_empty_flavor_list(self):
-        self.stubs.Set(nova.compute.instance_types, "get_all_types",
-                       empty_instance_type_get_all)
+        self.stubs.Set(nova.compute.instance_types,
+                       "get_all_flavors_sorted_list",
+                       empty_get_all_flavors_sorted_list)
 
         req = fakes.HTTPRequest.blank('/v2/fake/flavors')
         flavors = self.controller.index(req)
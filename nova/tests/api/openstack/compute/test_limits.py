@@ -18,6 +18,7 @@ Tests dealing with HTTP rate-limiting.
 """
 
 import httplib
+import socket
 import StringIO
 from xml.dom import minidom
 
@@ -597,6 +598,82 @@ class LimiterTest(BaseLimitTestSuite):
         self.assertEqual(expected, results)
 
 
+class LimitMatcherTest(test.TestCase):
+    """
+    Tests for the `limits.LimitMatcher` class.
+    """
+
+    def test_match(self):
+        matcher = limits.LimitMatcher(TEST_LIMITS)
+        self.assertEqual(matcher.match("GET", "/delayed/1"), [0])
+        self.assertEqual(matcher.match("GET", "/servers"), [])
+        self.assertEqual(matcher.match("POST", "/servers/1"), [1, 2])
+        self.assertEqual(matcher.match("POST", "/images"), [1])
+        self.assertEqual(matcher.match("PUT", ""), [3])
+        self.assertEqual(matcher.match("DELETE", "/servers"), [])
+
+    def test_match_regexes_with_groups(self):
+        matcher = limits.LimitMatcher([
+            limits.Limit("GET", "*", "^/(servers|images)", 1, 1),
+            limits.Limit("GET", "*", "(?i)^/SERVERS", 1, 1),
+            limits.Limit("GET", "*", "^/servers/detail", 1, 1),
+        ])
+        self.assertEqual(matcher.match("GET", "/servers/detail"),
+                         [2, 0, 1])
+        self.assertEqual(matcher.match("GET", "/images"), [0])
+
+
+class LimitStoreTest(BaseLimitTestSuite):
+    """
+    Tests for the stores of the limit state of each user.
+    """
+
+    def test_local_store_forgets_least_recent_users(self):
+        self.flags(rate_limit_max_users=2)
+        limiter = limits.Limiter(TEST_LIMITS)
+        for username in ("user1", "user2", "user1", "user3"):
+            limiter.check_for_delay("GET", "/delayed", username)
+
+        self.assertEqual(limiter.check_for_delay("GET", "/delayed",
+                                                 "user1")[0], 60.0)
+        self.assertEqual(limiter.check_for_delay("GET", "/delayed",
+                                                 "user2"), (None, None))
+
+    def test_local_store_keeps_recently_updated_users(self):
+        self.flags(rate_limit_max_users=3)
+        store = limits.LocalLimitStore()
+
+        def set_state(value):
+            return lambda state: (state, value)
+
+        for i in xrange(100):
+            # user0 is updated between each new user, so it is never the
+            # least recently seen when the store is full
+            store.update('user0', set_state(i), 60)
+            store.update('user%d' % (i + 1), set_state(i), 60)
+            self.assertTrue(len(store._updates) <= 2 * len(store._states))
+
+        self.assertEqual(sorted(store._states),
+                         ['user0', 'user100', 'user99'])
+        self.assertEqual(store.get('user0'), 99)
+        self.assertEqual(store.get('user98'), None)
+
+    def test_memcached_store_shared(self):
+        self.flags(rate_limit_store='nova.api.openstack.compute.limits.'
+                                    'MemcachedLimitStore')
+        limiter1 = limits.Limiter(TEST_LIMITS)
+        limiter2 = limits.Limiter(TEST_LIMITS)
+        limiter2._store.mc = limiter1._store.mc
+
+        self.assertEqual(limiter1.check_for_delay("GET", "/delayed",
+                                                  "user1"), (None, None))
+        self.assertEqual(limiter2.check_for_delay("GET", "/delayed",
+                                                  "user1")[0], 60.0)
+        self.assertEqual(limiter2.get_limits("user1")[0]["remaining"], 0)
+        self.assertEqual(limiter2.check_for_delay("GET", "/delayed",
+                                                  "user2"), (None, None))
+
+
 class WsgiLimiterTest(BaseLimitTestSuite):
     """
     Tests for `limits.WsgiLimiter` class.
@@ -687,12 +764,15 @@ class FakeHttplibConnection(object):
     Fake `httplib.HTTPConnection`.
     """
 
+    http_version = "HTTP/1.0"
+
     def __init__(self, app, host):
         """
         Initialize `FakeHttplibConnection`.
         """
         self.app = app
         self.host = host
+        self.closed = False
 
     def request(self, method, path, body="", headers=None):
         """
@@ -710,7 +790,7 @@ class FakeHttplibConnection(object):
         req.body = body
 
         resp = str(req.get_response(self.app))
-        resp = "HTTP/1.0 %s" % resp
+        resp = "%s %s" % (self.http_version, resp)
         sock = FakeHttplibSocket(resp)
         self.http_response = httplib.HTTPResponse(sock)
         self.http_response.begin()
@@ -719,6 +799,9 @@ class FakeHttplibConnection(object):
         """Return our generated response from the request."""
         return self.http_response
 
+    def close(self):
+        self.closed = True
+
 
 def wire_HTTPConnection_to_WSGI(host, app):
     """Monkeypatches HTTPConnection so that if you try to connect to host, you
@@ -791,9 +874,36 @@ class WsgiLimiterProxyTest(BaseLimitTestSuite):
 
         self.assertEqual((delay, error), expected)
 
+    def test_connection_reused(self):
+        self.stubs.Set(FakeHttplibConnection, 'http_version', 'HTTP/1.1')
+        self.proxy.check_for_delay("GET", "/anything")
+        self.assertEqual(len(self.proxy._connections), 1)
+        conn = self.proxy._connections[0]
+
+        delay = self.proxy.check_for_delay("GET", "/anything")
+        self.assertEqual(delay, (None, None))
+        self.assertEqual(self.proxy._connections, [conn])
+        self.assertFalse(conn.closed)
+
+    def test_closing_connection_not_reused(self):
+        self.proxy.check_for_delay("GET", "/anything")
+        self.assertEqual(self.proxy._connections, [])
+
+    def test_stale_connection_replaced(self):
+        class StaleConnection(FakeHttplibConnection):
+            def request(self, *args, **kwargs):
+                raise socket.error()
+
+        stale = StaleConnection(self.app, "169.254.0.1:80")
+        self.proxy._connections.append(stale)
+        delay = self.proxy.check_for_delay("GET", "/anything")
+        self.assertEqual(delay, (None, None))
+        self.assertTrue(stale.closed)
+
     def tearDown(self):
         # restore original HTTPConnection object
         httplib.HTTPConnection = self.oldHTTPConnection
+        super(WsgiLimiterProxyTest, self).tearDown()
 
 
 class LimitsViewBuilderTest(test.TestCase):
@@ -28,6 +28,7 @@ from nova.api.openstack.compute import ips
 from nova.api.openstack.compute import servers
 from nova.api.openstack.compute import views
 from nova.api.openstack import extensions
+from nova.api.openstack import wsgi
 from nova.api.openstack import xmlutil
 import nova.compute.api
 from nova.compute import instance_types
@@ -35,6 +36,7 @@ from nova.compute import task_states
 from nova.compute import vm_states
 import nova.db
 from nova.db.sqlalchemy import models
+from nova import exception
 from nova import flags
 from nova.openstack.common import jsonutils
 import nova.openstack.common.rpc
@@ -577,11 +579,60 @@ class ServersControllerTest(test.TestCase):
         self.assertRaises(webob.exc.HTTPBadRequest,
                           self.controller.index, req)
 
+    def test_get_servers_streamed(self):
+        self.flags(osapi_server_list_batch_size=2)
+        instances = [fakes.stub_instance(i, uuid=fakes.get_fake_uuid(i))
+                     for i in xrange(5)]
+        calls = []
+
+        def fake_get_all(compute_self, context, search_opts=None,
+                         sort_key=None, sort_dir='desc', limit=None,
+                         marker=None):
+            calls.append((limit, marker))
+            start = 0
+            if marker:
+                start = [i['uuid'] for i in instances].index(marker) + 1
+            return instances[start:start + limit]
+
+        self.stubs.Set(nova.compute.API, 'get_all', fake_get_all)
+
+        req = fakes.HTTPRequest.blank('/v2/fake/servers?limit=3')
+        resp_obj = self.controller.index(req)
+        self.assertTrue(isinstance(resp_obj, wsgi.StreamingResponseObject))
+        # Only the first batch is read before the response is sent
+        self.assertEqual(calls, [(2, None)])
+
+        resp_obj.collect()
+        self.assertEqual([s['id'] for s in resp_obj.obj['servers']],
+                         [fakes.get_fake_uuid(i) for i in xrange(3)])
+        self.assertEqual(calls, [(2, None), (1, fakes.get_fake_uuid(1))])
+
+        servers_links = resp_obj.obj['servers_links']
+        href_parts = urlparse.urlparse(servers_links[0]['href'])
+        params = urlparse.parse_qs(href_parts.query)
+        self.assertDictMatch({'limit': ['3'],
+                              'marker': [fakes.get_fake_uuid(2)]}, params)
+
+    def test_get_servers_streamed_with_bad_marker(self):
+        self.flags(osapi_server_list_batch_size=2)
+
+        def fake_get_all(compute_self, context, search_opts=None,
+                         sort_key=None, sort_dir='desc', limit=None,
+                         marker=None):
+            raise exception.MarkerNotFound(marker=marker)
+
+        self.stubs.Set(nova.compute.API, 'get_all', fake_get_all)
+
+        req = fakes.HTTPRequest.blank('/v2/fake/servers?marker=asdf')
+        self.assertRaises(webob.exc.HTTPBadRequest,
+                          self.controller.index, req)
+
     def test_get_servers_with_bad_option(self):
         server_uuid = str(utils.gen_uuid())
 
         def fake_get_all(compute_self, context, search_opts=None,
-                         sort_key=None, sort_dir='desc'):
+                         sort_key=None, sort_dir='desc', limit=None,
+                         marker=None):
             return [fakes.stub_instance(100, uuid=server_uuid)]
 
         self.stubs.Set(nova.compute.API, 'get_all', fake_get_all)
@@ -596,7 +647,8 @@ class ServersControllerTest(test.TestCase):
         server_uuid = str(utils.gen_uuid())
 
         def fake_get_all(compute_self, context, search_opts=None,
-                         sort_key=None, sort_dir='desc'):
+                         sort_key=None, sort_dir='desc', limit=None,
+                         marker=None):
             self.assertNotEqual(search_opts, None)
             self.assertTrue('image' in search_opts)
             self.assertEqual(search_opts['image'], '12345')
@@ -612,7 +664,7 @@ class ServersControllerTest(test.TestCase):
 
     def test_tenant_id_filter_converts_to_project_id_for_admin(self):
         def fake_get_all(context, filters=None, sort_key=None,
-                         sort_dir='desc'):
+                         sort_dir='desc', limit=None, marker=None):
             self.assertNotEqual(filters, None)
             self.assertEqual(filters['project_id'], 'fake')
             self.assertFalse(filters.get('tenant_id'))
@@ -629,7 +681,7 @@ class ServersControllerTest(test.TestCase):
 
     def test_admin_restricted_tenant(self):
         def fake_get_all(context, filters=None, sort_key=None,
-                         sort_dir='desc'):
+                         sort_dir='desc', limit=None, marker=None):
             self.assertNotEqual(filters, None)
             self.assertEqual(filters['project_id'], 'fake')
             return [fakes.stub_instance(100)]
@@ -645,7 +697,7 @@ class ServersControllerTest(test.TestCase):
 
     def test_admin_all_tenants(self):
         def fake_get_all(context, filters=None, sort_key=None,
-                         sort_dir='desc'):
+                         sort_dir='desc', limit=None, marker=None):
             self.assertNotEqual(filters, None)
             self.assertTrue('project_id' not in filters)
             return [fakes.stub_instance(100)]
@@ -661,7 +713,7 @@ class ServersControllerTest(test.TestCase):
 
     def test_all_tenants(self):
         def fake_get_all(context, filters=None, sort_key=None,
-                         sort_dir='desc'):
+                         sort_dir='desc', limit=None, marker=None):
             self.assertNotEqual(filters, None)
             self.assertEqual(filters['project_id'], 'fake')
             return [fakes.stub_instance(100)]
@@ -678,7 +730,8 @@ class ServersControllerTest(test.TestCase):
         server_uuid = str(utils.gen_uuid())
 
         def fake_get_all(compute_self, context, search_opts=None,
-                         sort_key=None, sort_dir='desc'):
+                         sort_key=None, sort_dir='desc', limit=None,
+                         marker=None):
             self.assertNotEqual(search_opts, None)
             self.assertTrue('flavor' in search_opts)
             # flavor is an integer ID
@@ -697,7 +750,8 @@ class ServersControllerTest(test.TestCase):
         server_uuid = str(utils.gen_uuid())
 
         def fake_get_all(compute_self, context, search_opts=None,
-                         sort_key=None, sort_dir='desc'):
+                         sort_key=None, sort_dir='desc', limit=None,
+                         marker=None):
             self.assertNotEqual(search_opts, None)
             self.assertTrue('vm_state' in search_opts)
             self.assertEqual(search_opts['vm_state'], vm_states.ACTIVE)
@@ -721,7 +775,8 @@ class ServersControllerTest(test.TestCase):
         server_uuid = str(utils.gen_uuid())
 
         def fake_get_all(compute_self, context, search_opts=None,
-                         sort_key=None, sort_dir='desc'):
+                         sort_key=None, sort_dir='desc', limit=None,
+                         marker=None):
             self.assertNotEqual(search_opts, None)
             self.assertTrue('name' in search_opts)
             self.assertEqual(search_opts['name'], 'whee.*')
@@ -739,7 +794,8 @@ class ServersControllerTest(test.TestCase):
         server_uuid = str(utils.gen_uuid())
 
         def fake_get_all(compute_self, context, search_opts=None,
-                         sort_key=None, sort_dir='desc'):
+                         sort_key=None, sort_dir='desc', limit=None,
+                         marker=None):
             self.assertNotEqual(search_opts, None)
             self.assertTrue('changes-since' in search_opts)
             changes_since = datetime.datetime(2011, 1, 24, 17, 8, 1,
@@ -770,7 +826,8 @@ class ServersControllerTest(test.TestCase):
         server_uuid = str(utils.gen_uuid())
 
         def fake_get_all(compute_self, context, search_opts=None,
-                         sort_key=None, sort_dir='desc'):
+                         sort_key=None, sort_dir='desc', limit=None,
+                         marker=None):
             self.assertNotEqual(search_opts, None)
             # Allowed by user
             self.assertTrue('name' in search_opts)
@@ -798,7 +855,8 @@ class ServersControllerTest(test.TestCase):
         server_uuid = str(utils.gen_uuid())
 
         def fake_get_all(compute_self, context, search_opts=None,
-                         sort_key=None, sort_dir='desc'):
+                         sort_key=None, sort_dir='desc', limit=None,
+                         marker=None):
             self.assertNotEqual(search_opts, None)
             # Allowed by user
             self.assertTrue('name' in search_opts)
@@ -826,7 +884,8 @@ class ServersControllerTest(test.TestCase):
         server_uuid = str(utils.gen_uuid())
 
         def fake_get_all(compute_self, context, search_opts=None,
-                         sort_key=None, sort_dir='desc'):
+                         sort_key=None, sort_dir='desc', limit=None,
+                         marker=None):
             self.assertNotEqual(search_opts, None)
             self.assertTrue('ip' in search_opts)
             self.assertEqual(search_opts['ip'], '10\..*')
@@ -848,7 +907,8 @@ class ServersControllerTest(test.TestCase):
         server_uuid = str(utils.gen_uuid())
 
         def fake_get_all(compute_self, context, search_opts=None,
-                         sort_key=None, sort_dir='desc'):
+                         sort_key=None, sort_dir='desc', limit=None,
+                         marker=None):
             self.assertNotEqual(search_opts, None)
             self.assertTrue('ip6' in search_opts)
             self.assertEqual(search_opts['ip6'], 'ffff.*')
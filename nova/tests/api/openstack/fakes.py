@@ -271,6 +271,7 @@ def stub_out_glance(stubs):
     stubs.Set(nova.image.glance,
               'get_default_image_service',
               fake_get_remote_image_service)
+    stubs.Set(nova.image.glance, '_IMAGE_META_CACHE', None)
 
 
 class FakeToken(object):
@@ -382,13 +383,20 @@ def fake_instance_get(**kwargs):
 
 
 def fake_instance_get_all_by_filters(num_servers=5, **kwargs):
-    def _return_servers(context, *args, **kwargs):
+    def _return_servers(context, filters=None, sort_key=None,
+                        sort_dir='desc', limit=None, marker=None):
         servers_list = []
+        marker_found = marker is None
         for i in xrange(num_servers):
-            server = stub_instance(id=i + 1, uuid=get_fake_uuid(i),
-                    **kwargs)
+            uuid = get_fake_uuid(i)
+            if not marker_found:
+                marker_found = uuid == marker
+                continue
+            server = stub_instance(id=i + 1, uuid=uuid, **kwargs)
             servers_list.append(server)
-        return servers_list
+        if not marker_found:
+            raise exc.MarkerNotFound(marker=marker)
+        return servers_list[:limit]
     return _return_servers
 
 
@@ -540,5 +548,6 @@ def stub_volume_get_notfound(self, context, volume_id):
     raise exc.NotFound
 
 
-def stub_volume_get_all(self, context, search_opts=None):
+def stub_volume_get_all(self, context, search_opts=None, limit=None,
+                        marker=None):
     return [stub_volume_get(self, context, '1')]
@@ -5,6 +5,7 @@ import webob
 
 from nova.api.openstack import wsgi
 from nova import exception
+from nova.openstack.common import jsonutils
 from nova import test
 from nova.tests.api.openstack import fakes
 
@@ -96,6 +97,28 @@ class RequestTest(test.TestCase):
                  'uuid1': instances[1],
                  'uuid2': instances[2]})
 
+    def test_data_loader_batches_wanted_keys(self):
+        request = wsgi.Request.blank('/foo')
+        calls = []
+
+        def load(keys):
+            calls.append(sorted(keys))
+            return dict((key, key.upper()) for key in keys if key != 'c')
+
+        loader = request.get_data_loader('letters', load)
+        self.assertTrue(request.get_data_loader('letters', None) is loader)
+
+        loader.want(['a', 'b', None, 'c'])
+        self.assertEqual(loader.get('a'), 'A')
+        self.assertEqual(loader.get('b'), 'B')
+        self.assertEqual(loader.get('c'), None)
+        self.assertEqual(loader.get(None), None)
+        self.assertEqual(calls, [['a', 'b', 'c']])
+
+        loader.want(['a', 'd'])
+        self.assertEqual(loader.get('d'), 'D')
+        self.assertEqual(calls, [['a', 'b', 'c'], ['d']])
+
 
 class ActionDispatcherTest(test.TestCase):
     def test_dispatch(self):
@@ -141,6 +164,18 @@ class JSONDictSerializerTest(test.TestCase):
         result = result.replace('\n', '').replace(' ', '')
         self.assertEqual(result, expected_json)
 
+    def test_serialize_parts(self):
+        serializer = wsgi.JSONDictSerializer()
+        head, items1, _tail = serializer.serialize_parts(
+                dict(servers=[dict(id=1), dict(id=2)]), 'servers')
+        _head, items2, tail = serializer.serialize_parts(
+                dict(servers=[dict(id=3)], servers_links=['next']),
+                'servers')
+        result = head + serializer.item_separator.join(items1 + items2) + tail
+        self.assertEqual(jsonutils.loads(result),
+                         dict(servers=[dict(id=1), dict(id=2), dict(id=3)],
+                              servers_links=['next']))
+
 
 class TextDeserializerTest(test.TestCase):
     def test_dispatch_default(self):
@@ -753,6 +788,98 @@ class ResourceTest(test.TestCase):
         self.assertEqual(response, 'foo')
 
 
+class StreamingResponseObjectTest(test.TestCase):
+    def _get_resource(self, batches, *extensions):
+        class Controller(object):
+            def index(self, req):
+                return wsgi.StreamingResponseObject('servers', batches)
+
+        resource = wsgi.Resource(Controller())
+        resource.wsgi_extensions['index'] = list(extensions)
+        return resource
+
+    def _get_response(self, resource):
+        request = wsgi.Request.blank('/tests')
+        request.environ['wsgiorg.routing_args'] = (None, {'action': 'index'})
+        return request.get_response(resource)
+
+    def test_stream(self):
+        produced = []
+
+        def batches():
+            for batch in ([1, 2], [3], []):
+                produced.append(batch)
+                yield dict(servers=[dict(id=i) for i in batch])
+            yield dict(servers=[], servers_links=['next'])
+
+        extended = []
+
+        def extension(req, resp_obj):
+            extended.append([s['id'] for s in resp_obj.obj['servers']])
+            for server in resp_obj.obj['servers']:
+                server['extended'] = True
+
+        resource = self._get_resource(batches(), extension)
+        response = self._get_response(resource)
+
+        # Only the first batch is produced before the body is read
+        self.assertEqual(produced, [[1, 2]])
+        self.assertEqual(response.status_int, 200)
+        self.assertEqual(jsonutils.loads(response.body),
+                         dict(servers=[dict(id=1, extended=True),
+                                       dict(id=2, extended=True),
+                                       dict(id=3, extended=True)],
+                              servers_links=['next']))
+        self.assertEqual(extended, [[1, 2], [3], [], []])
+
+    def test_stream_extension_response(self):
+        def extension(req, resp_obj):
+            return webob.exc.HTTPForbidden()
+
+        resource = self._get_resource([dict(servers=[dict(id=1)])],
+                                      extension)
+        response = self._get_response(resource)
+        self.assertEqual(response.status_int, 403)
+
+    def test_stream_failing_batch(self):
+        def batches():
+            yield dict(servers=[dict(id=1)])
+            raise exception.NotFound()
+
+        logged = []
+        self.stubs.Set(wsgi.LOG, 'exception',
+                       lambda *args: logged.append(args))
+
+        resource = self._get_resource(batches())
+        response = self._get_response(resource)
+        self.assertEqual(response.status_int, 200)
+        self.assertRaises(exception.NotFound, lambda: response.body)
+        self.assertEqual(len(logged), 1)
+
+    def test_generator_extension_collects(self):
+        extended = []
+
+        def extension(req):
+            resp_obj = yield
+            extended.append(len(resp_obj.obj['servers']))
+
+        resource = self._get_resource([dict(servers=[dict(id=1)]),
+                                       dict(servers=[dict(id=2)])],
+                                      extension)
+        response = self._get_response(resource)
+        self.assertEqual(jsonutils.loads(response.body),
+                         dict(servers=[dict(id=1), dict(id=2)]))
+        self.assertEqual(extended, [2])
+
+    def test_collect(self):
+        robj = wsgi.StreamingResponseObject(
+                'servers', [dict(servers=[1, 2]),
+                            dict(servers=[3], servers_links=['next'])])
+        robj.collect()
+        self.assertEqual(robj.obj, dict(servers=[1, 2, 3],
+                                        servers_links=['next']))
+
+
 class ResponseObjectTest(test.TestCase):
     def test_default_code(self):
         robj = wsgi.ResponseObject({})
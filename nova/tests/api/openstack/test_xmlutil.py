@@ -652,6 +652,59 @@ class TemplateTest(test.TestCase):
                          str(obj['test']['image']['id']))
         self.assertEqual(result[idx].text, obj['test']['image']['name'])
 
+    def test_serialize_parts(self):
+        root = xmlutil.TemplateElement('servers')
+        elem = xmlutil.SubTemplateElement(root, 'server', selector='servers')
+        elem.set('id')
+        tmpl = xmlutil.MasterTemplate(root, 1)
+
+        head, items1, _tail = tmpl.serialize_parts(
+                dict(servers=[dict(id=1), dict(id=2)]), 'servers')
+        _head, items2, tail = tmpl.serialize_parts(
+                dict(servers=[dict(id=3)]), 'servers')
+        result = head + tmpl.item_separator.join(items1 + items2) + tail
+
+        tree = etree.fromstring(result)
+        self.assertEqual(tree.tag, 'servers')
+        self.assertEqual([server.get('id') for server in tree],
+                         ['1', '2', '3'])
+
+    def test_serialize_parts_matches_serialize(self):
+        root = xmlutil.TemplateElement('servers')
+        elem = xmlutil.SubTemplateElement(root, 'server', selector='servers')
+        elem.set('id')
+        elem.set('name')
+        link = xmlutil.SubTemplateElement(root, '{%s}link' %
+                                          xmlutil.XMLNS_ATOM,
+                                          selector='servers_links')
+        link.set('rel')
+        link.set('href')
+        tmpl = xmlutil.MasterTemplate(root, 1, nsmap={
+                None: xmlutil.XMLNS_V11, 'atom': xmlutil.XMLNS_ATOM})
+
+        servers = [dict(id=i, name='server%d' % i) for i in xrange(3)]
+        links = [dict(rel='next', href='http://localhost/servers?marker=2')]
+        head, items1, _tail = tmpl.serialize_parts(
+                dict(servers=servers[:2]), 'servers')
+        _head, items2, tail = tmpl.serialize_parts(
+                dict(servers=servers[2:], servers_links=links), 'servers')
+        streamed = head + tmpl.item_separator.join(items1 + items2) + tail
+
+        buffered = tmpl.serialize(dict(servers=servers,
+                                       servers_links=links))
+        self.assertEqual(streamed, buffered)
+        self.assertEqual(streamed.count('xmlns='), 1)
+
+    def test_serialize_parts_empty(self):
+        root = xmlutil.TemplateElement('servers')
+        elem = xmlutil.SubTemplateElement(root, 'server', selector='servers')
+        elem.set('id')
+        tmpl = xmlutil.MasterTemplate(root, 1)
+
+        head, items, tail = tmpl.serialize_parts(dict(servers=[]), 'servers')
+        self.assertEqual(items, [])
+        self.assertEqual(len(etree.fromstring(head + tail)), 0)
+
 
 class MasterTemplateBuilder(xmlutil.TemplateBuilder):
     def construct(self):
@@ -63,7 +63,7 @@ def stub_snapshot_get(self, context, snapshot_id):
     return param
 
 
-def stub_snapshot_get_all(self, context):
+def stub_snapshot_get_all(self, context, limit=None, marker=None):
     param = _get_default_snapshot_param()
     return [param]
 
@@ -155,6 +155,27 @@ class SnapshotApiTest(test.TestCase):
         resp_snapshot = resp_snapshots.pop()
         self.assertEqual(resp_snapshot['id'], '123')
 
+    def test_snapshot_list_with_marker(self):
+        calls = []
+
+        def stub_get_all_snapshots(self, context, limit=None, marker=None):
+            calls.append((limit, marker))
+            if marker != 'snap1':
+                raise exception.MarkerNotFound(marker=marker)
+            return []
+
+        self.stubs.Set(volume.api.API, "get_all_snapshots",
+            stub_get_all_snapshots)
+
+        req = fakes.HTTPRequest.blank('/v1/snapshots?limit=1&marker=snap1')
+        resp_dict = self.controller.index(req)
+        self.assertEqual(resp_dict, {'snapshots': []})
+        self.assertEqual(calls, [(1, 'snap1')])
+
+        req = fakes.HTTPRequest.blank('/v1/snapshots?marker=asdf')
+        self.assertRaises(webob.exc.HTTPBadRequest,
+                          self.controller.index, req)
+
 
 class SnapshotSerializerTest(test.TestCase):
     def _verify_snapshot(self, snap, tree):
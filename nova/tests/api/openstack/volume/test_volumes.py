@@ -129,6 +129,30 @@ class VolumeApiTest(test.TestCase):
                                  'size': 1}]}
         self.assertEqual(res_dict, expected)
 
+    def test_volume_list_with_marker(self):
+        calls = []
+
+        def stub_get_all(self, context, search_opts=None, limit=None,
+                         marker=None):
+            calls.append((limit, marker))
+            if marker != '1':
+                raise exception.MarkerNotFound(marker=marker)
+            return []
+
+        self.stubs.Set(volume_api.API, 'get_all', stub_get_all)
+
+        req = fakes.HTTPRequest.blank('/v1/volumes?limit=2&marker=1')
+        self.assertEqual(self.controller.index(req), {'volumes': []})
+        self.assertEqual(calls, [(2, '1')])
+
+        req = fakes.HTTPRequest.blank('/v1/volumes?marker=asdf')
+        self.assertRaises(webob.exc.HTTPBadRequest,
+                          self.controller.index, req)
+
+    def test_volume_list_with_offset(self):
+        req = fakes.HTTPRequest.blank('/v1/volumes?offset=1')
+        self.assertEqual(self.controller.index(req), {'volumes': []})
+
     def test_volume_show(self):
         req = fakes.HTTPRequest.blank('/v1/volumes/1')
         res_dict = self.controller.show(req, '1')
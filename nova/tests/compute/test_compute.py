@@ -1804,6 +1804,38 @@ class ComputeTestCase(BaseTestCase):
         self.assertEqual(len(instances), 1)
         self.assertEqual(task_states.STOPPING, instances[0]['task_state'])
 
+    def test_sync_power_states_skips_instances_in_sync(self):
+        instance = jsonutils.to_primitive(self._create_fake_instance())
+        self.compute.run_instance(self.context, instance=instance)
+        ctxt = context.get_admin_context()
+
+        def fake_instance_get_by_uuid(*args, **kwargs):
+            self.fail('instance was re-read although it is in sync')
+
+        def fake_get_info(*args, **kwargs):
+            self.fail('get_info used although get_info_all is available')
+
+        self.stubs.Set(self.compute.db, 'instance_get_by_uuid',
+                       fake_instance_get_by_uuid)
+        self.stubs.Set(self.compute.driver, 'get_info', fake_get_info)
+        self.compute._sync_power_states(ctxt)
+
+    def test_sync_power_states_without_get_info_all(self):
+        instance = jsonutils.to_primitive(self._create_fake_instance())
+        self.compute.run_instance(self.context, instance=instance)
+        ctxt = context.get_admin_context()
+
+        def fake_get_info_all():
+            raise NotImplementedError()
+
+        self.stubs.Set(self.compute.driver, 'get_info_all',
+                       fake_get_info_all)
+        self.compute.driver.test_remove_vm(instance['name'])
+        self.compute._sync_power_states(ctxt)
+
+        instance = db.instance_get_by_uuid(ctxt, instance['uuid'])
+        self.assertEqual(task_states.STOPPING, instance['task_state'])
+
     def test_add_instance_fault(self):
         exc_info = None
         instance_uuid = str(utils.gen_uuid())
@@ -1950,7 +1982,9 @@ class ComputeTestCase(BaseTestCase):
         call_info = {'get_all_by_host': 0, 'get_by_uuid': 0,
                 'get_nw_info': 0, 'expected_instance': None}
 
-        def fake_instance_get_all_by_host(context, host):
+        def fake_instance_get_all_by_host(context, host,
+                                          columns_to_join=None):
+            self.assertEqual(columns_to_join, [])
             call_info['get_all_by_host'] += 1
             return instances[:]
 
@@ -1979,13 +2013,13 @@ class ComputeTestCase(BaseTestCase):
         call_info['expected_instance'] = instances[0]
         self.compute._heal_instance_info_cache(ctxt)
         self.assertEqual(call_info['get_all_by_host'], 1)
-        self.assertEqual(call_info['get_by_uuid'], 0)
+        self.assertEqual(call_info['get_by_uuid'], 1)
         self.assertEqual(call_info['get_nw_info'], 1)
 
         call_info['expected_instance'] = instances[1]
         self.compute._heal_instance_info_cache(ctxt)
         self.assertEqual(call_info['get_all_by_host'], 1)
-        self.assertEqual(call_info['get_by_uuid'], 1)
+        self.assertEqual(call_info['get_by_uuid'], 2)
         self.assertEqual(call_info['get_nw_info'], 2)
 
         # Make an instance switch hosts
@@ -1997,7 +2031,7 @@ class ComputeTestCase(BaseTestCase):
         self.compute._heal_instance_info_cache(ctxt)
         self.assertEqual(call_info['get_all_by_host'], 1)
         # Incremented for '2' and '4'.. '3' caused a raise above.
-        self.assertEqual(call_info['get_by_uuid'], 3)
+        self.assertEqual(call_info['get_by_uuid'], 4)
         self.assertEqual(call_info['get_nw_info'], 3)
         # Should be no more left.
         self.assertEqual(len(self.compute._instance_uuids_to_heal), 0)
@@ -2007,10 +2041,37 @@ class ComputeTestCase(BaseTestCase):
         call_info['expected_instance'] = instances[0]
         self.compute._heal_instance_info_cache(ctxt)
         self.assertEqual(call_info['get_all_by_host'], 2)
-        # Stays the same, beacuse the instance came from the DB
-        self.assertEqual(call_info['get_by_uuid'], 3)
+        # The DB only gave us uuids, so the instance is read in full
+        self.assertEqual(call_info['get_by_uuid'], 5)
         self.assertEqual(call_info['get_nw_info'], 4)
 
+    def test_prune_instance_faults(self):
+        self.flags(instance_fault_retention_count=2,
+                   instance_fault_prune_interval=3600)
+        ctxt = context.get_admin_context()
+        instance = self._create_fake_instance()
+        self.compute.host = instance['host']
+        for code in (500, 501, 502):
+            db.instance_fault_create(ctxt, {'instance_uuid': instance['uuid'],
+                                            'code': code})
+
+        self.compute._prune_instance_faults(ctxt)
+        faults = db.instance_fault_get_by_instance_uuids(ctxt,
+                                                         [instance['uuid']])
+        self.assertEqual([fault['code'] for fault in faults[instance['uuid']]],
+                         [502, 501])
+
+        # Not due to run again for another hour
+        self.mox.StubOutWithMock(self.compute.db, 'instance_fault_prune')
+        self.mox.ReplayAll()
+        self.compute._prune_instance_faults(ctxt)
+
+    def test_prune_instance_faults_disabled(self):
+        self.flags(instance_fault_retention_count=0)
+        self.mox.StubOutWithMock(self.compute.db, 'instance_get_all_by_host')
+        self.mox.ReplayAll()
+        self.compute._prune_instance_faults(context.get_admin_context())
+
     def test_poll_unconfirmed_resizes(self):
         instances = [{'uuid': 'fake_uuid1', 'vm_state': vm_states.RESIZED,
                       'task_state': None},
@@ -3502,6 +3563,26 @@ class ComputeAPITestCase(BaseTestCase):
 
         db.instance_destroy(_context, instance['uuid'])
 
+    def test_get_latest_instance_faults(self):
+        instance = self._create_fake_instance()
+        fault_fixture = {'code': 404, 'instance_uuid': instance['uuid']}
+
+        def return_fault(_ctxt, instance_uuids):
+            return dict.fromkeys(instance_uuids, fault_fixture)
+
+        self.stubs.Set(nova.db,
+                       'instance_fault_get_latest_by_instance_uuids',
+                       return_fault)
+
+        _context = context.get_admin_context()
+        output = self.compute_api.get_latest_instance_faults(_context,
+                                                             [instance])
+        self.assertEqual(output, {instance['uuid']: fault_fixture})
+        self.assertEqual(
+                self.compute_api.get_latest_instance_faults(_context, []), {})
+
+        db.instance_destroy(_context, instance['uuid'])
+
     @staticmethod
     def _parse_db_block_device_mapping(bdm_ref):
         attr_list = ('delete_on_termination', 'device_name', 'no_device',
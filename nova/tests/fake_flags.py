@@ -25,8 +25,11 @@ flags.DECLARE('fake_network', 'nova.network.manager')
 flags.DECLARE('iscsi_num_targets', 'nova.volume.driver')
 flags.DECLARE('network_size', 'nova.network.manager')
 flags.DECLARE('num_networks', 'nova.network.manager')
+flags.DECLARE('periodic_task_pool_size', 'nova.manager')
 flags.DECLARE('policy_file', 'nova.policy')
+flags.DECLARE('service_liveness_check_interval', 'nova.liveness')
 flags.DECLARE('volume_driver', 'nova.volume.manager')
+flags.DECLARE('volume_reclaim_deferred', 'nova.volume.driver')
 
 
 def set_defaults(conf):
@@ -39,12 +42,15 @@ def set_defaults(conf):
     conf.set_default('iscsi_num_targets', 8)
     conf.set_default('network_size', 8)
     conf.set_default('num_networks', 2)
+    conf.set_default('periodic_task_pool_size', 0)
     conf.set_default('rpc_backend', 'nova.openstack.common.rpc.impl_fake')
+    conf.set_default('service_liveness_check_interval', 0)
     conf.set_default('sql_connection', "sqlite://")
     conf.set_default('sqlite_synchronous', False)
     conf.set_default('use_ipv6', True)
     conf.set_default('verbose', True)
     conf.set_default('volume_driver', 'nova.volume.driver.FakeISCSIDriver')
+    conf.set_default('volume_reclaim_deferred', False)
     conf.set_default('api_paste_config', '$state_path/etc/nova/api-paste.ini')
     conf.set_default('rpc_response_timeout', 5)
     conf.set_default('rpc_cast_timeout', 5)
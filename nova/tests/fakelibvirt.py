@@ -512,6 +512,11 @@ class Connection(object):
     def listDomainsID(self):
         return self._running_vms.keys()
 
+    def listDefinedDomains(self):
+        running = self._running_vms.values()
+        return [name for name, dom in self._vms.iteritems()
+                if dom not in running]
+
     def lookupByID(self, id):
         if id in self._running_vms:
             return self._running_vms[id]
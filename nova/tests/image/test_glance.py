@@ -16,6 +16,7 @@
 #    under the License.
 
 
+import copy
 import datetime
 import random
 import time
@@ -24,12 +25,17 @@ import glance.common.exception as glance_exception
 
 from nova import context
 from nova import exception
+from nova import flags
 from nova.image import glance
+from nova.openstack.common import timeutils
 from nova import test
 from nova.tests.api.openstack import fakes
 from nova.tests.glance import stubs as glance_stubs
 
 
+FLAGS = flags.FLAGS
+
+
 class NullWriter(object):
     """Used to test ImageService.get which takes a writer object"""
 
@@ -99,6 +105,7 @@ class TestGlanceImageService(test.TestCase):
     def setUp(self):
         super(TestGlanceImageService, self).setUp()
         fakes.stub_out_compute_api_snapshot(self.stubs)
+        self.stubs.Set(glance, '_IMAGE_META_CACHE', None)
 
         client = glance_stubs.StubGlanceClient()
         self.service = self._create_image_service(client)
@@ -384,6 +391,118 @@ class TestGlanceImageService(test.TestCase):
         }
         self.assertEqual(image_meta, expected)
 
+    def _count_get_image_meta(self):
+        calls = []
+        orig_get_image_meta = glance_stubs.StubGlanceClient.get_image_meta
+
+        def fake_get_image_meta(client, image_id):
+            calls.append(image_id)
+            return orig_get_image_meta(client, image_id)
+
+        self.stubs.Set(glance_stubs.StubGlanceClient, 'get_image_meta',
+                       fake_get_image_meta)
+        return calls
+
+    def test_show_caches_active_images(self):
+        fixture = self._make_fixture(name='image1', status='active')
+        image_id = self.service.create(self.context, fixture)['id']
+        calls = self._count_get_image_meta()
+
+        for i in xrange(5):
+            image_meta = self.service.show(self.context, image_id)
+            self.assertEqual(image_meta['name'], 'image1')
+        self.assertEqual(len(calls), 1)
+
+        # Callers may not corrupt the cached copy
+        image_meta['properties']['foo'] = 'bar'
+        image_meta = self.service.show(self.context, image_id)
+        self.assertEqual(image_meta['properties'], {})
+
+        stats = glance.get_image_meta_cache().get_stats()
+        self.assertEqual(stats['hits'], 5)
+        self.assertEqual(stats['misses'], 1)
+
+    def test_show_cache_is_scoped_by_project(self):
+        fixture = self._make_fixture(name='image1', status='active')
+        image_id = self.service.create(self.context, fixture)['id']
+        calls = self._count_get_image_meta()
+        other_context = context.RequestContext('fake', 'other',
+                                               auth_token=True)
+
+        self.service.show(self.context, image_id)
+        self.service.show(other_context, image_id)
+        self.service.show(other_context, image_id)
+        self.assertEqual(len(calls), 2)
+
+    def test_show_does_not_cache_inactive_images(self):
+        fixture = self._make_fixture(name='image1', status='saving')
+        image_id = self.service.create(self.context, fixture)['id']
+        calls = self._count_get_image_meta()
+
+        self.service.show(self.context, image_id)
+        self.service.show(self.context, image_id)
+        self.assertEqual(len(calls), 2)
+
+    def test_show_cache_expires(self):
+        fixture = self._make_fixture(name='image1', status='active')
+        image_id = self.service.create(self.context, fixture)['id']
+        calls = self._count_get_image_meta()
+
+        timeutils.set_time_override()
+        try:
+            self.service.show(self.context, image_id)
+            timeutils.advance_time_seconds(FLAGS.glance_image_meta_cache_ttl)
+            self.service.show(self.context, image_id)
+        finally:
+            timeutils.clear_time_override()
+        self.assertEqual(len(calls), 2)
+
+    def test_update_invalidates_cached_image(self):
+        fixture = self._make_fixture(name='test image', status='active')
+        image_id = self.service.create(self.context, fixture)['id']
+        self.service.show(self.context, image_id)
+
+        fixture['name'] = 'new image name'
+        self.service.update(self.context, image_id, fixture)
+
+        new_image_data = self.service.show(self.context, image_id)
+        self.assertEquals('new image name', new_image_data['name'])
+
+    def test_update_invalidates_image_cached_during_update(self):
+        fixture = self._make_fixture(name='test image', status='active')
+        image_id = self.service.create(self.context, fixture)['id']
+        orig_get_image_meta = glance_stubs.StubGlanceClient.get_image_meta
+        orig_update_image = glance_stubs.StubGlanceClient.update_image
+
+        def fake_get_image_meta(client, image_id):
+            # Like glance, not the stored image itself
+            return copy.deepcopy(orig_get_image_meta(client, image_id))
+
+        def fake_update_image(client, *args, **kwargs):
+            # Another request caches the image while glance updates it
+            self.service.show(self.context, image_id)
+            return orig_update_image(client, *args, **kwargs)
+
+        self.stubs.Set(glance_stubs.StubGlanceClient, 'get_image_meta',
+                       fake_get_image_meta)
+        self.stubs.Set(glance_stubs.StubGlanceClient, 'update_image',
+                       fake_update_image)
+
+        fixture['name'] = 'new image name'
+        self.service.update(self.context, image_id, fixture)
+
+        new_image_data = self.service.show(self.context, image_id)
+        self.assertEquals('new image name', new_image_data['name'])
+
+    def test_delete_invalidates_cached_image(self):
+        fixture = self._make_fixture(name='test image', status='active')
+        image_id = self.service.create(self.context, fixture)['id']
+        self.service.show(self.context, image_id)
+
+        self.service.delete(self.context, image_id)
+        self.assertRaises(exception.ImageNotFound, self.service.show,
+                          self.context, image_id)
+
     def test_show_raises_when_no_authtoken_in_the_context(self):
         fixture = self._make_fixture(name='image1',
                                      is_public=False,
@@ -516,12 +635,60 @@ def _create_failing_glance_client(info):
     return MyGlanceStubClient()
 
 
+class TestImageMetaCache(test.TestCase):
+
+    def test_evicts_least_recently_used(self):
+        cache = glance.ImageMetaCache(ttl=60, max_size=2)
+        cache.set((None, '1', None), 'one')
+        cache.set((None, '2', None), 'two')
+        cache.get((None, '1', None))
+        cache.set((None, '3', None), 'three')
+
+        self.assertEqual(cache.get((None, '1', None)), 'one')
+        self.assertEqual(cache.get((None, '2', None)), None)
+        self.assertEqual(cache.get((None, '3', None)), 'three')
+        self.assertEqual(cache.get_stats(), {'size': 2,
+                                             'hits': 3,
+                                             'misses': 1,
+                                             'evictions': 1,
+                                             'hit_ratio': 0.75})
+
+    def test_evicts_least_recently_used_after_many_uses(self):
+        cache = glance.ImageMetaCache(ttl=60, max_size=3)
+        for image_id in ('1', '2', '3'):
+            cache.set((None, image_id, None), image_id)
+        for i in xrange(20):
+            cache.get((None, '1', None))
+            cache.get((None, '3', None))
+
+        cache.set((None, '4', None), '4')
+        self.assertEqual(cache.get((None, '2', None)), None)
+        cache.set((None, '5', None), '5')
+        self.assertEqual(cache.get((None, '1', None)), None)
+        self.assertEqual(cache.get((None, '3', None)), '3')
+        self.assertEqual(cache.get_stats()['evictions'], 2)
+
+    def test_disabled_with_zero_ttl(self):
+        cache = glance.ImageMetaCache(ttl=0, max_size=2)
+        cache.set((None, '1', None), 'one')
+        self.assertEqual(cache.get((None, '1', None)), None)
+
+    def test_invalidate_drops_all_scopes(self):
+        cache = glance.ImageMetaCache(ttl=60, max_size=10)
+        cache.set((None, '1', ('a', False)), 'one')
+        cache.set((None, '1', ('b', False)), 'one')
+        cache.set((None, '2', ('a', False)), 'two')
+        cache.invalidate(1)
+        self.assertEqual(cache.get_stats()['size'], 1)
+
+
 class TestGlanceClientWrapper(test.TestCase):
 
     def setUp(self):
         super(TestGlanceClientWrapper, self).setUp()
         self.flags(glance_api_servers=['host1:9292', 'host2:9293',
             'host3:9294'])
+        self.stubs.Set(glance, '_SERVER_POOL', None)
 
         # Make the test run fast
         def _fake_sleep(secs):
@@ -579,16 +746,11 @@ class TestGlanceClientWrapper(test.TestCase):
                 client.call, ctxt, 'get_image', 'meow')
         self.assertEqual(info['num_calls'], 1)
 
+        # host1 is now marked down, so the next call skips it
         info = {'num_calls': 0,
                 'host': 'host2',
                 'port': 9293}
 
-        def _fake_shuffle2(servers):
-            # fake shuffle in a known manner
-            servers.append(servers.pop(0))
-
-        self.stubs.Set(random, 'shuffle', _fake_shuffle2)
-
         self.assertRaises(exception.GlanceConnectionFailed,
                 client2.call, ctxt, 'get_image', 'meow')
         self.assertEqual(info['num_calls'], 1)
@@ -641,21 +803,79 @@ class TestGlanceClientWrapper(test.TestCase):
                 _fake_create_glance_client)
 
         client = glance.GlanceClientWrapper()
-        client2 = glance.GlanceClientWrapper()
         client.call(ctxt, 'get_image', 'meow')
         self.assertEqual(info['num_calls'], 2)
 
-        def _fake_shuffle2(servers):
-            # fake shuffle in a known manner
-            servers.append(servers.pop(0))
+    def test_default_client_binds_each_call_to_its_context(self):
+        self.flags(auth_strategy='keystone')
+        self.flags(glance_api_servers=['host1:9292'])
+        ctxt1 = context.RequestContext('user1', 'tenant1',
+                                       auth_token='token1')
+        ctxt2 = context.RequestContext('user2', 'tenant2',
+                                       auth_token='token2')
+        clients = []
 
-        self.stubs.Set(random, 'shuffle', _fake_shuffle2)
+        class MyGlanceStubClient(glance_stubs.StubGlanceClient):
+            def __init__(self, host, port, creds=None, auth_tok=None):
+                super(MyGlanceStubClient, self).__init__()
+                self.creds = creds
+                self.auth_tok = auth_tok
+                clients.append(self)
 
-        info = {'num_calls': 0,
-                'host0': 'host2',
-                'port0': 9293,
-                'host1': 'host3',
-                'port1': 9294}
+            def get_images_detailed(self, **kwargs):
+                return [self.creds['tenant'], self.auth_tok]
 
-        client2.call(ctxt, 'get_image', 'meow')
-        self.assertEqual(info['num_calls'], 2)
+        self.stubs.Set(glance.glance.client, 'Client', MyGlanceStubClient)
+
+        client = glance.GlanceClientWrapper()
+        for ctxt in (ctxt1, ctxt2, ctxt1):
+            self.assertEqual(client.call(ctxt, 'get_images_detailed'),
+                             [ctxt.project_id, ctxt.auth_token])
+        self.assertEqual(len(clients), 3)
+
+        stats = glance.get_server_pool().get_stats()
+        self.assertEqual(stats, [{'host': 'host1',
+                                  'port': 9292,
+                                  'up': True,
+                                  'in_use': 0,
+                                  'calls': 3,
+                                  'failures': 0}])
+
+    def test_default_client_skips_failed_server(self):
+        self.flags(glance_num_retries=1)
+        self.flags(glance_api_servers=['host1:9292', 'host2:9293'])
+        self.flags(glance_server_retry_interval=30)
+        self.stubs.Set(random, 'shuffle', lambda servers: None)
+        ctxt = context.RequestContext('fake', 'fake')
+        hosts = []
+
+        class MyGlanceStubClient(glance_stubs.StubGlanceClient):
+            def __init__(self, host):
+                super(MyGlanceStubClient, self).__init__()
+                self.host = host
+
+            def get_image(self, image_id):
+                hosts.append(self.host)
+                if self.host == 'host1':
+                    raise glance_exception.ClientConnectionError()
+                return {}, []
+
+        def _fake_create_glance_client(context, host, port):
+            return MyGlanceStubClient(host)
+
+        self.stubs.Set(glance, '_create_glance_client',
+                _fake_create_glance_client)
+
+        client = glance.GlanceClientWrapper()
+        for i in xrange(3):
+            client.call(ctxt, 'get_image', 'meow')
+        self.assertEqual(hosts, ['host1', 'host2', 'host2', 'host2'])
+
+        # Once the retry interval has passed host1 is tried again
+        now = timeutils.utcnow() + datetime.timedelta(seconds=31)
+        timeutils.set_time_override(now)
+        try:
+            client.call(ctxt, 'get_image', 'meow')
+        finally:
+            timeutils.clear_time_override()
+        self.assertEqual(hosts[-2:], ['host1', 'host2'])
@@ -21,6 +21,7 @@ import mox
 import os
 import tempfile
 
+from nova.api.ec2 import ec2utils
 from nova import context
 import nova.db.api
 from nova import exception
@@ -29,6 +30,9 @@ from nova import test
 from nova.tests.image import fake
 
 
+test.add_reset_hook(ec2utils.reset_cache)
+
+
 ami_manifest_xml = """<?xml version="1.0" ?>
 <manifest>
         <version>2011-06-17</version>
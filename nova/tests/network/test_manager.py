@@ -283,12 +283,12 @@ class FlatNetworkTestCase(test.TestCase):
         db.virtual_interface_get_by_instance_and_network(mox.IgnoreArg(),
                 mox.IgnoreArg(), mox.IgnoreArg()).AndReturn({'id': 0})
 
-        db.instance_get(self.context,
-                        1).AndReturn({'display_name': HOST,
+        db.instance_get(self.context, 1,
+                        columns_to_join=[]).AndReturn({'display_name': HOST,
                                       'uuid': 'test-00001'})
-        db.instance_get(mox.IgnoreArg(),
-                        mox.IgnoreArg()).AndReturn({'security_groups':
-                                                             [{'id': 0}]})
+        db.instance_get(mox.IgnoreArg(), mox.IgnoreArg(),
+                        columns_to_join=['security_groups']).AndReturn(
+                                {'security_groups': [{'id': 0}]})
         db.fixed_ip_associate_pool(mox.IgnoreArg(),
                                    mox.IgnoreArg(),
                                    mox.IgnoreArg()).AndReturn('192.168.0.101')
@@ -314,12 +314,12 @@ class FlatNetworkTestCase(test.TestCase):
         db.virtual_interface_get_by_instance_and_network(mox.IgnoreArg(),
                 mox.IgnoreArg(), mox.IgnoreArg()).AndReturn({'id': 0})
 
-        db.instance_get(self.context,
-                        1).AndReturn({'display_name': HOST,
+        db.instance_get(self.context, 1,
+                        columns_to_join=[]).AndReturn({'display_name': HOST,
                                       'uuid': 'test-00001'})
-        db.instance_get(mox.IgnoreArg(),
-                        mox.IgnoreArg()).AndReturn({'security_groups':
-                                                             [{'id': 0}]})
+        db.instance_get(mox.IgnoreArg(), mox.IgnoreArg(),
+                        columns_to_join=['security_groups']).AndReturn(
+                                {'security_groups': [{'id': 0}]})
         db.fixed_ip_associate_pool(mox.IgnoreArg(),
                                    mox.IgnoreArg(),
                                    mox.IgnoreArg()).AndReturn('192.168.0.101')
@@ -380,12 +380,12 @@ class FlatNetworkTestCase(test.TestCase):
         db.virtual_interface_get_by_instance_and_network(mox.IgnoreArg(),
                 mox.IgnoreArg(), mox.IgnoreArg()).AndReturn({'id': 0})
 
-        db.instance_get(self.context,
-                        1).AndReturn({'display_name': HOST,
+        db.instance_get(self.context, 1,
+                        columns_to_join=[]).AndReturn({'display_name': HOST,
                                       'uuid': 'test-00001'})
-        db.instance_get(mox.IgnoreArg(),
-                        mox.IgnoreArg()).AndReturn({'security_groups':
-                                                             [{'id': 0}]})
+        db.instance_get(mox.IgnoreArg(), mox.IgnoreArg(),
+                        columns_to_join=['security_groups']).AndReturn(
+                                {'security_groups': [{'id': 0}]})
 
         db.fixed_ip_associate_pool(mox.IgnoreArg(),
                                    mox.IgnoreArg(),
@@ -423,8 +423,8 @@ class VlanNetworkTestCase(test.TestCase):
         self.mox.StubOutWithMock(db,
                               'virtual_interface_get_by_instance_and_network')
 
-        db.instance_get(mox.IgnoreArg(),
-                        mox.IgnoreArg()).AndReturn({'uuid': '42'})
+        db.instance_get(mox.IgnoreArg(), mox.IgnoreArg(),
+                        columns_to_join=[]).AndReturn({'uuid': '42'})
         db.fixed_ip_associate(mox.IgnoreArg(),
                               mox.IgnoreArg(),
                               mox.IgnoreArg(),
@@ -462,11 +462,11 @@ class VlanNetworkTestCase(test.TestCase):
                               'virtual_interface_get_by_instance_and_network')
         self.mox.StubOutWithMock(db, 'instance_get')
 
-        db.instance_get(mox.IgnoreArg(),
-                        mox.IgnoreArg()).AndReturn({'uuid': FAKEUUID})
-        db.instance_get(mox.IgnoreArg(),
-                        mox.IgnoreArg()).AndReturn({'security_groups':
-                                                             [{'id': 0}]})
+        db.instance_get(mox.IgnoreArg(), mox.IgnoreArg(),
+                        columns_to_join=[]).AndReturn({'uuid': FAKEUUID})
+        db.instance_get(mox.IgnoreArg(), mox.IgnoreArg(),
+                        columns_to_join=['security_groups']).AndReturn(
+                                {'security_groups': [{'id': 0}]})
         db.fixed_ip_associate_pool(mox.IgnoreArg(),
                                    mox.IgnoreArg(),
                                    mox.IgnoreArg()).AndReturn('192.168.0.1')
@@ -849,19 +849,19 @@ class VlanNetworkTestCase(test.TestCase):
                               'virtual_interface_get_by_instance_and_network')
         self.mox.StubOutWithMock(db, 'fixed_ip_update')
 
-        db.instance_get(mox.IgnoreArg(),
-                        mox.IgnoreArg()).AndReturn({'uuid': FAKEUUID})
+        db.instance_get(mox.IgnoreArg(), mox.IgnoreArg(),
+                        columns_to_join=[]).AndReturn({'uuid': FAKEUUID})
         db.fixed_ip_update(mox.IgnoreArg(),
                            mox.IgnoreArg(),
                            mox.IgnoreArg())
         db.virtual_interface_get_by_instance_and_network(mox.IgnoreArg(),
                 mox.IgnoreArg(), mox.IgnoreArg()).AndReturn({'id': 0})
 
-        db.instance_get(mox.IgnoreArg(),
-                        mox.IgnoreArg()).AndReturn({'security_groups':
-                                                             [{'id': 0}],
-                                                    'availability_zone': '',
-                                                    'uuid': FAKEUUID})
+        db.instance_get(mox.IgnoreArg(), mox.IgnoreArg(),
+                        columns_to_join=['security_groups']).AndReturn(
+                                {'security_groups': [{'id': 0}],
+                                 'availability_zone': '',
+                                 'uuid': FAKEUUID})
         db.fixed_ip_associate_pool(mox.IgnoreArg(),
                                    mox.IgnoreArg(),
                                    mox.IgnoreArg()).AndReturn('192.168.0.101')
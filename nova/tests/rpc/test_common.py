@@ -0,0 +1,166 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Unit Tests for masking secrets in logged rpc messages
+"""
+
+import copy
+
+from nova.openstack.common.rpc import common as rpc_common
+from nova import test
+
+
+def _deepcopy_safe_log_data(msg_data):
+    """What _safe_log logged when it deep copied the message."""
+    SANITIZE = {'set_admin_password': ('new_pass',),
+                'run_instance': ('admin_password',), }
+
+    has_method = 'method' in msg_data and msg_data['method'] in SANITIZE
+    has_context_token = '_context_auth_token' in msg_data
+    has_token = 'auth_token' in msg_data
+
+    if not any([has_method, has_context_token, has_token]):
+        return msg_data
+
+    msg_data = copy.deepcopy(msg_data)
+
+    if has_method:
+        for arg in SANITIZE[msg_data['method']]:
+            try:
+                msg_data['args'][arg] = "<SANITIZED>"
+            except KeyError:
+                pass
+
+    if has_context_token:
+        msg_data['_context_auth_token'] = '<SANITIZED>'
+
+    if has_token:
+        msg_data['auth_token'] = '<SANITIZED>'
+
+    return msg_data
+
+
+class SafeLogTestCase(test.TestCase):
+
+    def _message(self, method='run_instance', **args):
+        return {'_context_auth_token': 'secret-token',
+                '_context_user_id': 'fake-user',
+                '_msg_id': 'fake-msg-id',
+                'method': method,
+                'args': args}
+
+    def _safe_log(self, msg_data):
+        logged = []
+        rpc_common._safe_log(lambda msg, data: logged.append(data),
+                             'received %s', msg_data)
+        return logged[0]
+
+    def test_masks_context_token_and_method_args(self):
+        msg = self._message(admin_password='secret-password',
+                            request_spec={'num_instances': 1})
+        sanitized = rpc_common._sanitize(msg)
+        self.assertEqual(sanitized['_context_auth_token'], '<SANITIZED>')
+        self.assertEqual(sanitized['args']['admin_password'], '<SANITIZED>')
+        self.assertEqual(sanitized['args']['request_spec'],
+                         {'num_instances': 1})
+        self.assertEqual(sanitized['_context_user_id'], 'fake-user')
+
+        msg = self._message(method='set_admin_password',
+                            new_pass='secret-password',
+                            instance_uuid='fake-uuid')
+        sanitized = rpc_common._sanitize(msg)
+        self.assertEqual(sanitized['args'], {'new_pass': '<SANITIZED>',
+                                             'instance_uuid': 'fake-uuid'})
+
+    def test_only_listed_method_args_are_masked(self):
+        msg = self._message(method='reboot_instance',
+                            admin_password='not-really-a-password')
+        sanitized = rpc_common._sanitize(msg)
+        self.assertEqual(sanitized['args'], msg['args'])
+
+    def test_masks_nested_dicts_lists_and_tuples(self):
+        msg = {'method': 'cast_to_host',
+               'args': {'context': {'auth_token': 'secret-token'},
+                        'replies': [{'auth_token': 'secret-token'},
+                                    ('result', {'auth_token': 'secret'})],
+                        'msg': self._message(admin_password='secret')}}
+        sanitized = rpc_common._sanitize(msg)
+        args = sanitized['args']
+        self.assertEqual(args['context'], {'auth_token': '<SANITIZED>'})
+        self.assertEqual(args['replies'],
+                         [{'auth_token': '<SANITIZED>'},
+                          ('result', {'auth_token': '<SANITIZED>'})])
+        self.assertTrue(isinstance(args['replies'], list))
+        self.assertTrue(isinstance(args['replies'][1], tuple))
+        self.assertEqual(args['msg']['_context_auth_token'], '<SANITIZED>')
+        self.assertEqual(args['msg']['args']['admin_password'],
+                         '<SANITIZED>')
+        self.assertFalse('secret' in str(self._safe_log(msg)))
+
+    def test_original_message_is_not_mutated(self):
+        msg = {'method': 'run_instance',
+               '_context_auth_token': 'secret-token',
+               'args': {'admin_password': 'secret-password',
+                        'request_spec': {'instance_uuids': ['a', 'b']},
+                        'nested': [{'auth_token': 'secret-token'}]}}
+        original = copy.deepcopy(msg)
+        sanitized = rpc_common._sanitize(msg)
+        str(self._safe_log(msg))
+        self.assertEqual(msg, original)
+
+        # Branches without secrets are shared rather than copied
+        self.assertTrue(sanitized['args']['request_spec'] is
+                        msg['args']['request_spec'])
+        self.assertFalse(sanitized['args']['nested'] is
+                         msg['args']['nested'])
+
+    def test_message_without_secrets_is_not_copied(self):
+        msg = {'method': 'ping', 'args': {'data': [1, (2, 3), {'a': 'b'}]}}
+        self.assertTrue(rpc_common._sanitize(msg) is msg)
+
+    def test_sanitizes_only_when_formatted(self):
+        def fail_sanitize(data):
+            self.fail('sanitized before formatting')
+
+        msg = self._message(admin_password='secret-password')
+        self.stubs.Set(rpc_common, '_sanitize', fail_sanitize)
+        logged = self._safe_log(msg)
+        self.assertTrue(logged.data is msg)
+
+    def test_missing_method_args_are_not_added(self):
+        # The deep copying version logged a masked placeholder for them
+        msg = self._message(method='set_admin_password')
+        self.assertEqual(rpc_common._sanitize(msg)['args'], {})
+        self.assertEqual(_deepcopy_safe_log_data(msg)['args'],
+                         {'new_pass': '<SANITIZED>'})
+
+    def test_output_matches_deepcopy(self):
+        messages = [
+            self._message(admin_password='secret', instance_uuid='fake'),
+            self._message(method='set_admin_password', new_pass='secret'),
+            self._message(method='reboot_instance', instance_uuid='fake'),
+            {'auth_token': 'secret-token', 'user_id': 'fake-user'},
+            {'method': 'ping', 'args': {'data': [1, 2]}},
+            {'result': ('a', 'b'), 'failure': None, 'ending': True}]
+        for msg in messages:
+            expected = _deepcopy_safe_log_data(msg)
+            logged = self._safe_log(msg)
+            self.assertEqual(rpc_common._sanitize(msg), expected)
+            self.assertEqual(str(logged), str(expected))
+            self.assertEqual(unicode(logged), unicode(expected))
+            self.assertEqual(repr(logged), repr(expected))
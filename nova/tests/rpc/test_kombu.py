@@ -0,0 +1,149 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Unit Tests for the publisher cache of the kombu rpc driver
+"""
+
+import kombu.entity
+
+from nova import flags
+from nova.openstack.common.rpc import impl_kombu
+from nova import test
+
+
+FLAGS = flags.FLAGS
+
+
+class KombuPublisherCacheTestCase(test.TestCase):
+    def setUp(self):
+        super(KombuPublisherCacheTestCase, self).setUp()
+        self.flags(fake_rabbit=True)
+        self.declared = []
+        self._count_declares(kombu.entity.Exchange)
+        self._count_declares(kombu.entity.Queue)
+        self.conn = impl_kombu.Connection(FLAGS)
+
+    def tearDown(self):
+        self.conn.close()
+        super(KombuPublisherCacheTestCase, self).tearDown()
+
+    def _count_declares(self, entity_cls):
+        orig_declare = entity_cls.declare
+
+        def declare(entity, *args, **kwargs):
+            self.declared.append((entity_cls.__name__, entity.name))
+            return orig_declare(entity, *args, **kwargs)
+
+        self.stubs.Set(entity_cls, 'declare', declare)
+
+    def _publishers(self):
+        return self.conn.publishers.values()
+
+    def test_topic_publisher_is_cached(self):
+        self.conn.topic_send('topic1', {'value': 1})
+        publisher = self._publishers()[0]
+        self.conn.topic_send('topic1', {'value': 2})
+        self.conn.topic_send('topic2', {'value': 3})
+
+        self.assertEqual(len(self.conn.publishers), 2)
+        self.assertTrue(publisher in self._publishers())
+        # The topics share the control exchange, declared once
+        self.assertEqual(self.declared,
+                         [('Exchange', FLAGS.control_exchange)])
+
+    def test_notify_queue_declared_once(self):
+        self.conn.notify_send('notifications.info', {'value': 1})
+        self.assertTrue(('Queue', 'notifications.info') in self.declared)
+        declared = list(self.declared)
+
+        self.conn.notify_send('notifications.info', {'value': 2})
+        self.assertEqual(self.declared, declared)
+
+    def test_auto_delete_publishers_are_not_cached(self):
+        self.conn.fanout_send('topic1', {'value': 1})
+        self.conn.fanout_send('topic1', {'value': 2})
+        self.conn.direct_send('msg_id', {'value': 3})
+
+        self.assertEqual(self.conn.publishers, {})
+        self.assertEqual(self.conn.declared, set())
+        self.assertEqual(self.declared, [('Exchange', 'topic1_fanout'),
+                                         ('Exchange', 'topic1_fanout'),
+                                         ('Exchange', 'msg_id')])
+
+    def test_reset_rebinds_without_redeclaring(self):
+        self.conn.topic_send('topic1', {'value': 1})
+        publisher = self._publishers()[0]
+
+        self.conn.reset()
+        self.assertNotEqual(publisher.channel, self.conn.channel)
+        self.conn.topic_send('topic1', {'value': 2})
+
+        self.assertEqual(self._publishers(), [publisher])
+        self.assertEqual(publisher.channel, self.conn.channel)
+        self.assertEqual(publisher.producer.channel, self.conn.channel)
+        self.assertEqual(len(self.declared), 1)
+
+    def test_reconnect_drops_cache_and_redeclares(self):
+        self.conn.topic_send('topic1', {'value': 1})
+        publisher = self._publishers()[0]
+
+        self.conn.reconnect()
+        self.assertEqual(self.conn.publishers, {})
+        self.assertEqual(self.conn.declared, set())
+        self.conn.topic_send('topic1', {'value': 2})
+
+        self.assertNotEqual(self._publishers(), [publisher])
+        self.assertEqual(self.declared,
+                         [('Exchange', FLAGS.control_exchange)] * 2)
+
+    def test_connection_error_redeclares_on_new_connection(self):
+        self.conn.topic_send('topic1', {'value': 1})
+        publisher = self._publishers()[0]
+        orig_send = publisher.send
+        sent = []
+
+        def fail_once(msg):
+            if not sent:
+                sent.append(msg)
+                raise IOError('broker went away')
+            return orig_send(msg)
+
+        self.stubs.Set(publisher, 'send', fail_once)
+        self.conn.topic_send('topic1', {'value': 2})
+
+        # The failed publisher was evicted and ensure() reconnected, so
+        # the exchange is declared again on the new connection
+        self.assertNotEqual(self._publishers(), [publisher])
+        self.assertEqual(self.declared,
+                         [('Exchange', FLAGS.control_exchange)] * 2)
+
+    def test_failed_send_evicts_publisher(self):
+        self.conn.topic_send('topic1', {'value': 1})
+        publisher = self._publishers()[0]
+
+        def fail(msg):
+            raise test.TestingException()
+
+        self.stubs.Set(publisher, 'send', fail)
+        self.assertRaises(test.TestingException,
+                          self.conn.topic_send, 'topic1', {'value': 2})
+        self.assertEqual(self.conn.publishers, {})
+        self.assertEqual(self.conn.declared, set())
+
+        self.conn.topic_send('topic1', {'value': 3})
+        self.assertEqual(len(self.declared), 2)
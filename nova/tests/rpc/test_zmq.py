@@ -0,0 +1,225 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Unit Tests for the socket pool and reply subscriber of the zmq rpc driver
+"""
+
+import eventlet
+from eventlet import queue
+
+from nova import context
+from nova.openstack.common.rpc import common as rpc_common
+from nova import test
+
+try:
+    from eventlet.green import zmq
+    from nova.openstack.common.rpc import impl_zmq
+except ImportError:
+    zmq = None
+    impl_zmq = None
+
+
+class FakeClient(object):
+    def __init__(self, addr):
+        self.addr = addr
+        self.closed = False
+        self.sent = []
+
+    def cast(self, msg_id, topic, data):
+        self.sent.append((msg_id, topic, data))
+
+    def close(self):
+        self.closed = True
+
+
+class FakeReplySocket(object):
+    """A SUB socket fed from a queue instead of the reply endpoint."""
+
+    def __init__(self, addr, zmq_type, bind=True, subscribe=None):
+        self.addr = addr
+        self.subscriptions = []
+        self.replies = queue.Queue()
+        self.closed = False
+
+    def subscribe(self, msg_filter):
+        self.subscriptions.append(msg_filter)
+
+    def unsubscribe(self, msg_filter):
+        if msg_filter in self.subscriptions:
+            self.subscriptions.remove(msg_filter)
+
+    def recv(self):
+        reply = self.replies.get()
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    def close(self):
+        self.closed = True
+
+
+class ZmqClientPoolTestCase(test.TestCase):
+    @test.skip_if(not impl_zmq, "ZeroMQ library required")
+    def setUp(self):
+        super(ZmqClientPoolTestCase, self).setUp()
+        self.stubs.Set(impl_zmq, 'ZmqClient', FakeClient)
+        self.pool = impl_zmq.ZmqClientPool()
+
+    def test_reuses_idle_client(self):
+        client = self.pool.get('tcp://host1:9501')
+        self.pool.put(client)
+        self.assertTrue(self.pool.get('tcp://host1:9501') is client)
+
+        other = self.pool.get('tcp://host2:9501')
+        self.assertFalse(other is client)
+        self.assertEqual(other.addr, 'tcp://host2:9501')
+
+        stats = self.pool.get_stats()
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual(stats['reused'], 1)
+
+    def test_clients_are_checked_out_exclusively(self):
+        client1 = self.pool.get('tcp://host1:9501')
+        client2 = self.pool.get('tcp://host1:9501')
+        self.assertFalse(client1 is client2)
+
+    def test_closes_clients_beyond_pool_size(self):
+        self.flags(rpc_zmq_client_pool_size=1)
+        client1 = self.pool.get('tcp://host1:9501')
+        client2 = self.pool.get('tcp://host1:9501')
+        self.pool.put(client1)
+        self.pool.put(client2)
+
+        self.assertFalse(client1.closed)
+        self.assertTrue(client2.closed)
+        self.assertEqual(self.pool.get_stats()['idle'], 1)
+
+    def test_pool_size_zero_closes_after_use(self):
+        self.flags(rpc_zmq_client_pool_size=0)
+        client = self.pool.get('tcp://host1:9501')
+        self.pool.put(client)
+        self.assertTrue(client.closed)
+        self.assertFalse(self.pool.get('tcp://host1:9501') is client)
+
+    def test_discard_closes_client(self):
+        client = self.pool.get('tcp://host1:9501')
+        self.pool.discard(client)
+        self.assertTrue(client.closed)
+        self.assertEqual(self.pool.get_stats()['discarded'], 1)
+        self.assertFalse(self.pool.get('tcp://host1:9501') is client)
+
+    def test_close_closes_idle_clients(self):
+        client = self.pool.get('tcp://host1:9501')
+        self.pool.put(client)
+        self.pool.close()
+        self.assertTrue(client.closed)
+        self.assertEqual(self.pool.get_stats()['idle'], 0)
+
+    def test_failed_cast_discards_client(self):
+        ctxt = context.get_admin_context()
+        self.stubs.Set(impl_zmq, 'client_pool', self.pool)
+        impl_zmq._cast('tcp://host1:9501', ctxt, 'topic', 'topic', {})
+        client = self.pool.get('tcp://host1:9501')
+        self.assertEqual(len(client.sent), 1)
+        self.pool.put(client)
+
+        def fail(msg_id, topic, data):
+            raise zmq.ZMQError()
+
+        self.stubs.Set(client, 'cast', fail)
+        self.assertRaises(rpc_common.RPCException, impl_zmq._cast,
+                          'tcp://host1:9501', ctxt, 'topic', 'topic', {})
+        self.assertTrue(client.closed)
+        self.assertEqual(self.pool.get_stats()['idle'], 0)
+
+
+class ZmqReplyWaiterTestCase(test.TestCase):
+    @test.skip_if(not impl_zmq, "ZeroMQ library required")
+    def setUp(self):
+        super(ZmqReplyWaiterTestCase, self).setUp()
+        self.stubs.Set(impl_zmq, 'ZmqSocket', FakeReplySocket)
+        self.waiter = impl_zmq.ZmqReplyWaiter()
+        self.stubs.Set(impl_zmq, 'reply_waiter', self.waiter)
+        self.context = context.get_admin_context()
+        self.sent = []
+
+        def fake_cast(addr, context, msg_id, topic, msg, timeout=None):
+            self.sent.append(msg['args']['msg_id'])
+
+        self.stubs.Set(impl_zmq, '_cast', fake_cast)
+
+    def tearDown(self):
+        self.waiter.close()
+        super(ZmqReplyWaiterTestCase, self).tearDown()
+
+    def _reply(self, msg_id, result):
+        self.waiter.sock.replies.put(
+                [msg_id, 'zmq_replies', 'cast', impl_zmq._serialize([result])])
+
+    def _call(self, timeout=None):
+        return impl_zmq._call('tcp://host1:9501', self.context, 'topic',
+                              'topic', {'method': 'echo'}, timeout=timeout)
+
+    def test_replies_are_routed_by_msg_id(self):
+        calls = [eventlet.spawn(self._call) for i in xrange(3)]
+        while len(self.sent) < 3:
+            eventlet.sleep(0)
+
+        # The calls share one socket, subscribed to each msg_id
+        self.assertEqual(sorted(self.waiter.sock.subscriptions),
+                         sorted(self.sent))
+        self._reply('unknown', 'ignored')
+        for i, msg_id in reversed(list(enumerate(self.sent))):
+            self._reply(msg_id, 'reply%d' % i)
+
+        self.assertEqual([call.wait() for call in calls],
+                         ['reply0', 'reply1', 'reply2'])
+        self.assertEqual(self.waiter.sock.subscriptions, [])
+        self.assertEqual(self.waiter.waiters, {})
+
+    def test_timeout_drops_subscription(self):
+        self.assertRaises(rpc_common.Timeout, self._call, timeout=0.01)
+        self.assertEqual(len(self.sent), 1)
+        self.assertEqual(self.waiter.sock.subscriptions, [])
+        self.assertEqual(self.waiter.waiters, {})
+
+        # A late reply to the timed out call is dropped
+        self._reply(self.sent[0], 'late')
+        call = eventlet.spawn(self._call)
+        while len(self.sent) < 2:
+            eventlet.sleep(0)
+        self._reply(self.sent[1], 'current')
+        self.assertEqual(call.wait(), 'current')
+
+    def test_socket_error_fails_waiting_calls(self):
+        call = eventlet.spawn(self._call)
+        while not self.sent:
+            eventlet.sleep(0)
+        sock = self.waiter.sock
+        sock.replies.put(test.TestingException())
+
+        self.assertRaises(rpc_common.RPCException, call.wait)
+        self.assertTrue(sock.closed)
+
+        # The next call listens on a new socket
+        call = eventlet.spawn(self._call)
+        while len(self.sent) < 2:
+            eventlet.sleep(0)
+        self.assertFalse(self.waiter.sock is sock)
+        self._reply(self.sent[1], 'reply')
+        self.assertEqual(call.wait(), 'reply')
@@ -132,4 +132,4 @@ def mox_host_manager_db_calls(mock, context):
 
     db.compute_node_get_all(mox.IgnoreArg()).AndReturn(COMPUTE_NODES)
     db.instance_get_all(mox.IgnoreArg(),
-            columns_to_join=['instance_type']).AndReturn(INSTANCES)
+            columns_to_join=[]).AndReturn(INSTANCES)
@@ -27,7 +27,7 @@ from nova.tests.scheduler import fakes
 from nova.tests.scheduler import test_scheduler
 
 
-def fake_filter_hosts(hosts, filter_properties):
+def fake_filter_hosts(hosts, filter_properties, filter_request=None):
     return list(hosts)
 
 
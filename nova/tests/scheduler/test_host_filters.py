@@ -15,43 +15,78 @@
 Tests For Scheduler Host Filters.
 """
 
+import BaseHTTPServer
 import httplib
+
+from eventlet import greenthread
+import mox
 import stubout
 
 from nova import context
+from nova import db
 from nova import exception
 from nova import flags
 from nova.openstack.common import jsonutils
+from nova.openstack.common import timeutils
 from nova.scheduler import filters
-from nova.scheduler.filters.trusted_filter import AttestationService
+from nova.scheduler.filters import trusted_filter
 from nova import test
 from nova.tests.scheduler import fakes
 from nova import utils
 
 
-DATA = ''
+FLAGS = flags.FLAGS
+
+
+class FakeAttestationHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Answers PollHosts from the trust levels set on the server."""
+
+    def do_POST(self):
+        length = int(self.headers['content-length'])
+        body = jsonutils.loads(self.rfile.read(length))
+        self.server.requests.append((self.path, body))
+
+        levels = self.server.trust_levels
+        states = [{'host_name': host, 'trust_lvl': levels[host]}
+                  for host in body['hosts'] if host in levels]
+        data = jsonutils.dumps({'hosts': states})
+        self.send_response(httplib.OK)
+        self.send_header('content-type', 'application/json')
+        self.send_header('content-length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
 
 
-def stub_out_https_backend(stubs):
-    """
-    Stubs out the httplib.HTTPRequest.getresponse to return
-    faked-out data instead of grabbing actual contents of a resource
+class FakeAttestationServer(BaseHTTPServer.HTTPServer):
+    """Local stand-in for an OpenAttestation server."""
 
-    The stubbed getresponse() returns an iterator over
-    the data "I am a teapot, short and stout\n"
+    def __init__(self):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0),
+                                           FakeAttestationHandler)
+        self.trust_levels = {}
+        self.requests = []
+        self._thread = greenthread.spawn(self._serve)
+        # Let it start, so stop() can kill it
+        greenthread.sleep(0)
 
-    :param stubs: Set of stubout stubs
-    """
+    def _serve(self):
+        while True:
+            self.handle_request()
 
-    class FakeHTTPResponse(object):
+    def stop(self):
+        greenthread.kill(self._thread)
+        self.server_close()
 
-        def read(self):
-            return DATA
 
-    def fake_do_request(self, *args, **kwargs):
-        return httplib.OK, FakeHTTPResponse()
+class FakeAttestationConnection(httplib.HTTPConnection):
+    """Plain HTTP in place of the client authenticated HTTPS connection."""
 
-    stubs.Set(AttestationService, '_do_request', fake_do_request)
+    def __init__(self, host, port, key_file, cert_file, ca_file,
+                 timeout=None):
+        httplib.HTTPConnection.__init__(self, host, port)
 
 
 class TestFilter(filters.BaseHostFilter):
@@ -69,7 +104,7 @@ class HostFiltersTestCase(test.TestCase):
     def setUp(self):
         super(HostFiltersTestCase, self).setUp()
         self.stubs = stubout.StubOutForTesting()
-        stub_out_https_backend(self.stubs)
+        self._start_attestation_server()
         self.context = context.RequestContext('fake', 'fake')
         self.json_query = jsonutils.dumps(
                 ['and', ['>=', '$free_ram_mb', 1024],
@@ -82,6 +117,20 @@ class HostFiltersTestCase(test.TestCase):
         for cls in classes:
             self.class_map[cls.__name__] = cls
 
+    def tearDown(self):
+        self.attestation_server.stop()
+        timeutils.clear_time_override()
+        super(HostFiltersTestCase, self).tearDown()
+
+    def _start_attestation_server(self):
+        self.attestation_server = FakeAttestationServer()
+        self.stubs.Set(trusted_filter, 'HTTPSClientAuthConnection',
+                       FakeAttestationConnection)
+        self.stubs.Set(trusted_filter, '_ATTESTATION_CACHE', None)
+        FLAGS.set_override('server', '127.0.0.1', group='trusted_computing')
+        FLAGS.set_override('port', str(self.attestation_server.server_port),
+                           group='trusted_computing')
+
     def test_get_filter_classes(self):
         classes = filters.get_filter_classes(
                 ['nova.tests.scheduler.test_host_filters.TestFilter'])
@@ -111,6 +160,10 @@ class HostFiltersTestCase(test.TestCase):
             return ret_value
         self.stubs.Set(utils, 'service_is_up', fake_service_is_up)
 
+    def _affinity_passes(self, filt_cls, host, filter_properties):
+        filt_cls.prepare(filters.FilterRequest(filter_properties), [host])
+        return filt_cls.host_passes(host, filter_properties)
+
     def test_affinity_different_filter_passes(self):
         filt_cls = self.class_map['DifferentHostFilter']()
         host = fakes.FakeHostState('host1', 'compute', {})
@@ -122,7 +175,8 @@ class HostFiltersTestCase(test.TestCase):
                              'scheduler_hints': {
                                 'different_host': [instance_uuid], }}
 
-        self.assertTrue(filt_cls.host_passes(host, filter_properties))
+        self.assertTrue(self._affinity_passes(filt_cls, host,
+                                              filter_properties))
 
     def test_affinity_different_filter_no_list_passes(self):
         filt_cls = self.class_map['DifferentHostFilter']()
@@ -135,7 +189,8 @@ class HostFiltersTestCase(test.TestCase):
                              'scheduler_hints': {
                                  'different_host': instance_uuid}}
 
-        self.assertTrue(filt_cls.host_passes(host, filter_properties))
+        self.assertTrue(self._affinity_passes(filt_cls, host,
+                                              filter_properties))
 
     def test_affinity_different_filter_fails(self):
         filt_cls = self.class_map['DifferentHostFilter']()
@@ -148,7 +203,8 @@ class HostFiltersTestCase(test.TestCase):
                              'scheduler_hints': {
                                 'different_host': [instance_uuid], }}
 
-        self.assertFalse(filt_cls.host_passes(host, filter_properties))
+        self.assertFalse(self._affinity_passes(filt_cls, host,
+                                               filter_properties))
 
     def test_affinity_different_filter_handles_none(self):
         filt_cls = self.class_map['DifferentHostFilter']()
@@ -160,7 +216,8 @@ class HostFiltersTestCase(test.TestCase):
         filter_properties = {'context': self.context.elevated(),
                              'scheduler_hints': None}
 
-        self.assertTrue(filt_cls.host_passes(host, filter_properties))
+        self.assertTrue(self._affinity_passes(filt_cls, host,
+                                              filter_properties))
 
     def test_affinity_same_filter_no_list_passes(self):
         filt_cls = self.class_map['SameHostFilter']()
@@ -173,7 +230,8 @@ class HostFiltersTestCase(test.TestCase):
                              'scheduler_hints': {
                                  'same_host': instance_uuid}}
 
-        self.assertTrue(filt_cls.host_passes(host, filter_properties))
+        self.assertTrue(self._affinity_passes(filt_cls, host,
+                                              filter_properties))
 
     def test_affinity_same_filter_passes(self):
         filt_cls = self.class_map['SameHostFilter']()
@@ -186,7 +244,8 @@ class HostFiltersTestCase(test.TestCase):
                              'scheduler_hints': {
                                 'same_host': [instance_uuid], }}
 
-        self.assertTrue(filt_cls.host_passes(host, filter_properties))
+        self.assertTrue(self._affinity_passes(filt_cls, host,
+                                              filter_properties))
 
     def test_affinity_same_filter_fails(self):
         filt_cls = self.class_map['SameHostFilter']()
@@ -199,7 +258,8 @@ class HostFiltersTestCase(test.TestCase):
                              'scheduler_hints': {
                                 'same_host': [instance_uuid], }}
 
-        self.assertFalse(filt_cls.host_passes(host, filter_properties))
+        self.assertFalse(self._affinity_passes(filt_cls, host,
+                                               filter_properties))
 
     def test_affinity_same_filter_handles_none(self):
         filt_cls = self.class_map['SameHostFilter']()
@@ -211,7 +271,48 @@ class HostFiltersTestCase(test.TestCase):
         filter_properties = {'context': self.context.elevated(),
                              'scheduler_hints': None}
 
-        self.assertTrue(filt_cls.host_passes(host, filter_properties))
+        self.assertTrue(self._affinity_passes(filt_cls, host,
+                                              filter_properties))
+
+    def test_affinity_filters_work_without_prepare(self):
+        instance = fakes.FakeInstance(context=self.context,
+                                      params={'host': 'host1'})
+        filter_properties = {'context': self.context.elevated(),
+                             'scheduler_hints': {
+                                'same_host': [instance.uuid],
+                                'different_host': [instance.uuid], }}
+        host1 = fakes.FakeHostState('host1', 'compute', {})
+        host2 = fakes.FakeHostState('host2', 'compute', {})
+
+        filt_cls = self.class_map['SameHostFilter']()
+        self.assertTrue(filt_cls.host_passes(host1, filter_properties))
+        self.assertFalse(filt_cls.host_passes(host2, filter_properties))
+        filt_cls = self.class_map['DifferentHostFilter']()
+        self.assertFalse(filt_cls.host_passes(host1, filter_properties))
+        self.assertTrue(filt_cls.host_passes(host2, filter_properties))
+        self.assertTrue(filt_cls.host_passes(host1, {}))
+
+    def test_affinity_filters_share_one_lookup_per_request(self):
+        instance = fakes.FakeInstance(context=self.context,
+                                      params={'host': 'host1'})
+        filter_properties = {'context': self.context.elevated(),
+                             'scheduler_hints': {
+                                'same_host': [instance.uuid], }}
+        filter_request = filters.FilterRequest(filter_properties)
+        hosts = [fakes.FakeHostState('host%d' % i, 'compute', {})
+                 for i in xrange(1, 4)]
+
+        self.mox.StubOutWithMock(db, 'instance_get_hosts_by_uuids')
+        db.instance_get_hosts_by_uuids(mox.IgnoreArg(),
+                [instance.uuid]).AndReturn({instance.uuid: 'host1'})
+        self.mox.ReplayAll()
+
+        for attempt in xrange(2):
+            filt_cls = self.class_map['SameHostFilter']()
+            filt_cls.prepare(filter_request, hosts)
+            self.assertEqual([filt_cls.host_passes(host, filter_properties)
+                              for host in hosts],
+                             [True, False, False])
 
     def test_affinity_simple_cidr_filter_passes(self):
         filt_cls = self.class_map['SimpleCIDRAffinityFilter']()
@@ -682,6 +783,42 @@ class HostFiltersTestCase(test.TestCase):
         self.assertRaises(KeyError,
                 filt_cls.host_passes, host, filter_properties)
 
+    def test_json_filter_unknown_operator_raises_on_prepare(self):
+        filt_cls = self.class_map['JsonFilter']()
+        raw = ['and', ['>=', '$free_ram_mb', 1024], ['!=', 1, 2]]
+        filter_properties = {
+            'scheduler_hints': {
+                'query': jsonutils.dumps(raw),
+            },
+        }
+        self.assertRaises(KeyError, filt_cls.prepare,
+                          filters.FilterRequest(filter_properties), [])
+
+    def test_json_filter_compiles_once_per_request(self):
+        filter_properties = {
+            'scheduler_hints': {
+                'query': self.json_query,
+            },
+        }
+        filter_request = filters.FilterRequest(filter_properties)
+        hosts = [fakes.FakeHostState('host%d' % i, 'compute',
+                        {'free_ram_mb': 1024 * i,
+                         'free_disk_mb': 200 * 1024,
+                         'capabilities': {'enabled': True}})
+                 for i in xrange(3)]
+
+        parsed_query = jsonutils.loads(self.json_query)
+        self.mox.StubOutWithMock(jsonutils, 'loads')
+        jsonutils.loads(self.json_query).AndReturn(parsed_query)
+        self.mox.ReplayAll()
+
+        for attempt in xrange(2):
+            filt_cls = self.class_map['JsonFilter']()
+            filt_cls.prepare(filter_request, hosts)
+            self.assertEqual([filt_cls.host_passes(host, filter_properties)
+                              for host in hosts],
+                             [False, True, True])
+
     def test_json_filter_empty_filters_pass(self):
         filt_cls = self.class_map['JsonFilter']()
         host = fakes.FakeHostState('host1', 'compute',
@@ -752,8 +889,7 @@ class HostFiltersTestCase(test.TestCase):
         self.assertTrue(filt_cls.host_passes(host, filter_properties))
 
     def test_trusted_filter_trusted_and_trusted_passes(self):
-        global DATA
-        DATA = '{"hosts":[{"host_name":"host1","trust_lvl":"trusted"}]}'
+        self.attestation_server.trust_levels = {'host1': 'trusted'}
         self._stub_service_is_up(True)
         filt_cls = self.class_map['TrustedFilter']()
         extra_specs = {'trusted_host': 'trusted'}
@@ -763,8 +899,7 @@ class HostFiltersTestCase(test.TestCase):
         self.assertTrue(filt_cls.host_passes(host, filter_properties))
 
     def test_trusted_filter_trusted_and_untrusted_fails(self):
-        global DATA
-        DATA = '{"hosts":[{"host_name":"host1","trust_lvl":"untrusted"}]}'
+        self.attestation_server.trust_levels = {'host1': 'untrusted'}
         self._stub_service_is_up(True)
         filt_cls = self.class_map['TrustedFilter']()
         extra_specs = {'trusted_host': 'trusted'}
@@ -774,8 +909,7 @@ class HostFiltersTestCase(test.TestCase):
         self.assertFalse(filt_cls.host_passes(host, filter_properties))
 
     def test_trusted_filter_untrusted_and_trusted_fails(self):
-        global DATA
-        DATA = '{"hosts":[{"host_name":"host1","trust_lvl":"trusted"}]}'
+        self.attestation_server.trust_levels = {'host1': 'trusted'}
         self._stub_service_is_up(True)
         filt_cls = self.class_map['TrustedFilter']()
         extra_specs = {'trusted_host': 'untrusted'}
@@ -785,8 +919,7 @@ class HostFiltersTestCase(test.TestCase):
         self.assertFalse(filt_cls.host_passes(host, filter_properties))
 
     def test_trusted_filter_untrusted_and_untrusted_passes(self):
-        global DATA
-        DATA = '{"hosts":[{"host_name":"host1","trust_lvl":"untrusted"}]}'
+        self.attestation_server.trust_levels = {'host1': 'untrusted'}
         self._stub_service_is_up(True)
         filt_cls = self.class_map['TrustedFilter']()
         extra_specs = {'trusted_host': 'untrusted'}
@@ -795,6 +928,78 @@ class HostFiltersTestCase(test.TestCase):
         host = fakes.FakeHostState('host1', 'compute', {})
         self.assertTrue(filt_cls.host_passes(host, filter_properties))
 
+    def _trusted_filter_passes(self, filter_request, hosts):
+        filt_cls = self.class_map['TrustedFilter']()
+        filt_cls.prepare(filter_request, hosts)
+        return [filt_cls.host_passes(host, filter_request.filter_properties)
+                for host in hosts]
+
+    def test_trusted_filter_attests_hosts_together(self):
+        self.attestation_server.trust_levels = {'host1': 'trusted',
+                                                'host2': 'untrusted'}
+        extra_specs = {'trusted_host': 'trusted'}
+        filter_request = filters.FilterRequest(
+                {'instance_type': {'memory_mb': 1024,
+                                   'extra_specs': extra_specs}})
+        hosts = [fakes.FakeHostState('host%d' % i, 'compute', {})
+                 for i in xrange(1, 4)]
+
+        self.assertEqual(self._trusted_filter_passes(filter_request, hosts),
+                         [True, False, False])
+        self.assertEqual(self.attestation_server.requests,
+                [('/OpenAttestationWebServices/V1.0/PollHosts',
+                  {'count': 3, 'hosts': ['host1', 'host2', 'host3']})])
+
+        # Cached for the next request
+        self.assertEqual(self._trusted_filter_passes(filter_request, hosts),
+                         [True, False, False])
+        self.assertEqual(len(self.attestation_server.requests), 1)
+
+    def test_trusted_filter_refreshes_cached_levels(self):
+        self.stubs.Set(greenthread, 'spawn_n',
+                       lambda func, *args: func(*args))
+        timeutils.set_time_override()
+        FLAGS.set_override('attestation_cache_ttl', 60,
+                           group='trusted_computing')
+        self.attestation_server.trust_levels = {'host1': 'trusted'}
+        extra_specs = {'trusted_host': 'trusted'}
+        filter_request = filters.FilterRequest(
+                {'instance_type': {'memory_mb': 1024,
+                                   'extra_specs': extra_specs}})
+        hosts = [fakes.FakeHostState('host1', 'compute', {})]
+
+        self.assertEqual(self._trusted_filter_passes(filter_request, hosts),
+                         [True])
+        self.attestation_server.trust_levels = {'host1': 'untrusted'}
+
+        # Half way to expiring, the cached level is used while the host
+        # is attested again in the background
+        timeutils.advance_time_seconds(30)
+        self.assertEqual(self._trusted_filter_passes(filter_request, hosts),
+                         [True])
+        self.assertEqual(len(self.attestation_server.requests), 2)
+        self.assertEqual(self._trusted_filter_passes(filter_request, hosts),
+                         [False])
+        self.assertEqual(len(self.attestation_server.requests), 2)
+
+        # Expired levels are attested before they are used
+        self.attestation_server.trust_levels = {'host1': 'trusted'}
+        timeutils.advance_time_seconds(60)
+        self.assertEqual(self._trusted_filter_passes(filter_request, hosts),
+                         [True])
+        self.assertEqual(len(self.attestation_server.requests), 3)
+
+    def test_trusted_filter_attestation_failure_fails(self):
+        self.attestation_server.trust_levels = {'host1': 'trusted'}
+        self.attestation_server.stop()
+        extra_specs = {'trusted_host': 'trusted'}
+        filter_request = filters.FilterRequest(
+                {'instance_type': {'memory_mb': 1024,
+                                   'extra_specs': extra_specs}})
+        hosts = [fakes.FakeHostState('host1', 'compute', {})]
+        self.assertEqual(self._trusted_filter_passes(filter_request, hosts),
+                         [False])
+
     def test_core_filter_passes(self):
         filt_cls = self.class_map['CoreFilter']()
         filter_properties = {'instance_type': {'vcpus': 1}}
@@ -21,17 +21,18 @@ import datetime
 from nova import db
 from nova import exception
 from nova.openstack.common import timeutils
+from nova.scheduler import filters
 from nova.scheduler import host_manager
 from nova import test
 from nova.tests.scheduler import fakes
 
 
-class ComputeFilterClass1(object):
+class ComputeFilterClass1(filters.BaseHostFilter):
     def host_passes(self, *args, **kwargs):
         pass
 
 
-class ComputeFilterClass2(object):
+class ComputeFilterClass2(filters.BaseHostFilter):
     def host_passes(self, *args, **kwargs):
         pass
 
@@ -55,35 +56,41 @@ class HostManagerTestCase(test.TestCase):
         self.host_manager.filter_classes = [ComputeFilterClass1,
                 ComputeFilterClass2]
 
-        # Test 'compute' returns 1 correct function
-        filter_fns = self.host_manager._choose_host_filters(None)
-        self.assertEqual(len(filter_fns), 1)
-        self.assertEqual(filter_fns[0].__func__,
-                ComputeFilterClass2.host_passes.__func__)
+        # Test 'compute' returns 1 correct filter
+        filter_objs = self.host_manager._choose_host_filters(None)
+        self.assertEqual(len(filter_objs), 1)
+        self.assertTrue(isinstance(filter_objs[0], ComputeFilterClass2))
 
     def test_filter_hosts(self):
         topic = 'fake_topic'
 
-        filters = ['fake-filter1', 'fake-filter2']
+        filter_objs = [ComputeFilterClass1(), ComputeFilterClass2()]
+        filter_fns = [filter_obj.host_passes for filter_obj in filter_objs]
         fake_host1 = host_manager.HostState('host1', topic)
         fake_host2 = host_manager.HostState('host2', topic)
         hosts = [fake_host1, fake_host2]
         filter_properties = 'fake_properties'
+        filter_request = filters.FilterRequest(filter_properties)
 
         self.mox.StubOutWithMock(self.host_manager,
                 '_choose_host_filters')
+        self.mox.StubOutWithMock(filter_objs[0], 'prepare')
+        self.mox.StubOutWithMock(filter_objs[1], 'prepare')
         self.mox.StubOutWithMock(fake_host1, 'passes_filters')
         self.mox.StubOutWithMock(fake_host2, 'passes_filters')
 
-        self.host_manager._choose_host_filters(None).AndReturn(filters)
-        fake_host1.passes_filters(filters, filter_properties).AndReturn(
+        self.host_manager._choose_host_filters(None).AndReturn(filter_objs)
+        filter_objs[0].prepare(filter_request, hosts)
+        filter_objs[1].prepare(filter_request, hosts)
+        fake_host1.passes_filters(filter_fns, filter_properties).AndReturn(
                 False)
-        fake_host2.passes_filters(filters, filter_properties).AndReturn(
+        fake_host2.passes_filters(filter_fns, filter_properties).AndReturn(
                 True)
 
         self.mox.ReplayAll()
         filtered_hosts = self.host_manager.filter_hosts(hosts,
-                filter_properties, filters=None)
+                filter_properties, filters=None,
+                filter_request=filter_request)
         self.assertEqual(len(filtered_hosts), 1)
         self.assertEqual(filtered_hosts[0], fake_host2)
 
@@ -137,8 +144,7 @@ class HostManagerTestCase(test.TestCase):
         # Invalid service
         host_manager.LOG.warn("No service for compute ID 5")
         db.instance_get_all(context,
-                columns_to_join=['instance_type']).AndReturn(
-                        fakes.INSTANCES)
+                columns_to_join=[]).AndReturn(fakes.INSTANCES)
 
         self.mox.ReplayAll()
         host_states = self.host_manager.get_all_host_states(context, topic)
@@ -146,7 +146,8 @@ class SchedulerManagerTestCase(test.TestCase):
 
         db.service_get_all_compute_by_host(self.context, host).AndReturn(
                 computes)
-        db.instance_get_all_by_host(self.context, host).AndReturn(instances)
+        db.instance_get_all_by_host(self.context, host,
+                columns_to_join=[]).AndReturn(instances)
 
         self.mox.ReplayAll()
         result = self.manager.show_host_resources(self.context, host)
@@ -328,15 +329,18 @@ class SchedulerTestCase(test.TestCase):
                 host, capabilities)
 
     def test_hosts_up(self):
-        service1 = {'host': 'host1'}
-        service2 = {'host': 'host2'}
-        services = [service1, service2]
-
-        self.mox.StubOutWithMock(db, 'service_get_all_by_topic')
+        service1 = {'id': 1, 'host': 'host1', 'topic': self.topic,
+                    'disabled': False, 'deleted': False}
+        service2 = {'id': 2, 'host': 'host2', 'topic': self.topic,
+                    'disabled': False, 'deleted': False}
+        service3 = {'id': 3, 'host': 'host3', 'topic': 'other_topic',
+                    'disabled': False, 'deleted': False}
+        services = [service1, service2, service3]
+
+        self.mox.StubOutWithMock(db, 'service_get_all')
         self.mox.StubOutWithMock(utils, 'service_is_up')
 
-        db.service_get_all_by_topic(self.context,
-                self.topic).AndReturn(services)
+        db.service_get_all(self.context).AndReturn(services)
         utils.service_is_up(service1).AndReturn(False)
         utils.service_is_up(service2).AndReturn(True)
 
@@ -472,7 +476,8 @@ class SchedulerTestCase(test.TestCase):
         db.service_get_all_compute_by_host(self.context, dest).AndReturn(
                 [{'compute_node': [{'memory_mb': 2048,
                                     'hypervisor_version': 1}]}])
-        db.instance_get_all_by_host(self.context, dest).AndReturn(
+        db.instance_get_all_by_host(self.context, dest,
+                columns_to_join=[]).AndReturn(
                 [dict(memory_mb=256), dict(memory_mb=512)])
 
         # Common checks (same hypervisor, etc)
@@ -661,7 +666,8 @@ class SchedulerTestCase(test.TestCase):
 
         self.driver._get_compute_info(self.context, dest).AndReturn(
                                                        {'memory_mb': 2048})
-        db.instance_get_all_by_host(self.context, dest).AndReturn(
+        db.instance_get_all_by_host(self.context, dest,
+                columns_to_join=[]).AndReturn(
                 [dict(memory_mb=1024), dict(memory_mb=512)])
 
         self.mox.ReplayAll()
@@ -45,6 +45,8 @@ from nova import test
 
 FLAGS = flags.FLAGS
 
+test.add_reset_hook(ec2utils.reset_cache)
+
 
 class FakeHttplibSocket(object):
     """a fake socket implementation for httplib.HTTPResponse, trivial"""
@@ -21,8 +21,11 @@
 
 import datetime
 
+import sqlalchemy
+
 from nova import context
 from nova import db
+from nova.db.sqlalchemy.session import get_engine
 from nova import exception
 from nova import flags
 from nova.openstack.common import timeutils
@@ -57,6 +60,140 @@ class DbApiTestCase(test.TestCase):
                                                 {'display_name': u'test'})
         self.assertEqual(1, len(result))
 
+    def test_instance_get_all_by_filters_paginate(self):
+        instances = [self.create_instances_with_args(display_name=name)
+                     for name in ('test1', 'other', 'test2', 'test3')]
+        uuids = [instance['uuid'] for instance in instances]
+
+        def get_page(limit, marker=None):
+            result = db.instance_get_all_by_filters(
+                    self.context, {'display_name': 'test'}, 'id', 'asc',
+                    limit=limit, marker=marker)
+            return [instance['uuid'] for instance in result]
+
+        self.assertEqual(get_page(2), [uuids[0], uuids[2]])
+        self.assertEqual(get_page(2, uuids[2]), [uuids[3]])
+        self.assertEqual(get_page(2, uuids[3]), [])
+        # The marker does not have to match the filters
+        self.assertEqual(get_page(1, uuids[1]), [uuids[2]])
+
+    def test_instance_get_all_by_filters_marker_not_found(self):
+        self.create_instances_with_args()
+        self.assertRaises(exception.MarkerNotFound,
+                          db.instance_get_all_by_filters,
+                          self.context, {}, limit=1, marker='not-found')
+
+    def test_instance_get_columns_to_join(self):
+        instance = self.create_instances_with_args()
+        joined = ['security_groups', 'info_cache', 'metadata',
+                  'instance_type']
+
+        result = db.instance_get_by_uuid(self.context, instance['uuid'])
+        for column in joined:
+            self.assertTrue(column in result.__dict__)
+
+        result = db.instance_get_by_uuid(self.context, instance['uuid'],
+                                         columns_to_join=['metadata'])
+        self.assertTrue('metadata' in result.__dict__)
+        self.assertFalse('info_cache' in result.__dict__)
+
+        result = db.instance_get(self.context, instance['id'],
+                                 columns_to_join=[])
+        self.assertEqual(result['uuid'], instance['uuid'])
+        for column in joined:
+            self.assertFalse(column in result.__dict__)
+
+    def test_instance_get_all_columns_to_join(self):
+        self.create_instances_with_args()
+        ctxt = context.get_admin_context()
+        for result in (db.instance_get_all_by_filters(self.context, {}),
+                       db.instance_get_all_by_host(ctxt, 'host1')):
+            self.assertTrue('info_cache' in result[0].__dict__)
+            self.assertTrue('instance_type' in result[0].__dict__)
+
+        for result in (db.instance_get_all_by_filters(self.context, {},
+                                                      columns_to_join=[]),
+                       db.instance_get_all_by_host(ctxt, 'host1',
+                                                   columns_to_join=[])):
+            self.assertEqual(len(result), 1)
+            self.assertFalse('info_cache' in result[0].__dict__)
+            self.assertFalse('instance_type' in result[0].__dict__)
+
+    def test_instance_type_get_all_paginate(self):
+        def get_page(limit, marker=None):
+            result = db.instance_type_get_all(self.context,
+                                              sort_key='flavorid',
+                                              limit=limit, marker=marker)
+            return [inst_type['flavorid'] for inst_type in result]
+
+        flavorids = get_page(None)
+        self.assertEqual(flavorids, sorted(flavorids))
+        self.assertEqual(get_page(2), flavorids[:2])
+        self.assertEqual(get_page(2, flavorids[1]), flavorids[2:4])
+        self.assertRaises(exception.MarkerNotFound, get_page, 2, 'asdf')
+
+    def test_instance_type_get_all_reused_flavorid_marker(self):
+        ctxt = context.get_admin_context()
+
+        def create(name):
+            return db.instance_type_create(ctxt,
+                                           dict(name=name, memory_mb=512,
+                                                vcpus=1, root_gb=1,
+                                                ephemeral_gb=0,
+                                                flavorid='reused'))
+
+        create('a.deleted')
+        db.instance_type_destroy(ctxt, 'a.deleted')
+        create('z.current')
+
+        # The page starts after the flavor using the flavorid now
+        self.assertEqual(db.instance_type_get_all(self.context, limit=10,
+                                                  marker='reused'), [])
+
+        # Then after the flavor that used it last
+        db.instance_type_destroy(ctxt, 'z.current')
+        self.assertEqual(db.instance_type_get_all(self.context, limit=10,
+                                                  marker='reused'), [])
+
+    def test_volume_get_all_paginate(self):
+        ctxt = context.get_admin_context()
+        for i in xrange(3):
+            db.volume_create(ctxt, {'project_id': self.project_id})
+        db.volume_create(ctxt, {'project_id': 'other'})
+
+        def get_pages(get_all, *args):
+            ids = []
+            marker = None
+            while True:
+                page = get_all(ctxt, *args, limit=2, marker=marker)
+                ids.extend(volume['id'] for volume in page)
+                if len(page) < 2:
+                    return ids
+                marker = page[-1]['id']
+
+        all_ids = [volume['id'] for volume in db.volume_get_all(ctxt)]
+        self.assertEqual(len(all_ids), 4)
+        self.assertEqual(get_pages(db.volume_get_all), all_ids)
+        project_ids = get_pages(db.volume_get_all_by_project,
+                                self.project_id)
+        self.assertEqual(project_ids,
+                         [volume_id for volume_id in all_ids
+                          if volume_id in project_ids])
+        self.assertEqual(len(project_ids), 3)
+
+    def test_snapshot_get_all_paginate(self):
+        ctxt = context.get_admin_context()
+        snapshots = [db.snapshot_create(ctxt, {'project_id': self.project_id})
+                     for i in xrange(3)]
+        result = db.snapshot_get_all(ctxt, sort_key='id', sort_dir='asc')
+        ids = [snapshot['id'] for snapshot in result]
+        self.assertEqual(ids, sorted(s['id'] for s in snapshots))
+
+        result = db.snapshot_get_all_by_project(ctxt, self.project_id,
+                                                sort_key='id', sort_dir='asc',
+                                                limit=1, marker=ids[0])
+        self.assertEqual([snapshot['id'] for snapshot in result], ids[1:2])
+
     def test_instance_get_all_by_filters_deleted(self):
         inst1 = self.create_instances_with_args()
         inst2 = self.create_instances_with_args(reservation_id='b')
@@ -70,6 +207,26 @@ class DbApiTestCase(test.TestCase):
         else:
             self.assertTrue(result[1].deleted)
 
+    def test_instance_get_hosts_by_uuids(self):
+        inst1 = self.create_instances_with_args()
+        inst2 = self.create_instances_with_args(host='host2')
+        self.create_instances_with_args(host='host3')
+        inst5 = db.instance_create(self.context.elevated(),
+                                   {'host': 'host5',
+                                    'project_id': 'other_project'})
+        uuids = [inst1['uuid'], inst2['uuid'], inst5['uuid'], 'missing']
+
+        result = db.instance_get_hosts_by_uuids(self.context, uuids)
+        self.assertEqual(result, {inst1['uuid']: 'host1',
+                                  inst2['uuid']: 'host2'})
+        result = db.instance_get_hosts_by_uuids(self.context.elevated(),
+                                                uuids)
+        self.assertEqual(result, {inst1['uuid']: 'host1',
+                                  inst2['uuid']: 'host2',
+                                  inst5['uuid']: 'host5'})
+        self.assertEqual(db.instance_get_hosts_by_uuids(self.context, []),
+                         {})
+
     def test_migration_get_unconfirmed_by_dest_compute(self):
         ctxt = context.get_admin_context()
 
@@ -306,6 +463,45 @@ class DbApiTestCase(test.TestCase):
         expected = {uuids[0]: [], uuids[1]: []}
         self.assertEqual(expected, instance_faults)
 
+    def test_instance_fault_get_latest_by_instance_uuids(self):
+        ctxt = context.get_admin_context()
+        instance1 = db.instance_create(ctxt, {})
+        instance2 = db.instance_create(ctxt, {})
+        instance3 = db.instance_create(ctxt, {})
+        uuids = [instance1['uuid'], instance2['uuid'], instance3['uuid']]
+
+        for code in (404, 500, 409):
+            db.instance_fault_create(ctxt, {'instance_uuid': uuids[0],
+                                            'code': code})
+        db.instance_fault_create(ctxt, {'instance_uuid': uuids[1],
+                                        'code': 500})
+
+        faults = db.instance_fault_get_latest_by_instance_uuids(ctxt, uuids)
+        self.assertEqual(sorted(faults.keys()), sorted(uuids[:2]))
+        self.assertEqual(faults[uuids[0]]['code'], 409)
+        self.assertEqual(faults[uuids[1]]['code'], 500)
+        self.assertEqual(
+                db.instance_fault_get_latest_by_instance_uuids(ctxt, []), {})
+
+    def test_instance_fault_prune(self):
+        ctxt = context.get_admin_context()
+        instance1 = db.instance_create(ctxt, {})
+        instance2 = db.instance_create(ctxt, {})
+        uuids = [instance1['uuid'], instance2['uuid']]
+
+        for code in xrange(500, 505):
+            db.instance_fault_create(ctxt, {'instance_uuid': uuids[0],
+                                            'code': code})
+        db.instance_fault_create(ctxt, {'instance_uuid': uuids[1],
+                                        'code': 500})
+
+        self.assertEqual(db.instance_fault_prune(ctxt, uuids, 2), 3)
+        faults = db.instance_fault_get_by_instance_uuids(ctxt, uuids)
+        self.assertEqual([fault['code'] for fault in faults[uuids[0]]],
+                         [504, 503])
+        self.assertEqual(len(faults[uuids[1]]), 1)
+        self.assertEqual(db.instance_fault_prune(ctxt, uuids, 2), 0)
+
     def test_dns_registration(self):
         domain1 = 'test.domain.one'
         domain2 = 'test.domain.two'
@@ -416,6 +612,80 @@ class DbApiTestCase(test.TestCase):
         ec2_id = db.get_ec2_snapshot_id_by_uuid(self.context, 'fake-uuid')
         self.assertEqual(ref['id'], ec2_id)
 
+    def test_s3_image_get_by_uuids(self):
+        ref1 = db.s3_image_create(self.context, 'fake-uuid1')
+        ref2 = db.s3_image_create(self.context, 'fake-uuid2')
+        db.s3_image_create(self.context, 'fake-uuid3')
+
+        result = db.s3_image_get_by_uuids(self.context,
+                ['fake-uuid1', 'fake-uuid2', 'fake-uuid4'])
+        self.assertEqual(sorted((r['uuid'], r['id']) for r in result),
+                         [('fake-uuid1', ref1['id']),
+                          ('fake-uuid2', ref2['id'])])
+        self.assertEqual(db.s3_image_get_by_uuids(self.context, []), [])
+
+    def test_service_heartbeat(self):
+        ctxt = context.get_admin_context()
+        service = db.service_create(ctxt, {'host': 'host1',
+                                           'binary': 'nova-fake',
+                                           'topic': 'fake',
+                                           'report_count': 0})
+        db.service_heartbeat(ctxt, service['id'])
+        db.service_heartbeat(ctxt, service['id'],
+                             {'availability_zone': 'zone1'})
+
+        result = db.service_get(ctxt, service['id'])
+        self.assertEqual(result['report_count'], 2)
+        self.assertEqual(result['availability_zone'], 'zone1')
+        self.assertNotEqual(result['updated_at'], None)
+
+    def test_service_heartbeat_not_found(self):
+        ctxt = context.get_admin_context()
+        self.assertRaises(exception.ServiceNotFound,
+                          db.service_heartbeat, ctxt, 12345)
+
+    def test_service_get_all_updated_since(self):
+        ctxt = context.get_admin_context()
+        timeutils.set_time_override()
+        try:
+            service1 = db.service_create(ctxt, {'host': 'host1'})
+            service2 = db.service_create(ctxt, {'host': 'host2'})
+
+            timeutils.advance_time_seconds(60)
+            since = timeutils.utcnow()
+            db.service_heartbeat(ctxt, service1['id'])
+            db.service_destroy(ctxt, service2['id'])
+            db.service_create(ctxt, {'host': 'host3'})
+
+            result = db.service_get_all_updated_since(ctxt, since)
+        finally:
+            timeutils.clear_time_override()
+        self.assertEqual(sorted((r['host'], r['deleted']) for r in result),
+                         [('host1', False), ('host2', True),
+                          ('host3', False)])
+
+    def test_service_get_all_added_or_removed_since(self):
+        ctxt = context.get_admin_context()
+        timeutils.set_time_override()
+        try:
+            service1 = db.service_create(ctxt, {'host': 'host1'})
+            service2 = db.service_create(ctxt, {'host': 'host2'})
+            service3 = db.service_create(ctxt, {'host': 'host3'})
+
+            timeutils.advance_time_seconds(60)
+            since = timeutils.utcnow()
+            db.service_heartbeat(ctxt, service1['id'])
+            db.service_destroy(ctxt, service2['id'])
+            db.service_update(ctxt, service3['id'], {'disabled': True})
+            db.service_create(ctxt, {'host': 'host4'})
+
+            result = db.service_get_all_added_or_removed_since(ctxt, since)
+        finally:
+            timeutils.clear_time_override()
+        self.assertEqual(sorted((r['host'], r['deleted']) for r in result),
+                         [('host2', True), ('host3', False),
+                          ('host4', False)])
+
 
 def _get_fake_aggr_values():
     return {'name': 'fake_aggregate',
@@ -818,6 +1088,21 @@ class CapacityTestCase(test.TestCase):
         self.assertEquals(x.current_workload, 2)
         self.assertEquals(x.running_vms, 5)
 
+    def test_compute_node_get_by_hosts(self):
+        self._create_helper('host1')
+        service = db.service_create(self.ctxt, dict(host='host2',
+                                                    binary='binary2',
+                                                    topic='compute'))
+        self.compute_node_dict['service_id'] = service.id
+        self._create_helper('host2')
+
+        nodes = db.compute_node_get_by_hosts(self.ctxt,
+                                             ['host1', 'host2', 'host3'])
+        self.assertEqual(sorted(nodes.keys()), ['host1', 'host2'])
+        self.assertEqual(nodes['host1']['service_id'], self.service.id)
+        self.assertEqual(nodes['host2']['service_id'], service.id)
+        self.assertEqual(db.compute_node_get_by_hosts(self.ctxt, []), {})
+
 
 class TestIpAllocation(test.TestCase):
 
@@ -1080,3 +1365,116 @@ class SMVolumeDBApiTestCase(test.TestCase):
                           db.sm_flavor_get,
                           ctxt,
                           "fake")
+
+
+class ArchiveTestCase(test.TestCase):
+    def setUp(self):
+        super(ArchiveTestCase, self).setUp()
+        self.context = context.get_admin_context()
+        self.engine = get_engine()
+        self.meta = sqlalchemy.MetaData(bind=self.engine)
+
+    def _count(self, tablename, deleted=None):
+        table = sqlalchemy.Table(tablename, self.meta, autoload=True)
+        query = sqlalchemy.select([sqlalchemy.func.count()]).select_from(table)
+        if deleted is not None:
+            query = query.where(table.c.deleted == deleted)
+        return self.engine.execute(query).scalar()
+
+    def _create_faults(self, count):
+        instance = db.instance_create(self.context, {})
+        for code in xrange(count):
+            db.instance_fault_create(self.context,
+                                     {'instance_uuid': instance['uuid'],
+                                      'code': code})
+        return instance
+
+    def test_archive_deleted_rows(self):
+        instance1 = db.instance_create(self.context, {})
+        instance2 = db.instance_create(self.context, {})
+        db.instance_create(self.context, {})
+        db.instance_destroy(self.context, instance1['uuid'])
+        db.instance_destroy(self.context, instance2['uuid'])
+
+        archived = db.archive_deleted_rows(self.context, 1000)
+        self.assertEqual(archived['instances'], 2)
+        self.assertEqual(self._count('instances', deleted=True), 0)
+        self.assertEqual(self._count('instances', deleted=False), 1)
+        self.assertEqual(self._count('shadow_instances'), 2)
+        self.assertEqual(db.archive_deleted_rows(self.context, 1000), {})
+
+    def test_archive_skips_rows_other_rows_refer_to(self):
+        # The system metadata of a deleted instance is not deleted with it
+        self.engine.execute('PRAGMA foreign_keys = ON')
+        try:
+            instance1 = db.instance_create(self.context,
+                    {'system_metadata': {'image_kernel_id': 'fake'}})
+            instance2 = db.instance_create(self.context, {})
+            db.instance_destroy(self.context, instance1['uuid'])
+            db.instance_destroy(self.context, instance2['uuid'])
+
+            instances = sqlalchemy.Table('instances', self.meta,
+                                         autoload=True)
+            self.assertRaises(sqlalchemy.exc.IntegrityError,
+                self.engine.execute,
+                instances.delete().where(
+                    instances.c.uuid == instance1['uuid']))
+
+            self.assertEqual(db.archive_deleted_rows_for_table(
+                    self.context, 'instances', 10), 1)
+            archived = db.archive_deleted_rows(self.context, 10)
+            self.assertFalse('instances' in archived)
+            self.assertEqual(self._count('instances', deleted=True), 1)
+            self.assertEqual(self._count('shadow_instances'), 1)
+        finally:
+            self.engine.execute('PRAGMA foreign_keys = OFF')
+
+    def test_archive_skips_flavors_instances_use(self):
+        values = dict(name='archive.flavor', memory_mb=512, vcpus=1,
+                      root_gb=1, ephemeral_gb=0, flavorid='archive')
+        flavor = db.instance_type_create(self.context, values)
+        db.instance_create(self.context, {'instance_type_id': flavor['id']})
+        db.instance_type_destroy(self.context, 'archive.flavor')
+
+        self.assertEqual(db.archive_deleted_rows_for_table(
+                self.context, 'instance_types', 10), 0)
+        self.assertEqual(self._count('instance_types', deleted=True), 1)
+
+    def test_archive_skips_instances_with_fixed_ips(self):
+        instance = db.instance_create(self.context, {})
+        db.fixed_ip_create(self.context, {'address': '192.168.0.100',
+                                          'instance_uuid': instance['uuid']})
+        db.instance_destroy(self.context, instance['uuid'])
+
+        self.assertFalse('instances' in
+                         db.archive_deleted_rows(self.context, 10))
+        self.assertEqual(self._count('instances', deleted=True), 1)
+
+        db.fixed_ip_disassociate(self.context, '192.168.0.100')
+        self.assertEqual(db.archive_deleted_rows_for_table(
+                self.context, 'instances', 10), 1)
+
+    def test_archive_deleted_rows_max_rows(self):
+        instance = self._create_faults(5)
+        db.instance_fault_prune(self.context, [instance['uuid']], 0)
+
+        count = db.archive_deleted_rows_for_table(self.context,
+                                                  'instance_faults', 3)
+        self.assertEqual(count, 3)
+        self.assertEqual(self._count('instance_faults'), 2)
+        self.assertEqual(self._count('shadow_instance_faults'), 3)
+
+        archived = db.archive_deleted_rows(self.context, 1)
+        self.assertEqual(archived, {'instance_faults': 1})
+
+    def test_archive_deleted_rows_before(self):
+        instance = self._create_faults(2)
+        db.instance_fault_prune(self.context, [instance['uuid']], 0)
+
+        before = timeutils.utcnow() - datetime.timedelta(days=1)
+        self.assertEqual(db.archive_deleted_rows_for_table(
+                self.context, 'instance_faults', 10, before=before), 0)
+
+        before = timeutils.utcnow() + datetime.timedelta(seconds=1)
+        self.assertEqual(db.archive_deleted_rows_for_table(
+                self.context, 'instance_faults', 10, before=before), 2)
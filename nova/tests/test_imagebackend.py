@@ -250,8 +250,11 @@ class LvmTestCase(_ImageTestCase):
                                             sparse=sparse)
         self.disk.get_disk_size(self.TEMPLATE_PATH
                                          ).AndReturn(self.TEMPLATE_SIZE)
-        cmd = ('dd', 'if=%s' % self.TEMPLATE_PATH,
-               'of=%s' % self.PATH, 'bs=4M')
+        cmd = ['dd', 'if=%s' % self.TEMPLATE_PATH, 'of=%s' % self.PATH,
+               'bs=1M', 'count=1', 'skip=0', 'seek=0', 'iflag=fullblock',
+               'oflag=direct', 'conv=notrunc']
+        if sparse:
+            cmd[-1] = 'conv=sparse'
         self.utils.execute(*cmd, run_as_root=True)
         self.mox.ReplayAll()
 
@@ -280,8 +283,11 @@ class LvmTestCase(_ImageTestCase):
                                             self.SIZE, sparse=sparse)
         self.disk.get_disk_size(self.TEMPLATE_PATH
                                          ).AndReturn(self.TEMPLATE_SIZE)
-        cmd = ('dd', 'if=%s' % self.TEMPLATE_PATH,
-               'of=%s' % self.PATH, 'bs=4M')
+        cmd = ['dd', 'if=%s' % self.TEMPLATE_PATH, 'of=%s' % self.PATH,
+               'bs=1M', 'count=1', 'skip=0', 'seek=0', 'iflag=fullblock',
+               'oflag=direct', 'conv=notrunc']
+        if sparse:
+            cmd[-1] = 'conv=sparse'
         self.utils.execute(*cmd, run_as_root=True)
         self.disk.resize2fs(self.PATH)
         self.mox.ReplayAll()
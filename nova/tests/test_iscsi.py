@@ -92,6 +92,22 @@ class TgtAdmTestCase(test.TestCase, TargetAdminTestCase):
         "tgtadm --op show --lld=iscsi --mode=target --tid=1",
         "tgt-admin --delete iqn.2010-10.org.openstack:volume-blaa"])
 
+    def test_get_targets(self):
+        output = "\n".join([
+            "Target 1: iqn.2010-10.org.openstack:volume-1",
+            "    System information:",
+            "        LUN: 0",
+            "            Type: controller",
+            "        LUN: 1",
+            "            Type: disk",
+            "Target 2: iqn.2010-10.org.openstack:volume-2",
+            "        LUN: 0",
+            "            Type: controller"])
+        tgtadm = iscsi.get_target_admin()
+        tgtadm.set_execute(lambda *cmd, **kwargs: (output, None))
+        self.assertEqual(tgtadm.get_targets(),
+                         set(['iqn.2010-10.org.openstack:volume-1']))
+
 
 class IetAdmTestCase(test.TestCase, TargetAdminTestCase):
 
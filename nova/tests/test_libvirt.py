@@ -928,6 +928,34 @@ class LibvirtConnTestCase(test.TestCase):
         # None should be listed, since we fake deleted the last one
         self.assertEquals(len(instances), 0)
 
+    def test_get_info_all(self):
+        running = self.mox.CreateMockAnything()
+        running.name().AndReturn('instance-00000001')
+        running.info().AndReturn((libvirt_driver.VIR_DOMAIN_RUNNING,
+                                  2048, 1024, 1, 100))
+        stopped = self.mox.CreateMockAnything()
+        stopped.name().AndReturn('instance-00000002')
+        stopped.info().AndReturn((libvirt_driver.VIR_DOMAIN_SHUTOFF,
+                                  2048, 0, 1, 0))
+
+        self.mox.StubOutWithMock(libvirt_driver.LibvirtDriver, '_conn')
+        libvirt_driver.LibvirtDriver._conn.numOfDomains = lambda: 2
+        libvirt_driver.LibvirtDriver._conn.listDomainsID = lambda: [0, 1]
+        libvirt_driver.LibvirtDriver._conn.lookupByID = lambda i: running
+        libvirt_driver.LibvirtDriver._conn.listDefinedDomains = (
+                lambda: ['instance-00000002'])
+        libvirt_driver.LibvirtDriver._conn.lookupByName = lambda n: stopped
+
+        self.mox.ReplayAll()
+        conn = libvirt_driver.LibvirtDriver(False)
+        infos = conn.get_info_all()
+        self.assertEqual(sorted(infos.keys()),
+                         ['instance-00000001', 'instance-00000002'])
+        self.assertEqual(infos['instance-00000001']['state'],
+                         power_state.RUNNING)
+        self.assertEqual(infos['instance-00000002']['state'],
+                         power_state.SHUTDOWN)
+
     def test_get_all_block_devices(self):
         xml = [
             # NOTE(vish): id 0 is skipped
@@ -0,0 +1,132 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the in-memory service liveness view."""
+
+import mox
+
+from nova import context
+from nova import db
+from nova import liveness
+from nova.openstack.common import timeutils
+from nova import test
+
+
+class ServiceLivenessViewTestCase(test.TestCase):
+    def setUp(self):
+        super(ServiceLivenessViewTestCase, self).setUp()
+        self.context = context.get_admin_context()
+        self.view = liveness.ServiceLivenessView()
+        timeutils.set_time_override()
+        self.flags(service_liveness_refresh_interval=5,
+                   service_liveness_check_interval=1,
+                   service_down_time=60,
+                   report_interval=10)
+
+    def tearDown(self):
+        timeutils.clear_time_override()
+        super(ServiceLivenessViewTestCase, self).tearDown()
+
+    def _create_service(self, host, topic='compute', **kwargs):
+        values = {'host': host, 'topic': topic, 'binary': 'nova-' + topic}
+        values.update(kwargs)
+        return db.service_create(self.context, values)
+
+    def test_hosts_up(self):
+        self._create_service('host1')
+        self._create_service('host2')
+        self._create_service('host3', disabled=True)
+        self._create_service('host4', topic='volume')
+
+        self.assertEqual(self.view.hosts_up(self.context, 'compute'),
+                         ['host1', 'host2'])
+        self.assertEqual(self.view.hosts_up(self.context, 'volume'),
+                         ['host4'])
+
+    def test_hosts_up_uses_view_until_stale(self):
+        self._create_service('host1')
+        self.assertEqual(self.view.hosts_up(self.context, 'compute'),
+                         ['host1'])
+
+        self.mox.StubOutWithMock(db, 'service_get_all')
+        self.mox.StubOutWithMock(db, 'service_get_all_updated_since')
+        self.mox.ReplayAll()
+
+        timeutils.advance_time_seconds(4)
+        self.assertEqual(self.view.hosts_up(self.context, 'compute'),
+                         ['host1'])
+
+    def test_refresh_is_incremental(self):
+        service1 = self._create_service('host1')
+        service2 = self._create_service('host2')
+        self.view.refresh(self.context)
+
+        timeutils.advance_time_seconds(50)
+        db.service_heartbeat(self.context, service1['id'])
+        timeutils.advance_time_seconds(20)
+
+        self.mox.StubOutWithMock(db, 'service_get_all')
+        self.assertEqual(self.view.hosts_up(self.context, 'compute'),
+                         ['host1'])
+
+        db.service_destroy(self.context, service1['id'])
+        db.service_heartbeat(self.context, service2['id'])
+        timeutils.advance_time_seconds(10)
+        self.assertEqual(self.view.hosts_up(self.context, 'compute'),
+                         ['host2'])
+
+    def test_refresh_picks_up_disabled_services(self):
+        service = self._create_service('host1')
+        self.view.refresh(self.context)
+
+        timeutils.advance_time_seconds(1)
+        db.service_update(self.context, service['id'], {'disabled': True})
+        self.view.refresh(self.context)
+        self.assertEqual(self.view.hosts_up(self.context, 'compute'), [])
+
+    def test_added_and_removed_services_do_not_wait_for_refresh(self):
+        service1 = self._create_service('host1')
+        service2 = self._create_service('host2')
+        self.assertEqual(self.view.hosts_up(self.context, 'compute'),
+                         ['host1', 'host2'])
+
+        self.mox.StubOutWithMock(db, 'service_get_all')
+        self.mox.StubOutWithMock(db, 'service_get_all_updated_since')
+        self.mox.ReplayAll()
+
+        timeutils.advance_time_seconds(2)
+        db.service_destroy(self.context, service1['id'])
+        db.service_update(self.context, service2['id'], {'disabled': True})
+        self._create_service('host3')
+        self.assertEqual(self.view.hosts_up(self.context, 'compute'),
+                         ['host3'])
+
+    def test_added_and_removed_services_checked_once_per_interval(self):
+        self._create_service('host1')
+        self.assertEqual(self.view.hosts_up(self.context, 'compute'),
+                         ['host1'])
+
+        self.mox.StubOutWithMock(db, 'service_get_all_added_or_removed_since')
+        db.service_get_all_added_or_removed_since(
+                self.context, mox.IgnoreArg()).AndReturn([])
+        self.mox.ReplayAll()
+
+        for i in xrange(3):
+            self.view.hosts_up(self.context, 'compute')
+        timeutils.advance_time_seconds(2)
+        for i in xrange(3):
+            self.view.hosts_up(self.context, 'compute')
@@ -0,0 +1,88 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the nova logging adapter."""
+
+import logging
+
+from nova import context
+from nova.openstack.common import log
+from nova import test
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class ContextAdapterTestCase(test.TestCase):
+    def setUp(self):
+        super(ContextAdapterTestCase, self).setUp()
+        self.logger = logging.getLogger('nova.tests.test_log.adapter')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        self.handler = RecordingHandler()
+        self.logger.addHandler(self.handler)
+        self.log = log.ContextAdapter(self.logger, 'nova', 'version')
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+        super(ContextAdapterTestCase, self).tearDown()
+
+    def test_disabled_level_skips_processing(self):
+        def fail_process(msg, kwargs):
+            self.fail('process called for a disabled level')
+
+        self.stubs.Set(self.log, 'process', fail_process)
+        self.log.debug('quiet %s', 'please')
+        self.assertEqual(self.handler.records, [])
+
+    def test_record_has_caller(self):
+        self.log.info('hello %(who)s', {'who': 'world'})
+        self.log.audit('audited')
+
+        info, audit = self.handler.records
+        self.assertEqual(info.getMessage(), 'hello world')
+        self.assertEqual(info.pathname.rstrip('c'), __file__.rstrip('c'))
+        self.assertEqual(info.funcName, 'test_record_has_caller')
+        self.assertEqual(audit.levelno, logging.AUDIT)
+        self.assertEqual(audit.funcName, 'test_record_has_caller')
+
+    def test_context_and_instance(self):
+        ctxt = context.RequestContext('user', 'project',
+                                      request_id='req-1234')
+        self.log.warn('careful', context=ctxt,
+                      instance_uuid='fake-uuid')
+
+        record = self.handler.records[0]
+        self.assertEqual(record.levelno, logging.WARNING)
+        self.assertEqual(record.request_id, 'req-1234')
+        self.assertTrue('fake-uuid' in record.instance)
+
+    def test_exception_has_exc_info(self):
+        try:
+            raise test.TestingException()
+        except test.TestingException:
+            self.log.exception('failed')
+
+        record = self.handler.records[0]
+        self.assertEqual(record.levelno, logging.ERROR)
+        self.assertEqual(record.exc_info[0], test.TestingException)
@@ -0,0 +1,118 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the periodic task scheduling of nova.manager."""
+
+import time
+
+from eventlet import event
+from eventlet import greenthread
+
+from nova import context
+from nova import manager
+from nova import test
+
+
+class PeriodicManager(manager.Manager):
+    def __init__(self, *args, **kwargs):
+        super(PeriodicManager, self).__init__(*args, **kwargs)
+        self.calls = []
+        self.slow_event = event.Event()
+
+    @manager.periodic_task
+    def _slow_task(self, context):
+        self.calls.append('slow')
+        self.slow_event.wait()
+
+    @manager.periodic_task
+    def _fast_task(self, context):
+        self.calls.append('fast')
+
+    @manager.periodic_task(spacing=600)
+    def _spaced_task(self, context):
+        self.calls.append('spaced')
+
+    @manager.periodic_task(deadline=5)
+    def _failing_task(self, context):
+        self.calls.append('failing')
+        raise test.TestingException()
+
+
+class PeriodicTasksTestCase(test.TestCase):
+    def setUp(self):
+        super(PeriodicTasksTestCase, self).setUp()
+        self.context = context.get_admin_context()
+        self.manager = PeriodicManager()
+
+    def _count(self, name):
+        return self.manager.calls.count(name)
+
+    def test_sequential_raise_on_error(self):
+        self.manager.slow_event.send()
+        self.assertRaises(test.TestingException,
+                          self.manager.periodic_tasks, self.context,
+                          raise_on_error=True)
+
+    def test_concurrent_tasks_do_not_wait_for_slow_task(self):
+        self.flags(periodic_task_pool_size=4)
+        self.manager.periodic_tasks(self.context)
+        greenthread.sleep(0)
+        self.assertEqual(self._count('slow'), 1)
+        self.assertEqual(self._count('fast'), 1)
+        self.assertEqual(self._count('failing'), 1)
+
+        # The slow task is still running, so it is skipped this tick
+        self.manager.periodic_tasks(self.context)
+        greenthread.sleep(0)
+        self.assertEqual(self._count('slow'), 1)
+        self.assertEqual(self._count('fast'), 2)
+
+        stats = self.manager.get_periodic_task_stats()
+        self.assertEqual(stats['_slow_task']['skipped'], 1)
+        self.assertEqual(stats['_fast_task']['runs'], 2)
+        self.assertEqual(stats['_failing_task']['failures'], 2)
+
+        self.manager.slow_event.send()
+        greenthread.sleep(0)
+        stats = self.manager.get_periodic_task_stats()
+        self.assertEqual(stats['_slow_task']['runs'], 1)
+
+    def test_spacing(self):
+        self.manager.slow_event.send()
+        self.manager.periodic_tasks(self.context)
+        self.manager.periodic_tasks(self.context)
+        self.assertEqual(self._count('fast'), 2)
+        self.assertEqual(self._count('spaced'), 1)
+
+        last_run = self.manager._periodic_last_run['_spaced_task']
+        self.stubs.Set(time, 'time', lambda: last_run + 601)
+        self.manager.periodic_tasks(self.context)
+        self.assertEqual(self._count('spaced'), 2)
+
+    def test_deadline_overrun(self):
+        now = [time.time()]
+
+        @manager.periodic_task(deadline=5)
+        def _long_task(mgr, context):
+            now[0] += 10
+
+        self.stubs.Set(time, 'time', lambda: now[0])
+        self.manager._run_periodic_task(self.context, '_long_task',
+                                        _long_task)
+        stats = self.manager.get_periodic_task_stats()['_long_task']
+        self.assertEqual(stats['overruns'], 1)
+        self.assertEqual(stats['max_duration'], 10)
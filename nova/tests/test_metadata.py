@@ -24,6 +24,7 @@ import re
 
 import webob
 
+from nova.api.ec2 import ec2utils
 from nova.api.metadata import base
 from nova.api.metadata import handler
 from nova import db
@@ -35,6 +36,8 @@ from nova import test
 
 FLAGS = flags.FLAGS
 
+test.add_reset_hook(ec2utils.reset_cache)
+
 USER_DATA_STRING = ("This is an encoded string")
 ENCODE_USER_DATA_STRING = base64.b64encode(USER_DATA_STRING)
 
@@ -20,6 +20,7 @@ import subprocess
 from nova.rootwrap import filters
 from nova.rootwrap import wrapper
 from nova import test
+from nova import utils
 
 
 class RootwrapTestCase(test.TestCase):
@@ -127,3 +128,42 @@ class RootwrapTestCase(test.TestCase):
         usercmd = ["cat", "/"]
         filtermatch = wrapper.match_filter(self.filters, usercmd)
         self.assertTrue(filtermatch is self.filters[-1])
+
+    def test_ionice_filters_only_allow_dd_between_devices(self):
+        filters_path = os.path.join(os.path.dirname(__file__), '..', '..',
+                                    'etc', 'nova', 'rootwrap.d')
+        filterlist = wrapper.load_filters([filters_path])
+        cmds = []
+
+        def fake_execute(*cmd, **kwargs):
+            cmds.append(list(cmd))
+
+        self.stubs.Set(utils, '_is_block_device',
+                       lambda path: path != '/dev/zero')
+        for ionice in ('-c3', '-c2 -n7'):
+            utils.copy_volume('/dev/zero', '/dev/vg/reclaim-vol-1', 100,
+                              chunk_mb=64, ionice=ionice,
+                              executor=fake_execute)
+            utils.copy_volume('/dev/mapper/vg-_snapshot--1',
+                              '/dev/mapper/vg-volume--2', 100, chunk_mb=64,
+                              sparse=True, ionice=ionice,
+                              executor=fake_execute)
+        self.assertEqual(len(cmds), 8)
+        for cmd in cmds:
+            filtermatch = wrapper.match_filter(filterlist, cmd)
+            self.assertFalse(filtermatch is None, cmd)
+            self.assertEqual(filtermatch.exec_path, '/usr/bin/ionice')
+
+        dd = ['dd', 'if=/dev/zero', 'of=/dev/vg/vol', 'bs=4M', 'count=1',
+              'skip=0', 'seek=0', 'iflag=fullblock', 'oflag=direct',
+              'conv=notrunc']
+        for cmd in (['ionice', '-c3', 'sh', '-c', 'id'],
+                    ['ionice', '-c3', '-t'] + dd,
+                    ['ionice', '-p1', '-c3'] + dd,
+                    ['ionice', '-c3'] + dd[:1] + ['if=/etc/shadow'] + dd[2:],
+                    ['ionice', '-c3'] + dd[:2] + ['of=/dev/../etc/passwd'] +
+                    dd[3:],
+                    ['ionice', '-c3'] + dd[:-1] + ['conv=notrunc; id'],
+                    ['ionice', '-c3'] + dd[:-1] + ['conv=notrunc', 'id']):
+            self.assertTrue(wrapper.match_filter(filterlist, cmd) is None,
+                            cmd)
@@ -144,8 +144,8 @@ class ServiceTestCase(test.TestCase):
                                       binary).AndRaise(exception.NotFound())
         service.db.service_create(mox.IgnoreArg(),
                                   service_create).AndReturn(service_ref)
-        service.db.service_get(mox.IgnoreArg(),
-                               mox.IgnoreArg()).AndRaise(Exception())
+        service.db.service_heartbeat(mox.IgnoreArg(), mox.IgnoreArg(),
+                                     mox.IgnoreArg()).AndRaise(Exception())
 
         self.mox.ReplayAll()
         serv = service.Service(host,
@@ -177,10 +177,8 @@ class ServiceTestCase(test.TestCase):
                                       binary).AndRaise(exception.NotFound())
         service.db.service_create(mox.IgnoreArg(),
                                   service_create).AndReturn(service_ref)
-        service.db.service_get(mox.IgnoreArg(),
-                               service_ref['id']).AndReturn(service_ref)
-        service.db.service_update(mox.IgnoreArg(), service_ref['id'],
-                                  mox.ContainsKeyValue('report_count', 1))
+        service.db.service_heartbeat(mox.IgnoreArg(), service_ref['id'],
+                                     {'availability_zone': 'nova'})
 
         self.mox.ReplayAll()
         serv = service.Service(host,
@@ -193,6 +191,45 @@ class ServiceTestCase(test.TestCase):
 
         self.assert_(not serv.model_disconnected)
 
+    def test_report_state_recreates_service(self):
+        host = 'foo'
+        binary = 'bar'
+        topic = 'test'
+        service_create = {'host': host,
+                          'binary': binary,
+                          'topic': topic,
+                          'report_count': 0,
+                          'availability_zone': 'nova'}
+        service_ref = {'host': host,
+                          'binary': binary,
+                          'topic': topic,
+                          'report_count': 0,
+                          'availability_zone': 'nova',
+                          'id': 1}
+        new_service_ref = dict(service_ref, id=2)
+
+        service.db.service_get_by_args(mox.IgnoreArg(),
+                                      host,
+                                      binary).AndReturn(service_ref)
+        service.db.service_heartbeat(mox.IgnoreArg(), 1,
+                mox.IgnoreArg()).AndRaise(exception.ServiceNotFound(
+                                              service_id=1))
+        service.db.service_create(mox.IgnoreArg(),
+                                  service_create).AndReturn(new_service_ref)
+        service.db.service_heartbeat(mox.IgnoreArg(), 2,
+                                     {'availability_zone': 'nova'})
+
+        self.mox.ReplayAll()
+        serv = service.Service(host,
+                               binary,
+                               topic,
+                               'nova.tests.test_service.FakeManager')
+        serv.start()
+        serv.report_state()
+
+        self.assertEqual(serv.service_id, 2)
+        self.assert_(not getattr(serv, 'model_disconnected', False))
+
 
 class TestWSGIService(test.TestCase):
 
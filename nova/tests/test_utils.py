@@ -756,3 +756,57 @@ class DiffDict(test.TestCase):
         diff = utils.diff_dict(old, new)
 
         self.assertEqual(diff, dict(b=['-']))
+
+
+class CopyVolumeTestCase(test.TestCase):
+
+    def setUp(self):
+        super(CopyVolumeTestCase, self).setUp()
+        self.cmds = []
+        self.stubs.Set(utils, '_is_block_device',
+                       lambda path: path.startswith('/dev/'))
+        self.stubs.Set(utils, '_file_size', lambda path: None)
+
+    def _fake_execute(self, *cmd, **kwargs):
+        self.cmds.append(cmd)
+        return '', None
+
+    def test_copy_in_chunks(self):
+        progress = []
+        utils.copy_volume('/dev/src', '/dev/dst', 2050,
+                          chunk_mb=1000, ionice='-c3',
+                          progress_callback=progress.append,
+                          executor=self._fake_execute)
+        self.assertEqual(self.cmds, [
+            ('ionice', '-c3', 'dd', 'if=/dev/src', 'of=/dev/dst', 'bs=4M',
+             'count=250', 'skip=0', 'seek=0', 'iflag=direct', 'oflag=direct',
+             'conv=notrunc'),
+            ('ionice', '-c3', 'dd', 'if=/dev/src', 'of=/dev/dst', 'bs=4M',
+             'count=250', 'skip=250', 'seek=250', 'iflag=direct',
+             'oflag=direct', 'conv=notrunc'),
+            ('ionice', '-c3', 'dd', 'if=/dev/src', 'of=/dev/dst', 'bs=1M',
+             'count=50', 'skip=2000', 'seek=2000', 'iflag=direct',
+             'oflag=direct', 'conv=notrunc')])
+        self.assertEqual(progress, [1000, 2000, 2050])
+
+    def test_sparse_copy_from_file_resumes(self):
+        utils.copy_volume('/tmp/base', '/dev/dst', 2048,
+                          offset_mb=1024, sparse=True,
+                          executor=self._fake_execute)
+        self.assertEqual(self.cmds, [
+            ('dd', 'if=/tmp/base', 'of=/dev/dst', 'bs=4M', 'count=256',
+             'skip=256', 'seek=256', 'iflag=fullblock', 'oflag=direct',
+             'conv=sparse')])
+
+    def test_unaligned_file_tail_is_copied_without_direct_io(self):
+        self.stubs.Set(utils, '_file_size',
+                       lambda path: 5 * 1024 * 1024 + 512)
+        utils.copy_volume('/tmp/base', '/dev/dst', 6,
+                          executor=self._fake_execute)
+        self.assertEqual(self.cmds, [
+            ('dd', 'if=/tmp/base', 'of=/dev/dst', 'bs=1M', 'count=5',
+             'skip=0', 'seek=0', 'iflag=fullblock', 'oflag=direct',
+             'conv=notrunc'),
+            ('dd', 'if=/tmp/base', 'of=/dev/dst', 'bs=1M', 'count=1',
+             'skip=5', 'seek=5', 'iflag=fullblock', 'oflag=dsync',
+             'conv=notrunc')])
@@ -397,6 +397,13 @@ class _VirtDriverTestCase(_FakeDriverBackendTestCase):
                           self.connection.get_info,
                           {'name': 'I just made this name up'})
 
+    @catch_notimplementederror
+    def test_get_info_all(self):
+        instance_ref, network_info = self._get_running_instance()
+        infos = self.connection.get_info_all()
+        self.assertEqual(infos[instance_ref['name']],
+                         self.connection.get_info(instance_ref))
+
     @catch_notimplementederror
     def test_get_diagnostics(self):
         instance_ref, network_info = self._get_running_instance()
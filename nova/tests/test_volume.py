@@ -21,6 +21,7 @@ Tests for Volume Code.
 """
 
 import cStringIO
+import os
 
 import mox
 
@@ -29,12 +30,14 @@ from nova import db
 from nova import exception
 from nova import flags
 from nova.openstack.common import importutils
+from nova.openstack.common import jsonutils
 from nova.openstack.common import log as logging
 from nova.openstack.common.notifier import test_notifier
 from nova.openstack.common import rpc
 import nova.policy
 from nova import quota
 from nova import test
+from nova import utils
 import nova.volume.api
 
 QUOTAS = quota.QUOTAS
@@ -505,6 +508,134 @@ class VolumeDriverTestCase(DriverTestCase):
         self.output = 'x'
         self.volume.driver.delete_volume({'name': 'test1', 'size': 1024})
 
+    def _fake_reclaim_execute(self):
+        executed = []
+
+        def _fake_execute(*cmd, **kwargs):
+            executed.append(cmd)
+            return '', None
+        self.volume.driver.set_execute(_fake_execute)
+        self.stubs.Set(self.volume.driver, '_volume_not_present',
+                       lambda x: False)
+        return executed
+
+    def test_delete_volume_parks_and_reclaims(self):
+        executed = self._fake_reclaim_execute()
+        driver = self.volume.driver
+        self.stubs.Set(driver, '_start_reclaimer', lambda: None)
+        with utils.tempdir() as tmpdir:
+            self.flags(volume_reclaim_deferred=True,
+                       volume_reclaim_state_path=tmpdir,
+                       volume_reclaim_chunk_mb=512)
+            driver.delete_volume({'name': 'test1', 'size': 1})
+            self.assertEqual(executed[-1], ('lvrename', FLAGS.volume_group,
+                                            'test1', 'reclaim-test1'))
+            self.assertEqual(driver.get_reclaim_stats(),
+                             {'reclaim_queue_depth': 1,
+                              'reclaim_queue_mb': 1024})
+
+            executed[:] = []
+            driver._reclaim_parked()
+            path = 'of=%s' % driver.local_path({'name': 'reclaim-test1'})
+            wipes = [cmd for cmd in executed if 'dd' in cmd]
+            self.assertEqual(len(wipes), 2)
+            self.assertEqual(wipes[0][:2], ('ionice', '-c3'))
+            self.assertTrue(path in wipes[0])
+            self.assertTrue('seek=128' in wipes[1])
+            self.assertEqual(executed[-1][0], 'lvremove')
+            self.assertEqual(driver.get_reclaim_stats(),
+                             {'reclaim_queue_depth': 0,
+                              'reclaim_queue_mb': 0})
+            self.assertEqual(os.listdir(tmpdir), [])
+
+    def test_delete_origin_parks_behind_parked_snapshots(self):
+        executed = self._fake_reclaim_execute()
+        driver = self.volume.driver
+        self.stubs.Set(driver, '_start_reclaimer', lambda: None)
+        with utils.tempdir() as tmpdir:
+            self.flags(volume_reclaim_deferred=True,
+                       volume_reclaim_state_path=tmpdir)
+            driver.delete_snapshot({'name': 'snapshot1', 'volume_size': 1})
+            parked_snapshot = 'reclaim-_snapshot1'
+
+            def fake_execute(*cmd, **kwargs):
+                executed.append(cmd)
+                if cmd[0] == 'lvdisplay':
+                    return 'owi-a-', None
+                if cmd[0] == 'lvs':
+                    return '  %s volume1\n  volume1\n' % parked_snapshot, None
+                return '', None
+            driver.set_execute(fake_execute)
+            driver.delete_volume({'name': 'volume1', 'size': 1})
+            self.assertEqual(executed[-1], ('lvrename', FLAGS.volume_group,
+                                            'volume1', 'reclaim-volume1'))
+            self.assertEqual(driver._next_parked(set()), parked_snapshot)
+            self.assertEqual(driver._next_parked(set([parked_snapshot])),
+                             None)
+
+            driver._drop_reclaim_entry(parked_snapshot)
+            self.assertEqual(driver._next_parked(set()), 'reclaim-volume1')
+
+    def test_delete_origin_with_unparked_snapshots_is_busy(self):
+        executed = self._fake_reclaim_execute()
+        driver = self.volume.driver
+        self.stubs.Set(driver, '_start_reclaimer', lambda: None)
+        with utils.tempdir() as tmpdir:
+            self.flags(volume_reclaim_deferred=True,
+                       volume_reclaim_state_path=tmpdir)
+            driver.delete_snapshot({'name': 'snapshot1', 'volume_size': 1})
+
+            def fake_execute(*cmd, **kwargs):
+                if cmd[0] == 'lvdisplay':
+                    return 'owi-a-', None
+                if cmd[0] == 'lvs':
+                    return ('  reclaim-_snapshot1 volume1\n'
+                            '  _snapshot2 volume1\n'), None
+                return '', None
+            driver.set_execute(fake_execute)
+            self.assertRaises(exception.VolumeIsBusy, driver.delete_volume,
+                              {'name': 'volume1', 'size': 1})
+
+    def test_reclaim_resumes_snapshot_wipe(self):
+        executed = self._fake_reclaim_execute()
+        driver = self.volume.driver
+        with utils.tempdir() as tmpdir:
+            self.flags(volume_reclaim_state_path=tmpdir,
+                       volume_reclaim_ionice='')
+            entry = {'size_mb': 1024, 'wiped_mb': 960,
+                     'snapshot': True, 'parked_at': 0}
+            with open(os.path.join(tmpdir, 'reclaim-snap1'), 'w') as f:
+                f.write(jsonutils.dumps(entry))
+
+            driver._load_reclaim_queue()
+            driver._reclaim_parked()
+            path = driver.local_path({'name': 'reclaim-snap1'}) + '-cow'
+            self.assertEqual(executed[0], ('dd', 'if=/dev/zero',
+                                           'of=%s' % path, 'bs=4M',
+                                           'count=16', 'skip=240',
+                                           'seek=240', 'iflag=fullblock',
+                                           'oflag=direct', 'conv=notrunc'))
+            stats = driver.get_reclaim_stats()
+            self.assertEqual(stats['reclaim_queue_depth'], 0)
+
+    def test_reclaim_stats_only_reported_with_driver_stats(self):
+        driver = self.volume.driver
+        reported = []
+        self.stubs.Set(self.volume, 'update_service_capabilities',
+                       reported.append)
+        self.stubs.Set(driver, '_reclaim_queue',
+                       {'reclaim-vol1': {'size_mb': 1024, 'wiped_mb': 256}})
+
+        self.volume._report_driver_status(self.context)
+        self.assertEqual(reported, [])
+
+        self.stubs.Set(driver, 'get_volume_stats',
+                       lambda refresh=False: {'free_capacity_gb': 10})
+        self.volume._report_driver_status(self.context)
+        self.assertEqual(reported, [{'free_capacity_gb': 10,
+                                     'reclaim_queue_depth': 1,
+                                     'reclaim_queue_mb': 768}])
+
 
 class ISCSITestCase(DriverTestCase):
     """Test Case for ISCSIDriver"""
@@ -573,6 +704,20 @@ class ISCSITestCase(DriverTestCase):
 
         self._detach_volume(volume_id_list)
 
+    def test_ensure_exports_skips_exported_targets(self):
+        volumes = [{'id': 1, 'name': 'volume-1'},
+                   {'id': 2, 'name': 'volume-2'}]
+        exported = set(['%svolume-1' % FLAGS.iscsi_target_prefix])
+        self.stubs.Set(self.volume.driver.tgtadm, 'get_targets',
+                       lambda: exported)
+        ensured = []
+        self.stubs.Set(self.volume.driver, 'ensure_export',
+                       lambda ctxt, volume: ensured.append(volume['name']))
+
+        self.assertEqual(self.volume.driver.ensure_exports(self.context,
+                                                           volumes), 1)
+        self.assertEqual(ensured, ['volume-2'])
+
 
 class VolumePolicyTestCase(test.TestCase):
 
@@ -22,6 +22,7 @@ import cPickle as pickle
 import functools
 import os
 import re
+import StringIO
 
 from nova.compute import api as compute_api
 from nova.compute import instance_types
@@ -40,6 +41,7 @@ from nova.tests import fake_network
 from nova.tests import fake_utils
 import nova.tests.image.fake as fake_image
 from nova.tests.xenapi import stubs
+from nova import utils
 from nova.virt.xenapi import agent
 from nova.virt.xenapi import driver as xenapi_conn
 from nova.virt.xenapi import fake as xenapi_fake
@@ -322,6 +324,23 @@ class XenAPIVMTestCase(stubs.XenAPITestBase):
         instances = self.conn.list_instances()
         self.assertEquals(instances, [])
 
+    def test_get_info_all(self):
+        host_ref = self.conn._session.get_xenapi_host()
+        other_host_ref = xenapi_fake.create_host('other')
+        xenapi_fake.create_vm('running', 'Running', is_a_template=False,
+                              resident_on=host_ref)
+        xenapi_fake.create_vm('halted', 'Halted', is_a_template=False,
+                              resident_on='OpaqueRef:NULL')
+        xenapi_fake.create_vm('elsewhere', 'Running', is_a_template=False,
+                              resident_on=other_host_ref)
+        xenapi_fake.create_vm('template', 'Halted', is_a_template=True,
+                              resident_on='OpaqueRef:NULL')
+
+        infos = self.conn.get_info_all()
+        self.assertEqual(sorted(infos.keys()), ['halted', 'running'])
+        self.assertEqual(infos['running']['state'], power_state.RUNNING)
+        self.assertEqual(infos['halted']['state'], power_state.SHUTDOWN)
+
     def test_get_rrd_server(self):
         self.flags(xenapi_connection_url='myscheme://myaddress/')
         server_info = vm_utils._get_rrd_server()
@@ -2103,6 +2122,46 @@ class VmUtilsTestCase(test.TestCase):
                         os_type='os type')
         self.assertEquals(expected, actual)
 
+    def _sparse_copy(self, data, virtual_size, **kwargs):
+        with utils.tempdir() as tmpdir:
+            src_path = os.path.join(tmpdir, 'src')
+            dst_path = os.path.join(tmpdir, 'dst')
+            with open(src_path, 'w') as f:
+                for offset, chunk in data:
+                    f.seek(offset)
+                    f.write(chunk)
+                f.truncate(virtual_size)
+            open(dst_path, 'w').close()
+
+            vm_utils._sparse_copy(src_path, dst_path, virtual_size, **kwargs)
+
+            with open(src_path) as f:
+                expected = f.read()
+            with open(dst_path) as f:
+                actual = f.read()
+            self.assertEqual(len(actual), virtual_size)
+            self.assertEqual(actual, expected)
+
+    def test_sparse_copy(self):
+        self._sparse_copy([(0, 'a' * 5000), (20000, 'b' * 3),
+                           (40960, '\0' * 8192), (60000, 'c' * 10000)],
+                          100000, block_size=512, buffer_size=8192)
+
+    def test_sparse_copy_ends_on_hole(self):
+        self._sparse_copy([(100, 'a')], 1024 * 1024)
+
+    def test_sparse_copy_without_seek_data(self):
+        self.stubs.Set(vm_utils, 'SEEK_DATA', -1)
+        self._sparse_copy([(100, 'a'), (9000, 'b' * 4096)], 65536,
+                          buffer_size=16384)
+
+    def test_sparse_write_skips_zero_blocks(self):
+        dst = StringIO.StringIO()
+        data = 'a' * 10 + '\0' * 14 + 'b' * 8
+        skipped = vm_utils._sparse_write(dst, data, '\0' * 32, '\0' * 4)
+        self.assertEqual(skipped, 12)
+        self.assertEqual(dst.getvalue(), data)
+
 
 class XenAPILiveMigrateTestCase(stubs.XenAPITestBase):
     """Unit tests for live_migration."""
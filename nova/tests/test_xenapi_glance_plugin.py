@@ -0,0 +1,233 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack LLC.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the segmented image download in the dom0 glance plugin."""
+
+import BaseHTTPServer
+import hashlib
+import imp
+import os
+import re
+import SocketServer
+import StringIO
+import sys
+import tarfile
+import threading
+import types
+import urllib2
+
+from nova import test
+from nova import utils
+
+
+TOPDIR = os.path.normpath(os.path.join(
+                            os.path.dirname(os.path.abspath(__file__)),
+                            os.pardir,
+                            os.pardir))
+PLUGIN_PATH = os.path.join(TOPDIR, 'plugins', 'xenserver', 'xenapi', 'etc',
+                           'xapi.d', 'plugins')
+
+
+def _load_glance_plugin():
+    """Import the glance plugin without the dom0 XenAPI modules."""
+    names = ('XenAPI', 'XenAPIPlugin', 'pluginlib_nova', 'utils')
+    saved = dict((name, sys.modules.get(name)) for name in names)
+    sys.dont_write_bytecode = True
+    try:
+        sys.modules['XenAPI'] = types.ModuleType('XenAPI')
+        sys.modules['XenAPIPlugin'] = types.ModuleType('XenAPIPlugin')
+        pluginlib = imp.load_source(
+                'pluginlib_nova',
+                os.path.join(PLUGIN_PATH, 'pluginlib_nova.py'))
+        # There is no syslog to log to outside of dom0
+        pluginlib.configure_logging = lambda name: None
+        imp.load_source('utils', os.path.join(PLUGIN_PATH, 'utils.py'))
+        return imp.load_source('glance_plugin',
+                               os.path.join(PLUGIN_PATH, 'glance'))
+    finally:
+        sys.dont_write_bytecode = False
+        for name, module in saved.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+
+
+glance_plugin = _load_glance_plugin()
+
+
+class ImageServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, image, ranges=True, short_segment=None):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0),
+                                           ImageRequestHandler)
+        self.image = image
+        self.ranges = ranges
+        self.short_segment = short_segment
+        self.requests = []
+
+
+class ImageRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Serves the image, honouring Range headers if the server does."""
+
+    def do_GET(self):
+        image = self.server.image
+        byte_range = self.headers.getheader('range')
+        self.server.requests.append(byte_range)
+        match = re.match(r'bytes=(\d+)-(\d+)$', byte_range or '')
+        if not self.server.ranges or not match:
+            self._send(200, image)
+            return
+
+        start = int(match.group(1))
+        end = min(int(match.group(2)), len(image) - 1)
+        if start == self.server.short_segment:
+            # A server may return less than the range it was asked for
+            end -= 100
+        self._send(206, image[start:end + 1], {
+                'Content-Range': 'bytes %d-%d/%d' % (start, end,
+                                                     len(image))})
+
+    def _send(self, code, body, headers=None):
+        self.send_response(code)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', hashlib.md5(self.server.image).hexdigest())
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class SegmentedDownloadTestCase(test.TestCase):
+
+    SEGMENT_SIZE = 64 * 1024
+
+    def setUp(self):
+        super(SegmentedDownloadTestCase, self).setUp()
+        self.image = ''.join(chr(i % 251) for i in xrange(300 * 1024))
+        self.server = None
+
+    def tearDown(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        super(SegmentedDownloadTestCase, self).tearDown()
+
+    def _serve(self, **kwargs):
+        self.server = ImageServer(self.image, **kwargs)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.setDaemon(True)
+        thread.start()
+
+    def _request(self):
+        return urllib2.Request('http://127.0.0.1:%d/v1/images/fake' %
+                               self.server.server_address[1])
+
+    def _read_all(self, response):
+        chunks = []
+        while True:
+            chunk = response.read(8192)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return ''.join(chunks)
+
+    def test_downloads_segments_in_parallel(self):
+        self._serve()
+        with utils.tempdir() as staging_path:
+            response = glance_plugin._open_image(self._request(),
+                                                 staging_path, 3,
+                                                 self.SEGMENT_SIZE)
+            self.assertTrue(isinstance(response,
+                                       glance_plugin.SegmentedResponse))
+            try:
+                self.assertEqual(self._read_all(response), self.image)
+            finally:
+                response.close()
+            self.assertEqual(os.listdir(staging_path), [])
+
+        # The last segment is only what remains of the image
+        self.assertEqual(sorted(self.server.requests), [
+                'bytes=0-65535', 'bytes=131072-196607',
+                'bytes=196608-262143', 'bytes=262144-307199',
+                'bytes=65536-131071'])
+
+    def test_server_without_range_support(self):
+        self._serve(ranges=False)
+        with utils.tempdir() as staging_path:
+            response = glance_plugin._open_image(self._request(),
+                                                 staging_path, 3,
+                                                 self.SEGMENT_SIZE)
+            self.assertFalse(isinstance(response,
+                                        glance_plugin.SegmentedResponse))
+            try:
+                self.assertEqual(self._read_all(response), self.image)
+            finally:
+                response.close()
+        self.assertEqual(self.server.requests, ['bytes=0-65535'])
+
+    def test_short_segment_is_retryable(self):
+        self._serve(short_segment=2 * self.SEGMENT_SIZE)
+        with utils.tempdir() as staging_path:
+            response = glance_plugin._open_image(self._request(),
+                                                 staging_path, 3,
+                                                 self.SEGMENT_SIZE)
+            try:
+                self.assertRaises(glance_plugin.RetryableError,
+                                  self._read_all, response)
+            finally:
+                response.close()
+            self.assertEqual(os.listdir(staging_path), [])
+
+    def test_short_first_segment_is_retryable(self):
+        self._serve(short_segment=0)
+        with utils.tempdir() as staging_path:
+            response = glance_plugin._open_image(self._request(),
+                                                 staging_path, 3,
+                                                 self.SEGMENT_SIZE)
+            try:
+                self.assertRaises(glance_plugin.RetryableError,
+                                  self._read_all, response)
+            finally:
+                response.close()
+
+    def test_download_and_verify_tarball(self):
+        # Random data does not compress, so the tarball spans segments
+        vhd = os.urandom(100 * 1024)
+        tarball = StringIO.StringIO()
+        tar = tarfile.open(fileobj=tarball, mode='w:gz')
+        info = tarfile.TarInfo('0.vhd')
+        info.size = len(vhd)
+        tar.addfile(info, StringIO.StringIO(vhd))
+        tar.close()
+        self.image = tarball.getvalue()
+
+        self._serve()
+        with utils.tempdir() as staging_path:
+            glance_plugin._download_tarball_and_verify(
+                    self._request(), staging_path, connections=3,
+                    segment_size=16 * 1024)
+            f = open(os.path.join(staging_path, '0.vhd'))
+            try:
+                self.assertEqual(f.read(), vhd)
+            finally:
+                f.close()
+        self.assertTrue(len(self.server.requests) > 2)
@@ -32,6 +32,7 @@ import re
 import shlex
 import shutil
 import socket
+import stat
 import struct
 import sys
 import tempfile
@@ -1268,3 +1269,99 @@ class UndoManager(object):
                 LOG.exception(msg, **kwargs)
 
             self._rollback()
+
+
+def _is_block_device(path):
+    try:
+        return stat.S_ISBLK(os.stat(path).st_mode)
+    except OSError:
+        return False
+
+
+def _file_size(path):
+    """Return the size of path if it is a regular file, else None."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    return st.st_size
+
+
+def copy_volume(srcstr, deststr, size_mb, offset_mb=0, block_mb=4,
+                chunk_mb=1024, sparse=False, ionice=None, bandwidth_mb=0,
+                progress_callback=None, executor=None):
+    """Copy size_mb of srcstr to deststr with dd, a chunk at a time.
+
+    The destination, and the source if it is a block device, are opened
+    with O_DIRECT so a large copy does not evict the page cache of
+    everything else on the host.  With sparse, runs of zero blocks are
+    seeked over rather than written, which keeps a thin destination
+    thin; only use it when the destination already reads as zeros.
+
+    :param offset_mb: where to start, to resume an interrupted copy
+    :param ionice: ionice arguments to run dd with, e.g. '-c3'
+    :param bandwidth_mb: limit the copy to this many MB/s, 0 for no limit
+    :param progress_callback: called with the number of MB done after
+                              each chunk
+    :param executor: runs the dd commands, defaults to execute
+    """
+    if executor is None:
+        executor = execute
+
+    prefix = []
+    if ionice:
+        prefix = ['ionice'] + ionice.split()
+    # dd always gets the same options in the same order, so that a single
+    # rootwrap filter covers it when it runs under ionice
+    if _is_block_device(srcstr):
+        iflag = 'iflag=direct'
+    else:
+        iflag = 'iflag=fullblock'
+    if sparse:
+        conv = 'conv=sparse'
+    else:
+        conv = 'conv=notrunc'
+    block_mb = max(block_mb, 1)
+    chunk_mb = max(chunk_mb - chunk_mb % block_mb, block_mb)
+
+    # dd writes whatever a short read at the end of a file returns, and
+    # O_DIRECT refuses writes that are not a multiple of the device
+    # block size.  Copy the MB holding the end of such a file on its own,
+    # with synchronous writes through the page cache.
+    tail_mb = None
+    src_size = _file_size(srcstr)
+    if src_size is not None and src_size % (1024 * 1024):
+        tail_mb = src_size / (1024 * 1024)
+
+    pos = offset_mb
+    while pos < size_mb:
+        count = min(chunk_mb, size_mb - pos)
+        oflag = 'oflag=direct'
+        if tail_mb is not None and pos <= tail_mb < pos + count:
+            if pos < tail_mb:
+                count = tail_mb - pos
+            else:
+                count = 1
+                oflag = 'oflag=dsync'
+        bs = block_mb
+        if pos % bs or count % bs:
+            bs = 1
+        cmd = prefix + ['dd', 'if=%s' % srcstr, 'of=%s' % deststr,
+                        'bs=%dM' % bs, 'count=%d' % (count / bs),
+                        'skip=%d' % (pos / bs), 'seek=%d' % (pos / bs),
+                        iflag, oflag, conv]
+
+        start = time.time()
+        executor(*cmd, run_as_root=True)
+        pos += count
+        LOG.debug(_("Copied %(pos)d of %(size_mb)d MB from %(srcstr)s to "
+                    "%(deststr)s") % locals())
+        if progress_callback:
+            progress_callback(pos)
+
+        delay = 0
+        if bandwidth_mb > 0:
+            delay = float(count) / bandwidth_mb - (time.time() - start)
+        greenthread.sleep(max(delay, 0))
@@ -109,6 +109,19 @@ class ComputeDriver(object):
         # TODO(Vek): Need to pass context in for access to auth_token
         raise NotImplementedError()
 
+    def get_info_all(self):
+        """Get the current status of every instance on the host at once.
+
+        Returns a dict mapping instance names to dicts of the same form as
+        get_info() returns. Instances unknown to the hypervisor are simply
+        absent from the result.
+
+        Drivers should implement this when the hypervisor can report on
+        all of its instances in a single pass; callers fall back to
+        get_info() when it raises NotImplementedError.
+        """
+        raise NotImplementedError()
+
     def get_num_instances(self):
         """Return the total number of virtual machines.
 
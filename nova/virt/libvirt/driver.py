@@ -1862,6 +1862,42 @@ class LibvirtDriver(driver.ComputeDriver):
 
         """
         virt_dom = self._lookup_by_name(instance['name'])
+        return self._get_domain_info(virt_dom)
+
+    def get_info_all(self):
+        """Retrieve information from libvirt for all domains at once.
+
+        Running domains are found by id and defined but inactive ones by
+        name, so every domain is visited once instead of being looked up
+        by instance name. Domains that disappear while listing are left
+        out.
+        """
+        domains = []
+        for domain_id in self.list_instance_ids():
+            # We skip domains with ID 0 (hypervisors).
+            if domain_id == 0:
+                continue
+            try:
+                domains.append(self._conn.lookupByID(domain_id))
+            except libvirt.libvirtError:
+                pass
+        for domain_name in self._conn.listDefinedDomains():
+            try:
+                domains.append(self._conn.lookupByName(domain_name))
+            except libvirt.libvirtError:
+                pass
+
+        infos = {}
+        for virt_dom in domains:
+            try:
+                name = virt_dom.name()
+                infos[name] = self._get_domain_info(virt_dom)
+            except libvirt.libvirtError:
+                pass
+        return infos
+
+    @staticmethod
+    def _get_domain_info(virt_dom):
         (state, max_mem, mem, num_cpu, cpu_time) = virt_dom.info()
         return {'state': LIBVIRT_POWER_STATE[state],
                 'max_mem': max_mem,
@@ -196,8 +196,11 @@ class Lvm(Image):
             size = size if resize else base_size
             libvirt_utils.create_lvm_image(self.vg, self.lv,
                                            size, sparse=self.sparse)
-            cmd = ('dd', 'if=%s' % base, 'of=%s' % self.path, 'bs=4M')
-            utils.execute(*cmd, run_as_root=True)
+            # A sparse volume reads as zeros, so zero blocks of the base
+            # image need not be written, which keeps it sparse
+            base_size_mb = (base_size + 1024 * 1024 - 1) / (1024 * 1024)
+            utils.copy_volume(base, self.path, base_size_mb,
+                              sparse=self.sparse)
             if resize:
                 disk.resize2fs(self.path)
 
@@ -287,6 +287,10 @@ class XenAPIDriver(driver.ComputeDriver):
         """Return data about VM instance"""
         return self._vmops.get_info(instance)
 
+    def get_info_all(self):
+        """Return data about all VM instances on this host"""
+        return self._vmops.get_info_all()
+
     def get_diagnostics(self, instance):
         """Return data about VM diagnostics"""
         return self._vmops.get_diagnostics(instance)
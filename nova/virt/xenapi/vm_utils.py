@@ -24,8 +24,10 @@ their attributes like VDIs, VIFs, as well as their lookup functions.
 import contextlib
 import cPickle as pickle
 import decimal
+import errno
 import os
 import re
+import stat
 import time
 import urllib
 import urlparse
@@ -82,6 +84,21 @@ xenapi_vm_utils_opts = [
     cfg.IntOpt('xenapi_num_vbd_unplug_retries',
                default=10,
                help='Maximum number of retries to unplug VBD'),
+    cfg.IntOpt('xenapi_image_compression_level',
+               default=None,
+               help='Compression level, 1 (fastest) to 9 (smallest), of the '
+                    'gzip stream dom0 uploads images to glance as. Unset '
+                    'keeps the gzip default. pigz is used when dom0 has it'),
+    cfg.IntOpt('xenapi_image_download_connections',
+               default=1,
+               help='Number of HTTP connections dom0 uses to download a VHD '
+                    'image from glance, each fetching a byte range segment. '
+                    'Servers that do not honour range requests are read '
+                    'over a single connection'),
+    cfg.IntOpt('xenapi_image_download_segment_mb',
+               default=64,
+               help='Size in MB of the segments an image is downloaded in '
+                    'when xenapi_image_download_connections is above 1'),
     ]
 
 FLAGS = flags.FLAGS
@@ -100,6 +117,11 @@ MBR_SIZE_SECTORS = 63
 MBR_SIZE_BYTES = MBR_SIZE_SECTORS * SECTOR_SIZE
 KERNEL_DIR = '/boot/guest'
 MAX_VDI_CHAIN_SIZE = 16
+SPARSE_COPY_BUFFER_SIZE = 4 * 1024 * 1024
+
+# NOTE: Linux values, os only exposes these from python 3.3
+SEEK_DATA = getattr(os, 'SEEK_DATA', 3)
+SEEK_HOLE = getattr(os, 'SEEK_HOLE', 4)
 
 
 class ImageType(object):
@@ -671,7 +693,8 @@ def upload_image(context, session, instance, vdi_uuids, image_id):
               'glance_port': glance_port,
               'sr_path': get_sr_path(session),
               'auth_token': getattr(context, 'auth_token', None),
-              'properties': properties}
+              'properties': properties,
+              'compression_level': FLAGS.xenapi_image_compression_level}
 
     kwargs = {'params': pickle.dumps(params)}
     session.call_plugin('glance', 'upload_vhd', kwargs)
@@ -1006,7 +1029,10 @@ def _fetch_vhd_image(context, session, instance, image_id):
     params = {'image_id': image_id,
               'uuid_stack': _make_uuid_stack(),
               'sr_path': get_sr_path(session),
-              'auth_token': getattr(context, 'auth_token', None)}
+              'auth_token': getattr(context, 'auth_token', None),
+              'connections': FLAGS.xenapi_image_download_connections,
+              'segment_size':
+                  FLAGS.xenapi_image_download_segment_mb * 1024 * 1024}
 
     glance_api_servers = glance.get_api_servers()
 
@@ -1914,13 +1940,91 @@ def _resize_part_and_fs(dev, start, old_sectors, new_sectors):
     utils.execute('tune2fs', '-j', partition_path, run_as_root=True)
 
 
-def _sparse_copy(src_path, dst_path, virtual_size, block_size=4096):
-    """Copy data, skipping long runs of zeros to create a sparse file."""
+def _data_extents(src, size):
+    """Yield (offset, length) for the regions of src that may hold data.
+
+    Uses SEEK_DATA/SEEK_HOLE when the source supports them so the holes of
+    a sparse source are never read; otherwise all of src is reported as
+    data.
+    """
+    fd = src.fileno()
+    try:
+        offset = os.lseek(fd, 0, SEEK_DATA)
+    except OSError as e:
+        if e.errno != errno.ENXIO:
+            # Block devices and older kernels don't know about holes
+            yield 0, size
+        return
+
+    while offset < size:
+        try:
+            hole = min(os.lseek(fd, offset, SEEK_HOLE), size)
+        except OSError:
+            hole = size
+        yield offset, hole - offset
+
+        if hole >= size:
+            return
+        try:
+            offset = os.lseek(fd, hole, SEEK_DATA)
+        except OSError:
+            return
+
+
+def _sparse_write(dst, data, empty_buffer, empty_block):
+    """Write data to dst, seeking over block aligned runs of zeros.
+
+    Returns the number of bytes skipped.
+    """
+    data_len = len(data)
+    if data_len == len(empty_buffer) and data == empty_buffer:
+        dst.seek(data_len, os.SEEK_CUR)
+        return data_len
+
+    block_size = len(empty_block)
+    skipped = 0
+    written = 0
+    pos = 0
+    while True:
+        # str.find does the scanning in C, so dense data costs a single
+        # call per buffer rather than a Python iteration per block
+        hit = data.find(empty_block, pos)
+        if hit == -1:
+            break
+
+        start = -(-hit // block_size) * block_size
+        if data[start:start + block_size] != empty_block:
+            pos = max(start, hit + 1)
+            continue
+
+        end = start + block_size
+        while data[end:end + block_size] == empty_block:
+            end += block_size
+
+        if start > written:
+            dst.write(data[written:start])
+        dst.seek(end - start, os.SEEK_CUR)
+        skipped += end - start
+        written = pos = end
+
+    if written < data_len:
+        dst.write(data[written:])
+    return skipped
+
+
+def _sparse_copy(src_path, dst_path, virtual_size, block_size=4096,
+                 buffer_size=SPARSE_COPY_BUFFER_SIZE):
+    """Copy data, skipping long runs of zeros to create a sparse file.
+
+    Data is read buffer_size bytes at a time and runs of zeros are
+    detected at block_size granularity.
+    """
     start_time = time.time()
+    buffer_size = max(block_size, buffer_size - buffer_size % block_size)
     EMPTY_BLOCK = '\0' * block_size
+    EMPTY_BUFFER = '\0' * buffer_size
     bytes_read = 0
     skipped_bytes = 0
-    left = virtual_size
 
     LOG.debug(_("Starting sparse_copy src=%(src_path)s dst=%(dst_path)s "
                 "virtual_size=%(virtual_size)d block_size=%(block_size)d"),
@@ -1933,26 +2037,36 @@ def _sparse_copy(src_path, dst_path, virtual_size, block_size=4096):
         with utils.temporary_chown(dst_path):
             with open(src_path, "r") as src:
                 with open(dst_path, "w") as dst:
-                    data = src.read(min(block_size, left))
-                    while data:
-                        if data == EMPTY_BLOCK:
-                            dst.seek(block_size, os.SEEK_CUR)
-                            left -= block_size
-                            bytes_read += block_size
-                            skipped_bytes += block_size
-                        else:
-                            dst.write(data)
+                    extents_size = 0
+                    for offset, length in _data_extents(src, virtual_size):
+                        extents_size += length
+                        src.seek(offset)
+                        dst.seek(offset)
+                        left = length
+                        while left > 0:
+                            data = src.read(min(buffer_size, left))
+                            if not data:
+                                break
+                            skipped_bytes += _sparse_write(dst, data,
+                                                           EMPTY_BUFFER,
+                                                           EMPTY_BLOCK)
                             data_len = len(data)
                             left -= data_len
                             bytes_read += data_len
 
-                        if left <= 0:
-                            break
+                    # Holes in the source are never read; count them as
+                    # skipped
+                    hole_bytes = virtual_size - extents_size
+                    skipped_bytes += hole_bytes
+                    bytes_read += hole_bytes
 
-                        data = src.read(min(block_size, left))
+                    # A regular file that ends on a run of zeros has to be
+                    # extended to its full size
+                    if stat.S_ISREG(os.fstat(dst.fileno()).st_mode):
+                        dst.truncate(virtual_size)
 
     duration = time.time() - start_time
-    compression_pct = float(skipped_bytes) / bytes_read * 100
+    compression_pct = float(skipped_bytes) / max(bytes_read, 1) * 100
 
     LOG.debug(_("Finished sparse_copy in %(duration).2f secs, "
                 "%(compression_pct).2f%% reduction in size"), locals())
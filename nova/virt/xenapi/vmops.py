@@ -1187,6 +1187,24 @@ class VMOps(object):
         vm_rec = self._session.call_xenapi("VM.get_record", vm_ref)
         return vm_utils.compile_info(vm_rec)
 
+    def get_info_all(self):
+        """Return data about all VM instances on this host.
+
+        Halted VMs are not resident on any host, so they are included as
+        well, unless a VM of the same name is resident on this host.
+        """
+        host_ref = self._session.get_xenapi_host()
+        infos = {}
+        for vm_ref, vm_rec in self._session.get_all_refs_and_recs('VM'):
+            if vm_rec['is_a_template'] or vm_rec['is_control_domain']:
+                continue
+            name = vm_rec['name_label']
+            if vm_rec['resident_on'] == host_ref:
+                infos[name] = vm_utils.compile_info(vm_rec)
+            elif vm_rec['power_state'] == 'Halted':
+                infos.setdefault(name, vm_utils.compile_info(vm_rec))
+        return infos
+
     def get_diagnostics(self, instance):
         """Return data about VM diagnostics."""
         vm_ref = self._get_vm_opaque_ref(instance)
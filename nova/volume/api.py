@@ -171,13 +171,21 @@ class API(base.Base):
         check_policy(context, 'get', volume)
         return volume
 
-    def get_all(self, context, search_opts={}):
+    def get_all(self, context, search_opts={}, limit=None, marker=None):
+        """Get the volumes, oldest first.
+
+        If limit is given, at most limit volumes are read, starting after
+        the volume whose id is marker if it is given.  search_opts are
+        applied to the volumes read.
+        """
         check_policy(context, 'get_all')
         if context.is_admin:
-            volumes = self.db.volume_get_all(context)
+            volumes = self.db.volume_get_all(context, limit=limit,
+                                             marker=marker)
         else:
             volumes = self.db.volume_get_all_by_project(context,
-                                    context.project_id)
+                                    context.project_id, limit=limit,
+                                    marker=marker)
 
         if search_opts:
             LOG.debug(_("Searching by: %s") % str(search_opts))
@@ -217,11 +225,15 @@ class API(base.Base):
         rv = self.db.snapshot_get(context, snapshot_id)
         return dict(rv.iteritems())
 
-    def get_all_snapshots(self, context):
+    def get_all_snapshots(self, context, limit=None, marker=None):
+        """Get the snapshots, oldest first, or at most limit of them after
+        the snapshot whose id is marker."""
         check_policy(context, 'get_all_snapshots')
         if context.is_admin:
-            return self.db.snapshot_get_all(context)
-        return self.db.snapshot_get_all_by_project(context, context.project_id)
+            return self.db.snapshot_get_all(context, limit=limit,
+                                            marker=marker)
+        return self.db.snapshot_get_all_by_project(context, context.project_id,
+                                                   limit=limit, marker=marker)
 
     @wrap_check_policy
     def check_attach(self, context, volume):
@@ -20,11 +20,16 @@ Drivers for volumes.
 
 """
 
+import os
 import time
 
+from eventlet import greenpool
+from eventlet import greenthread
+
 from nova import exception
 from nova import flags
 from nova.openstack.common import cfg
+from nova.openstack.common import jsonutils
 from nova.openstack.common import log as logging
 from nova import utils
 from nova.volume import iscsi
@@ -64,14 +69,66 @@ volume_opts = [
                default=None,
                help='the libvirt uuid of the secret for the rbd_user'
                     'volumes'),
+    cfg.BoolOpt('volume_copy_sparse',
+                default=False,
+                help='Skip writing zero blocks when copying a snapshot to '
+                     'a new volume. Only safe when new volumes read as '
+                     'zeros, and needs dd with conv=sparse'),
+    cfg.StrOpt('volume_copy_ionice',
+               default='',
+               help='ionice arguments to copy snapshots to new volumes '
+                    'with, -c<class> and optionally -n<level>, e.g. -c3. '
+                    'Empty for normal io priority'),
+    cfg.IntOpt('volume_copy_bandwidth_mb',
+               default=0,
+               help='Maximum rate to copy snapshots to new volumes at, in '
+                    'MB/s, 0 for unlimited'),
+    cfg.IntOpt('volume_ensure_export_concurrency',
+               default=8,
+               help='Number of exports to recreate at once on startup'),
+    cfg.BoolOpt('volume_reclaim_deferred',
+                default=True,
+                help='Rename deleted volumes and snapshots into a reclaim '
+                     'queue and wipe them in the background, instead of '
+                     'wiping them before the delete returns'),
+    cfg.StrOpt('volume_reclaim_state_path',
+               default='$state_path/volume_reclaim',
+               help='Where the reclaim queue and wipe progress are kept'),
+    cfg.IntOpt('volume_reclaim_chunk_mb',
+               default=64,
+               help='Size of each background wipe write, in MB'),
+    cfg.IntOpt('volume_reclaim_bandwidth_mb',
+               default=0,
+               help='Maximum background wipe rate in MB/s, 0 for unlimited'),
+    cfg.StrOpt('volume_reclaim_ionice',
+               default='-c3',
+               help='ionice arguments for background wipes, -c<class> '
+                    'and optionally -n<level>. Empty to run them at normal '
+                    'io priority'),
+    cfg.BoolOpt('volume_reclaim_discard',
+                default=False,
+                help='Reclaim with blkdiscard instead of zeroing. Only safe '
+                     'on thin provisioned storage that zeroes discarded '
+                     'blocks'),
     ]
 
 FLAGS = flags.FLAGS
 FLAGS.register_opts(volume_opts)
 
+# Prefix given to logical volumes parked in the reclaim queue
+RECLAIM_PREFIX = 'reclaim-'
+
 
 class VolumeDriver(object):
     """Executes commands relating to Volumes."""
+
+    # Parked volumes awaiting a wipe, keyed by their logical volume name.
+    # None until this driver has parked a volume or found a queue left
+    # over from a previous run.
+    _reclaim_queue = None
+    _reclaim_current = None
+    _reclaimer = None
+
     def __init__(self, execute=utils.execute, *args, **kwargs):
         # NOTE(vish): db is set by Manager
         self.db = None
@@ -110,10 +167,14 @@ class VolumeDriver(object):
         self._try_execute('lvcreate', '-L', sizestr, '-n',
                           volume_name, FLAGS.volume_group, run_as_root=True)
 
-    def _copy_volume(self, srcstr, deststr, size_in_g):
-        self._execute('dd', 'if=%s' % srcstr, 'of=%s' % deststr,
-                      'count=%d' % (size_in_g * 1024), 'bs=1M',
-                      run_as_root=True)
+    def _copy_volume(self, srcstr, deststr, size_in_g, sparse=None):
+        if sparse is None:
+            sparse = FLAGS.volume_copy_sparse
+        utils.copy_volume(srcstr, deststr, int(size_in_g) * 1024,
+                          sparse=sparse,
+                          ionice=FLAGS.volume_copy_ionice,
+                          bandwidth_mb=FLAGS.volume_copy_bandwidth_mb,
+                          executor=self._execute)
 
     def _volume_not_present(self, volume_name):
         path_name = '%s/%s' % (FLAGS.volume_group, volume_name)
@@ -124,11 +185,19 @@ class VolumeDriver(object):
             return True
         return False
 
-    def _delete_volume(self, volume, size_in_g):
+    def _delete_volume(self, volume, size_in_g, is_snapshot=False):
         """Deletes a logical volume."""
+        if FLAGS.volume_reclaim_deferred:
+            self._park_volume(volume, size_in_g, is_snapshot)
+            return
+
         # zero out old volumes to prevent data leaking between users
-        # TODO(ja): reclaiming space should be done lazy and low priority
-        self._copy_volume('/dev/zero', self.local_path(volume), size_in_g)
+        path = self.local_path(volume)
+        if is_snapshot:
+            # Zeroing the snapshot itself would trigger COW, so zero its
+            # exception store instead
+            path += '-cow'
+        self._copy_volume('/dev/zero', path, size_in_g, sparse=False)
         self._try_execute('lvremove', '-f', "%s/%s" %
                           (FLAGS.volume_group,
                            self._escape_snapshot(volume['name'])),
@@ -139,6 +208,168 @@ class VolumeDriver(object):
             return '100M'
         return '%sG' % size_in_g
 
+    def _load_reclaim_queue(self):
+        """Load the volumes parked by a previous run, if any."""
+        if self._reclaim_queue is not None:
+            return
+        state_path = FLAGS.volume_reclaim_state_path
+        if not os.path.isdir(state_path):
+            return
+        queue = {}
+        for name in os.listdir(state_path):
+            if not name.startswith(RECLAIM_PREFIX):
+                continue
+            try:
+                with open(os.path.join(state_path, name)) as f:
+                    queue[name] = jsonutils.loads(f.read())
+            except (IOError, ValueError):
+                LOG.exception(_("Ignoring unreadable reclaim entry %s"), name)
+        self._reclaim_queue = queue
+
+    def _save_reclaim_entry(self, name, entry):
+        state_path = FLAGS.volume_reclaim_state_path
+        if not os.path.isdir(state_path):
+            os.makedirs(state_path)
+        path = os.path.join(state_path, name)
+        with open(path + '.tmp', 'w') as f:
+            f.write(jsonutils.dumps(entry))
+        os.rename(path + '.tmp', path)
+
+    def _drop_reclaim_entry(self, name):
+        self._reclaim_queue.pop(name, None)
+        utils.delete_if_exists(
+            os.path.join(FLAGS.volume_reclaim_state_path, name))
+
+    def _park_volume(self, volume, size_in_g, is_snapshot, snapshots=None):
+        """Rename a deleted volume into the reclaim queue.
+
+        The entry is saved before the rename so that a crash in between
+        leaves nothing behind that the reclaimer does not know about.
+        An origin is not reclaimed until its parked snapshots are gone.
+        """
+        self._load_reclaim_queue()
+        if self._reclaim_queue is None:
+            self._reclaim_queue = {}
+
+        lv_name = self._escape_snapshot(volume['name'])
+        parked = RECLAIM_PREFIX + lv_name
+        size_mb = int(size_in_g) * 1024 or 100
+        entry = {'size_mb': size_mb,
+                 'wiped_mb': 0,
+                 'snapshot': is_snapshot,
+                 'snapshots': snapshots or [],
+                 'parked_at': time.time()}
+        self._save_reclaim_entry(parked, entry)
+        try:
+            self._try_execute('lvrename', FLAGS.volume_group, lv_name,
+                              parked, run_as_root=True)
+        except Exception:
+            utils.delete_if_exists(
+                os.path.join(FLAGS.volume_reclaim_state_path, parked))
+            raise
+        self._reclaim_queue[parked] = entry
+        LOG.info(_("Parked %(lv_name)s as %(parked)s for reclaim") % locals())
+        self._start_reclaimer()
+
+    def _start_reclaimer(self):
+        if self._reclaimer is None and self._reclaim_queue:
+            self._reclaimer = greenthread.spawn(self._reclaim_parked)
+
+    def _next_parked(self, skip):
+        names = []
+        for name, entry in self._reclaim_queue.iteritems():
+            if name in skip:
+                continue
+            if [s for s in entry.get('snapshots', [])
+                if s in self._reclaim_queue]:
+                continue
+            names.append(name)
+        if not names:
+            return None
+        return min(names, key=lambda n: self._reclaim_queue[n]['parked_at'])
+
+    def _reclaim_parked(self):
+        """Wipe and remove parked volumes, oldest first.
+
+        A volume that fails is left in the queue and retried when the
+        reclaimer next starts.
+        """
+        failed = set()
+        try:
+            while True:
+                name = self._next_parked(failed)
+                if name is None:
+                    break
+                self._reclaim_current = name
+                try:
+                    self._reclaim_volume(name)
+                except Exception:
+                    LOG.exception(_("Failed to reclaim %s"), name)
+                    failed.add(name)
+                finally:
+                    self._reclaim_current = None
+        finally:
+            self._reclaimer = None
+
+    def _reclaim_volume(self, name):
+        entry = self._reclaim_queue[name]
+        if self._volume_not_present(name):
+            LOG.warn(_("Parked volume %s is gone, dropping it"), name)
+            self._drop_reclaim_entry(name)
+            return
+
+        if FLAGS.volume_reclaim_discard:
+            self._execute('blkdiscard', self.local_path({'name': name}),
+                          run_as_root=True)
+        else:
+            self._wipe_parked(name, entry)
+        self._try_execute('lvremove', '-f',
+                          '%s/%s' % (FLAGS.volume_group, name),
+                          run_as_root=True)
+        self._drop_reclaim_entry(name)
+        LOG.info(_("Reclaimed %s"), name)
+
+    def _wipe_parked(self, name, entry):
+        """Zero a parked volume in chunks, saving progress as we go."""
+        path = self.local_path({'name': name})
+        if entry['snapshot']:
+            # Zero the snapshot's exception store directly.  Writing
+            # through the snapshot would first copy origin chunks into it.
+            path += '-cow'
+
+        def _save_progress(wiped_mb):
+            entry['wiped_mb'] = wiped_mb
+            self._save_reclaim_entry(name, entry)
+
+        utils.copy_volume(
+                '/dev/zero', path, entry['size_mb'],
+                offset_mb=entry['wiped_mb'],
+                chunk_mb=FLAGS.volume_reclaim_chunk_mb,
+                ionice=FLAGS.volume_reclaim_ionice,
+                bandwidth_mb=FLAGS.volume_reclaim_bandwidth_mb,
+                progress_callback=_save_progress,
+                executor=self._execute)
+
+    def _parked_snapshots_of(self, volume_name):
+        """Return the snapshots of a volume if they are all parked.
+
+        Returns an empty list if the volume has no snapshots or some of
+        them are not parked.
+        """
+        out, err = self._execute('lvs', '--noheadings',
+                                 '-o', 'lv_name,origin',
+                                 FLAGS.volume_group, run_as_root=True)
+        snapshots = []
+        for line in (out or '').splitlines():
+            fields = line.split()
+            if len(fields) == 2 and fields[1] == volume_name:
+                snapshots.append(fields[0])
+        if not self._reclaim_queue:
+            return []
+        if [n for n in snapshots if n not in self._reclaim_queue]:
+            return []
+        return snapshots
+
     # Linux LVM reserves name that starts with snapshot, so that
     # such volume name can't be created. Mangle it.
     def _escape_snapshot(self, snapshot_name):
@@ -174,7 +405,14 @@ class VolumeDriver(object):
         if out:
             out = out.strip()
             if (out[0] == 'o') or (out[0] == 'O'):
-                raise exception.VolumeIsBusy(volume_name=volume['name'])
+                # Parked snapshots must be removed before their origin
+                # can be, so park the origin behind them rather than fail.
+                snapshots = self._parked_snapshots_of(volume['name'])
+                if not snapshots:
+                    raise exception.VolumeIsBusy(volume_name=volume['name'])
+                self._park_volume(volume, volume['size'], False,
+                                  snapshots=snapshots)
+                return
 
         self._delete_volume(volume, volume['size'])
 
@@ -192,9 +430,8 @@ class VolumeDriver(object):
             # If the snapshot isn't present, then don't attempt to delete
             return True
 
-        # TODO(yamahata): zeroing out the whole snapshot triggers COW.
-        # it's quite slow.
-        self._delete_volume(snapshot, snapshot['volume_size'])
+        self._delete_volume(snapshot, snapshot['volume_size'],
+                            is_snapshot=True)
 
     def local_path(self, volume):
         # NOTE(vish): stops deprecation warning
@@ -206,6 +443,26 @@ class VolumeDriver(object):
         """Synchronously recreates an export for a logical volume."""
         raise NotImplementedError()
 
+    def ensure_exports(self, context, volumes):
+        """Recreates the exports for a list of volumes, a few at a time.
+
+        Returns the number of volumes ensure_export was run for.  A
+        volume that fails is logged and does not stop the others.
+        """
+        def _ensure_export(volume):
+            try:
+                self.ensure_export(context, volume)
+            except Exception:
+                LOG.exception(_("volume %s: failed to ensure export"),
+                              volume['name'])
+
+        pool = greenpool.GreenPool(
+                max(FLAGS.volume_ensure_export_concurrency, 1))
+        for volume in volumes:
+            pool.spawn_n(_ensure_export, volume)
+        pool.waitall()
+        return len(volumes)
+
     def create_export(self, context, volume):
         """Exports the volume. Can optionally return a Dictionary of changes
         to the volume object to be persisted."""
@@ -232,9 +489,18 @@ class VolumeDriver(object):
            True, run the update first."""
         return None
 
+    def get_reclaim_stats(self):
+        """Return how much parked space is still waiting to be wiped."""
+        queue = (self._reclaim_queue or {}).values()
+        return {'reclaim_queue_depth': len(queue),
+                'reclaim_queue_mb': sum(e['size_mb'] - e['wiped_mb']
+                                        for e in queue)}
+
     def do_setup(self, context):
         """Any initialization the volume driver does while starting"""
-        pass
+        # Resume wiping anything parked before we were restarted
+        self._load_reclaim_queue()
+        self._start_reclaimer()
 
 
 class ISCSIDriver(VolumeDriver):
@@ -277,6 +543,19 @@ class ISCSIDriver(VolumeDriver):
         self.tgtadm.create_iscsi_target(iscsi_name, iscsi_target,
                 0, volume_path, check_exit_code=False)
 
+    def ensure_exports(self, context, volumes):
+        """Recreates only the exports the target daemon does not have."""
+        try:
+            exported = self.tgtadm.get_targets()
+        except exception.ProcessExecutionError:
+            LOG.exception(_("Could not list iscsi targets"))
+            exported = None
+        if exported:
+            volumes = [v for v in volumes
+                       if "%s%s" % (FLAGS.iscsi_target_prefix, v['name'])
+                       not in exported]
+        return super(ISCSIDriver, self).ensure_exports(context, volumes)
+
     def _ensure_iscsi_targets(self, context, host):
         """Ensure that target ids have been created in datastore."""
         host_iscsi_targets = self.db.iscsi_target_count_by_host(context, host)
@@ -79,6 +79,11 @@ class TargetAdmin(object):
         """Query the given target ID."""
         raise NotImplementedError()
 
+    def get_targets(self):
+        """Return the names of the targets that have a logical unit
+        exported, or None if they cannot be listed."""
+        return None
+
     def _new_logicalunit(self, tid, lun, path, **kwargs):
         """Create a new LUN on a target using the supplied path."""
         raise NotImplementedError()
@@ -148,6 +153,22 @@ class TgtAdm(TargetAdmin):
                   '--tid=%s' % tid,
                   **kwargs)
 
+    def get_targets(self):
+        out, _err = self._execute(self._cmd, '--op', 'show',
+                                  '--lld=iscsi', '--mode=target',
+                                  run_as_root=True)
+        targets = set()
+        name = None
+        for line in (out or '').splitlines():
+            line = line.strip()
+            if line.startswith('Target '):
+                name = line.split(': ', 1)[-1]
+            elif line.startswith('LUN: ') and name:
+                # LUN 0 is the controller, which every target has
+                if line[len('LUN: '):] != '0':
+                    targets.add(name)
+        return targets
+
 
 class IetAdm(TargetAdmin):
     """iSCSI target administration using ietadm."""
@@ -180,6 +201,25 @@ class IetAdm(TargetAdmin):
                   '--tid=%s' % tid,
                   **kwargs)
 
+    def get_targets(self):
+        try:
+            with open('/proc/net/iet/volume') as f:
+                lines = f.readlines()
+        except IOError:
+            return None
+        targets = set()
+        name = None
+        for line in lines:
+            fields = line.split()
+            if line.startswith('tid:'):
+                name = None
+                for field in fields:
+                    if field.startswith('name:'):
+                        name = field[len('name:'):]
+            elif fields and fields[0].startswith('lun:') and name:
+                targets.add(name)
+        return targets
+
     def _new_logicalunit(self, tid, lun, path, **kwargs):
         self._run('--op', 'new',
                   '--tid=%s' % tid,
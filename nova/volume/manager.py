@@ -38,6 +38,8 @@ intact.
 
 """
 
+import time
+
 from nova import context
 from nova import exception
 from nova import flags
@@ -99,12 +101,20 @@ class VolumeManager(manager.SchedulerDependentManager):
 
         volumes = self.db.volume_get_all_by_host(ctxt, self.host)
         LOG.debug(_("Re-exporting %s volumes"), len(volumes))
+        exports = []
         for volume in volumes:
             if volume['status'] in ['available', 'in-use']:
-                self.driver.ensure_export(ctxt, volume)
+                exports.append(volume)
             else:
                 LOG.info(_("volume %s: skipping export"), volume['name'])
 
+        start = time.time()
+        recreated = self.driver.ensure_exports(ctxt, exports)
+        LOG.info(_("Ensured %(total)d exports, recreating %(recreated)d, "
+                   "in %(elapsed).2f seconds") %
+                 {'total': len(exports), 'recreated': recreated,
+                  'elapsed': time.time() - start})
+
     def create_volume(self, context, volume_id, snapshot_id=None,
                       reservations=None):
         """Creates and exports the volume."""
@@ -343,6 +353,7 @@ class VolumeManager(manager.SchedulerDependentManager):
     def _report_driver_status(self, context):
         volume_stats = self.driver.get_volume_stats(refresh=True)
         if volume_stats:
+            volume_stats.update(self.driver.get_reclaim_stats())
             LOG.info(_("Checking volume capabilities"))
 
             if self._volume_stats_changed(self._last_volume_stats,
@@ -35,7 +35,8 @@ def _rename(src, dst):
     os.rename(src, dst)
 
 
-def make_subprocess(cmdline, stdout=False, stderr=False, stdin=False):
+def make_subprocess(cmdline, stdout=False, stderr=False, stdin=False,
+                    env=None):
     """Make a subprocess according to the given command-line string
     """
     # NOTE(dprince): shlex python 2.4 doesn't like unicode so we
@@ -46,6 +47,9 @@ def make_subprocess(cmdline, stdout=False, stderr=False, stdin=False):
     kwargs['stdout'] = stdout and subprocess.PIPE or None
     kwargs['stderr'] = stderr and subprocess.PIPE or None
     kwargs['stdin'] = stdin and subprocess.PIPE or None
+    if env:
+        kwargs['env'] = os.environ.copy()
+        kwargs['env'].update(env)
     args = shlex.split(cmdline)
     logging.info("Running args '%s'" % args)
     proc = subprocess.Popen(args, **kwargs)
@@ -316,16 +320,42 @@ def prepare_staging_area(sr_path, staging_path, vdi_uuids, seq_num=0):
         seq_num += 1
 
 
-def create_tarball(fileobj, path, callback=None):
+def _find_executable(name):
+    for directory in os.environ.get('PATH', '/usr/bin:/bin').split(':'):
+        path = os.path.join(directory, name)
+        if os.path.isfile(path) and os.access(path, os.X_OK):
+            return path
+    return None
+
+
+def _tar_compress_args():
+    """Return the tar arguments selecting the gzip implementation.
+
+    pigz writes and reads the same format as gzip but compresses on all of
+    dom0's CPUs, so it is used whenever it is installed.
+    """
+    pigz = _find_executable('pigz')
+    if pigz:
+        return "--use-compress-program=%s" % pigz
+    return "-z"
+
+
+def create_tarball(fileobj, path, callback=None, compression_level=None):
     """Create a tarball from a given path.
 
     :param fileobj: a file-like object holding the tarball byte-stream.
                     If None, then only the callback will be used.
     :param path: path to create tarball from
     :param callback: optional callback to call on each chunk written
+    :param compression_level: optional gzip compression level, 1-9
     """
-    tar_cmd = "tar -zc --directory=%(path)s ." % locals()
-    tar_proc = make_subprocess(tar_cmd, stdout=True, stderr=True)
+    compress_args = _tar_compress_args()
+    tar_cmd = "tar -c %(compress_args)s --directory=%(path)s ." % locals()
+    env = None
+    if compression_level is not None:
+        # Both gzip and pigz take default options from $GZIP
+        env = {'GZIP': '-%d' % int(compression_level)}
+    tar_proc = make_subprocess(tar_cmd, stdout=True, stderr=True, env=env)
 
     while True:
         chunk = tar_proc.stdout.read(CHUNK_SIZE)
@@ -348,7 +378,8 @@ def extract_tarball(fileobj, path, callback=None):
     :param path: path to extract tarball into
     :param callback: optional callback to call on each chunk read
     """
-    tar_cmd = "tar -zx --directory=%(path)s" % locals()
+    compress_args = _tar_compress_args()
+    tar_cmd = "tar -x %(compress_args)s --directory=%(path)s" % locals()
     tar_proc = make_subprocess(tar_cmd, stderr=True, stdin=True)
 
     while True:
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack LLC.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Microbenchmark of rpc cast throughput with the kombu driver.
+
+Casts are sent through the in-memory kombu transport, so no broker is
+needed.  Each run is done twice: once with the publisher cache and the
+declared-exchange registry disabled (which is how every cast used to
+behave) and once with them enabled.  Exchange declarations are counted
+since each one is a broker round trip on a real transport.
+
+Run like:
+
+    ./tools/benchmarks/rpc_kombu_cast.py --casts 20000 --topics 10
+"""
+
+import optparse
+import os
+import sys
+import time
+
+POSSIBLE_TOPDIR = os.path.normpath(os.path.join(os.path.abspath(sys.argv[0]),
+                                   os.pardir, os.pardir, os.pardir))
+if os.path.exists(os.path.join(POSSIBLE_TOPDIR, 'nova', '__init__.py')):
+    sys.path.insert(0, POSSIBLE_TOPDIR)
+
+import kombu.entity
+
+from nova import context
+from nova import flags
+from nova.openstack.common.rpc import impl_kombu
+
+
+FLAGS = flags.FLAGS
+
+
+class DeclareCounter(object):
+    """Counts calls to kombu.entity.Exchange.declare."""
+
+    def __init__(self):
+        self.count = 0
+        self._orig = kombu.entity.Exchange.declare
+
+    def __enter__(self):
+        counter = self
+
+        def declare(exchange, *args, **kwargs):
+            counter.count += 1
+            return counter._orig(exchange, *args, **kwargs)
+
+        kombu.entity.Exchange.declare = declare
+        return self
+
+    def __exit__(self, *exc_info):
+        kombu.entity.Exchange.declare = self._orig
+
+
+def _uncached_publisher_send(orig):
+    """Make every cast build and declare its publisher from scratch."""
+    def publisher_send(conn, *args, **kwargs):
+        conn.publishers = {}
+        conn.declared = set()
+        return orig(conn, *args, **kwargs)
+    return publisher_send
+
+
+def run(ctxt, casts, topics, cached):
+    orig = impl_kombu.Connection.publisher_send
+    if not cached:
+        impl_kombu.Connection.publisher_send = _uncached_publisher_send(orig)
+    impl_kombu.Connection.pool = None
+    try:
+        msg = {'method': 'bench', 'args': {'value': 'x' * 64}}
+        # Warm up the connection pool outside of the timed loop
+        impl_kombu.cast(FLAGS, ctxt, 'bench.0', msg)
+        with DeclareCounter() as counter:
+            start = time.time()
+            for i in xrange(casts):
+                impl_kombu.cast(FLAGS, ctxt, 'bench.%d' % (i % topics), msg)
+            elapsed = time.time() - start
+    finally:
+        impl_kombu.Connection.publisher_send = orig
+        impl_kombu.cleanup()
+    return elapsed, counter.count
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--casts', type='int', default=10000,
+                      help='number of casts per run')
+    parser.add_option('--topics', type='int', default=10,
+                      help='number of distinct topics to cast to')
+    options, _args = parser.parse_args()
+
+    flags.parse_args([sys.argv[0]], default_config_files=[])
+    FLAGS.set_override('fake_rabbit', True)
+    ctxt = context.get_admin_context()
+
+    print '%-10s %12s %12s %16s' % ('publishers', 'seconds', 'casts/s',
+                                    'declares/cast')
+    for cached in (False, True):
+        elapsed, declares = run(ctxt, options.casts, options.topics, cached)
+        print '%-10s %12.3f %12.0f %16.3f' % (
+                cached and 'cached' or 'uncached', elapsed,
+                options.casts / elapsed, float(declares) / options.casts)
+
+
+if __name__ == '__main__':
+    main()
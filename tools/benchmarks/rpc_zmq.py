@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack LLC.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Benchmark of the ZeroMQ rpc driver over ipc:// endpoints.
+
+A local responder thread stands in for both the remote consumer and
+the reply proxy.  It pulls casts from an ipc socket and publishes a
+reply for every call on the local reply endpoint, so no proxy, broker
+or network service is needed.
+
+Cast throughput is measured with the outbound socket pool disabled
+(a new socket per cast) and enabled.  Call latency is measured through
+the shared reply subscriber.
+
+Run like:
+
+    ./tools/benchmarks/rpc_zmq.py --casts 5000 --calls 1000
+"""
+
+import eventlet
+eventlet.monkey_patch()
+
+import optparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+POSSIBLE_TOPDIR = os.path.normpath(os.path.join(os.path.abspath(sys.argv[0]),
+                                   os.pardir, os.pardir, os.pardir))
+if os.path.exists(os.path.join(POSSIBLE_TOPDIR, 'nova', '__init__.py')):
+    sys.path.insert(0, POSSIBLE_TOPDIR)
+
+from eventlet.green import zmq
+
+from nova import context
+from nova import flags
+from nova.openstack.common import rpc  # registers the rpc timeouts
+from nova.openstack.common.rpc import impl_zmq
+
+
+FLAGS = flags.FLAGS
+
+
+def responder(in_addr, reply_addr):
+    """Consume casts, and publish a reply to each call."""
+    inq = impl_zmq.ZmqSocket(in_addr, zmq.PULL, bind=True)
+    outq = impl_zmq.ZmqSocket(reply_addr, zmq.PUB, bind=True)
+    try:
+        while True:
+            _msg_id, _topic, _style, data = inq.recv()
+            _ctx, request = impl_zmq._deserialize(data)
+            if request['method'] == '-reply':
+                msg_id = request['args']['msg_id']
+                outq.send([str(msg_id), impl_zmq._serialize([True])])
+    finally:
+        inq.close()
+        outq.close()
+
+
+def bench_casts(ctxt, addr, casts, pool_size):
+    FLAGS.set_override('rpc_zmq_client_pool_size', pool_size)
+    msg = {'method': 'bench', 'args': {'value': 'x' * 64}}
+    start = time.time()
+    for i in xrange(casts):
+        impl_zmq._cast(addr, ctxt, 'bench', 'bench', msg)
+    return time.time() - start
+
+
+def bench_calls(ctxt, addr, calls):
+    msg = {'method': 'bench', 'args': {}}
+    latencies = []
+    for i in xrange(calls):
+        start = time.time()
+        impl_zmq._call(addr, ctxt, 'bench', 'bench', msg)
+        latencies.append(time.time() - start)
+    latencies.sort()
+    return latencies
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--casts', type='int', default=5000,
+                      help='number of casts per run')
+    parser.add_option('--calls', type='int', default=1000,
+                      help='number of calls')
+    options, _args = parser.parse_args()
+
+    flags.parse_args([sys.argv[0]], default_config_files=[])
+    ipc_dir = tempfile.mkdtemp()
+    FLAGS.set_override('rpc_zmq_ipc_dir', ipc_dir)
+    impl_zmq.register_opts(FLAGS)
+    ctxt = context.get_admin_context()
+
+    addr = 'ipc://%s/bench' % ipc_dir
+    thread = eventlet.spawn(responder, addr,
+                            'ipc://%s/zmq_topic_zmq_replies' % ipc_dir)
+    try:
+        # Let the responder bind, and let the reply subscription settle
+        # before any reply is published.
+        eventlet.sleep(0.1)
+        impl_zmq.reply_waiter.listen('warmup')
+        eventlet.sleep(0.5)
+        impl_zmq.reply_waiter.unlisten('warmup')
+
+        print '%-10s %12s %12s' % ('sockets', 'seconds', 'casts/s')
+        for name, pool_size in (('new', 0), ('pooled', 8)):
+            elapsed = bench_casts(ctxt, addr, options.casts, pool_size)
+            print '%-10s %12.3f %12.0f' % (name, elapsed,
+                                           options.casts / elapsed)
+        print 'pool: %s' % impl_zmq.client_pool.get_stats()
+
+        latencies = bench_calls(ctxt, addr, options.calls)
+        count = len(latencies)
+        print 'calls: %d  mean %.3fms  p50 %.3fms  p99 %.3fms' % (
+                count, sum(latencies) / count * 1000,
+                latencies[count / 2] * 1000,
+                latencies[min(count - 1, count * 99 / 100)] * 1000)
+    finally:
+        thread.kill()
+        impl_zmq.cleanup()
+        shutil.rmtree(ipc_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
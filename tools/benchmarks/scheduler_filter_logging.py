@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack LLC.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Microbenchmark of scheduler host filtering with debug logging disabled.
+
+The default filters are run over a set of fake hosts with the log level at
+INFO, which is how most schedulers are deployed.  Each run is done twice:
+once with ContextAdapter using the logging.LoggerAdapter methods, which
+build the context and instance information of every record before the
+level is checked, and once with its own methods which check the level
+first.
+
+Run like:
+
+    ./tools/benchmarks/scheduler_filter_logging.py --hosts 1000 --runs 50
+"""
+
+import logging
+import optparse
+import os
+import sys
+import time
+
+POSSIBLE_TOPDIR = os.path.normpath(os.path.join(os.path.abspath(sys.argv[0]),
+                                   os.pardir, os.pardir, os.pardir))
+if os.path.exists(os.path.join(POSSIBLE_TOPDIR, 'nova', '__init__.py')):
+    sys.path.insert(0, POSSIBLE_TOPDIR)
+
+from nova import context
+from nova import flags
+from nova.openstack.common import log
+from nova.openstack.common import timeutils
+from nova.scheduler import host_manager
+
+
+FLAGS = flags.FLAGS
+
+
+# logging.LoggerAdapter methods process each record before the level check
+EAGER_METHODS = ('debug', 'info', 'warning', 'error')
+LAZY_METHODS = dict((name, log.ContextAdapter.__dict__[name])
+                    for name in EAGER_METHODS)
+
+
+def make_hosts(count):
+    service = {'disabled': False,
+               'updated_at': timeutils.utcnow(),
+               'created_at': timeutils.utcnow()}
+    capabilities = {'compute': {'enabled': True}}
+    hosts = []
+    for i in xrange(count):
+        host = host_manager.HostState('host%d' % i, 'compute',
+                                      capabilities=capabilities,
+                                      service=service)
+        host.update_from_compute_node({'local_gb': 1024,
+                                       'memory_mb': 1024 * (i % 64),
+                                       'vcpus': 16})
+        hosts.append(host)
+    return hosts
+
+
+def run(manager, hosts, filter_properties, runs):
+    start = time.time()
+    for i in xrange(runs):
+        passed = manager.filter_hosts(hosts, filter_properties)
+    return time.time() - start, len(passed)
+
+
+def use_eager_methods(eager):
+    """Switch ContextAdapter to or back from the LoggerAdapter methods."""
+    for name in EAGER_METHODS:
+        if eager:
+            method = getattr(logging.LoggerAdapter, name)
+        else:
+            method = LAZY_METHODS[name]
+        setattr(log.ContextAdapter, name, method)
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--hosts', type='int', default=1000,
+                      help='number of hosts to filter')
+    parser.add_option('--runs', type='int', default=50,
+                      help='number of times the hosts are filtered')
+    options, _args = parser.parse_args()
+
+    flags.parse_args([sys.argv[0]], default_config_files=[])
+    logging.getLogger().setLevel(logging.INFO)
+
+    ctxt = context.get_admin_context()
+    filter_properties = {'context': ctxt,
+                         'instance_type': {'memory_mb': 2048,
+                                           'extra_specs': {}},
+                         'request_spec': {'instance_properties': {}},
+                         'retry': {'num_attempts': 1, 'hosts': []}}
+    hosts = make_hosts(options.hosts)
+
+    print '%-8s %12s %14s %8s' % ('adapter', 'seconds', 'us/host/run',
+                                  'passed')
+    manager = host_manager.HostManager()
+    for name in ('eager', 'lazy'):
+        use_eager_methods(name == 'eager')
+        try:
+            elapsed, passed = run(manager, hosts, filter_properties,
+                                  options.runs)
+        finally:
+            use_eager_methods(False)
+
+        per_host = elapsed * 1000000 / (options.hosts * options.runs)
+        print '%-8s %12.3f %14.2f %8d' % (name, elapsed, per_host, passed)
+
+
+if __name__ == '__main__':
+    main()
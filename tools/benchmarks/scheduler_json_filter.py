@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack LLC.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Microbenchmark of JsonFilter over a set of fake hosts.
+
+The query hint is evaluated for every host twice: once the way JsonFilter
+used to, parsing the JSON and walking the query for each host, and once
+with the query compiled when the filter is prepared for the request.
+
+Run like:
+
+    ./tools/benchmarks/scheduler_json_filter.py --hosts 1000 --runs 50
+"""
+
+import optparse
+import os
+import sys
+import time
+
+POSSIBLE_TOPDIR = os.path.normpath(os.path.join(os.path.abspath(sys.argv[0]),
+                                   os.pardir, os.pardir, os.pardir))
+if os.path.exists(os.path.join(POSSIBLE_TOPDIR, 'nova', '__init__.py')):
+    sys.path.insert(0, POSSIBLE_TOPDIR)
+
+from nova.openstack.common import jsonutils
+from nova.scheduler import filters
+from nova.scheduler.filters import json_filter
+from nova.scheduler import host_manager
+
+
+QUERY = jsonutils.dumps(
+        ['and',
+            ['>=', '$free_ram_mb', 1024],
+            ['>=', '$free_disk_mb', 20 * 1024],
+            ['or',
+                ['=', '$capabilities.hypervisor_type', 'xen'],
+                ['=', '$capabilities.hypervisor_type', 'kvm']],
+            ['not', ['in', '$host', 'host1', 'host2', 'host3']]])
+
+
+class LegacyJsonFilter(json_filter.JsonFilter):
+    """JsonFilter interpreting the query for each host."""
+
+    def _parse_string(self, string, host_state):
+        if not string:
+            return None
+        if not string.startswith("$"):
+            return string
+
+        path = string[1:].split(".")
+        obj = getattr(host_state, path[0], None)
+        if obj is None:
+            return None
+        for item in path[1:]:
+            obj = obj.get(item, None)
+            if obj is None:
+                return None
+        return obj
+
+    def _process_filter(self, query, host_state):
+        if not query:
+            return True
+        cmd = query[0]
+        method = self.commands[cmd]
+        cooked_args = []
+        for arg in query[1:]:
+            if isinstance(arg, list):
+                arg = self._process_filter(arg, host_state)
+            elif isinstance(arg, basestring):
+                arg = self._parse_string(arg, host_state)
+            if arg is not None:
+                cooked_args.append(arg)
+        return method(self, cooked_args)
+
+    def prepare(self, filter_request, hosts):
+        pass
+
+    def host_passes(self, host_state, filter_properties):
+        query = filter_properties['scheduler_hints']['query']
+        result = self._process_filter(jsonutils.loads(query), host_state)
+        if isinstance(result, list):
+            result = any(result)
+        return bool(result)
+
+
+def make_hosts(count):
+    hosts = []
+    for i in xrange(count):
+        capabilities = {'compute': {'enabled': True,
+                                    'hypervisor_type': ('xen', 'kvm',
+                                                        'qemu')[i % 3]}}
+        host = host_manager.HostState('host%d' % i, 'compute',
+                                      capabilities=capabilities)
+        host.update_from_compute_node({'local_gb': 10 * (i % 8),
+                                       'memory_mb': 512 * (i % 8),
+                                       'vcpus': 16})
+        hosts.append(host)
+    return hosts
+
+
+def run(filter_cls, hosts, filter_properties, runs):
+    start = time.time()
+    for i in xrange(runs):
+        filter_obj = filter_cls()
+        filter_obj.prepare(filters.FilterRequest(filter_properties), hosts)
+        passed = [host for host in hosts
+                  if filter_obj.host_passes(host, filter_properties)]
+    return time.time() - start, len(passed)
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--hosts', type='int', default=1000,
+                      help='number of hosts to filter')
+    parser.add_option('--runs', type='int', default=50,
+                      help='number of times the hosts are filtered')
+    options, _args = parser.parse_args()
+
+    filter_properties = {'scheduler_hints': {'query': QUERY}}
+    hosts = make_hosts(options.hosts)
+
+    print '%-10s %12s %14s %8s' % ('filter', 'seconds', 'us/host/run',
+                                   'passed')
+    for name, filter_cls in (('legacy', LegacyJsonFilter),
+                             ('compiled', json_filter.JsonFilter)):
+        elapsed, passed = run(filter_cls, hosts, filter_properties,
+                              options.runs)
+        per_host = elapsed * 1000000 / (options.hosts * options.runs)
+        print '%-10s %12.3f %14.2f %8d' % (name, elapsed, per_host, passed)
+
+
+if __name__ == '__main__':
+    main()
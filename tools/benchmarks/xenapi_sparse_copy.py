@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 OpenStack LLC.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Benchmark of the xenapi sparse copy used when resizing disks down.
+
+A source image is built with the requested fraction of random data, the
+rest being zeros (either written out or left as holes).  It is copied
+with the old 4 KB read/compare loop and with vm_utils._sparse_copy, the
+two copies are checked against each other and the throughput of each is
+reported.
+
+With --loop the source is attached to a loop device first (needs root),
+which is closer to the partition devices the copy reads on a real host
+and hides the holes of the backing file from SEEK_DATA/SEEK_HOLE.
+
+Run like:
+
+    ./tools/benchmarks/xenapi_sparse_copy.py --size-mb 1024 --data-pct 25
+"""
+
+import hashlib
+import optparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+POSSIBLE_TOPDIR = os.path.normpath(os.path.join(os.path.abspath(sys.argv[0]),
+                                   os.pardir, os.pardir, os.pardir))
+if os.path.exists(os.path.join(POSSIBLE_TOPDIR, 'nova', '__init__.py')):
+    sys.path.insert(0, POSSIBLE_TOPDIR)
+
+from nova import flags
+from nova.virt.xenapi import vm_utils
+
+
+MB = 1024 * 1024
+
+
+def legacy_sparse_copy(src_path, dst_path, virtual_size, block_size=4096):
+    """The block at a time copy loop _sparse_copy used to run."""
+    EMPTY_BLOCK = '\0' * block_size
+    left = virtual_size
+    with open(src_path, "r") as src:
+        with open(dst_path, "w") as dst:
+            data = src.read(min(block_size, left))
+            while data:
+                if data == EMPTY_BLOCK:
+                    dst.seek(block_size, os.SEEK_CUR)
+                    left -= block_size
+                else:
+                    dst.write(data)
+                    left -= len(data)
+
+                if left <= 0:
+                    break
+
+                data = src.read(min(block_size, left))
+
+            # The old loop never extended a file ending on zeros
+            dst.truncate(virtual_size)
+
+
+def make_source(path, size_mb, data_pct, holes, extent_mb=1):
+    """Write an image with data_pct percent of random data extents."""
+    rnd = random.Random(size_mb)
+    extents = size_mb / extent_mb
+    data_extents = set(rnd.sample(xrange(extents), extents * data_pct / 100))
+    zeros = '\0' * (extent_mb * MB)
+    with open(path, 'w') as f:
+        for i in xrange(extents):
+            if i in data_extents:
+                f.write(os.urandom(extent_mb * MB))
+            elif holes:
+                f.seek(extent_mb * MB, os.SEEK_CUR)
+            else:
+                f.write(zeros)
+        f.truncate(size_mb * MB)
+
+
+def checksum(path, size):
+    digest = hashlib.md5()
+    with open(path) as f:
+        left = size
+        while left > 0:
+            data = f.read(min(MB, left))
+            if not data:
+                break
+            digest.update(data)
+            left -= len(data)
+    return digest.hexdigest()
+
+
+def drop_caches():
+    try:
+        with open('/proc/sys/vm/drop_caches', 'w') as f:
+            f.write('3\n')
+    except IOError:
+        pass
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--size-mb', type='int', default=256,
+                      help='size of the source image')
+    parser.add_option('--data-pct', type='int', default=25,
+                      help='percentage of the image holding data')
+    parser.add_option('--holes', action='store_true', default=False,
+                      help='leave the zero regions of the source as holes '
+                           'instead of writing them out')
+    parser.add_option('--loop', action='store_true', default=False,
+                      help='read the source through a loop device')
+    parser.add_option('--dir', default=None,
+                      help='directory for the source and copies')
+    options, _args = parser.parse_args()
+
+    flags.parse_args([sys.argv[0]], default_config_files=[])
+
+    tmpdir = tempfile.mkdtemp(dir=options.dir)
+    src_path = os.path.join(tmpdir, 'src')
+    size = options.size_mb * MB
+    make_source(src_path, options.size_mb, options.data_pct, options.holes)
+    expected = checksum(src_path, size)
+
+    loop_dev = None
+    if options.loop:
+        losetup = subprocess.Popen(['losetup', '-f', '--show', src_path],
+                                   stdout=subprocess.PIPE)
+        loop_dev = losetup.communicate()[0].strip()
+        if losetup.returncode:
+            sys.exit('losetup failed for %s' % src_path)
+        src_path = loop_dev
+
+    copies = (('legacy', legacy_sparse_copy),
+              ('sparse_copy', vm_utils._sparse_copy))
+    try:
+        print '%-12s %10s %10s %12s' % ('copy', 'seconds', 'MB/s',
+                                        'dst used MB')
+        for name, copy in copies:
+            dst_path = os.path.join(tmpdir, name)
+            # Stands in for the already attached destination device
+            open(dst_path, 'w').close()
+            drop_caches()
+            start = time.time()
+            copy(src_path, dst_path, size)
+            elapsed = time.time() - start
+
+            if checksum(dst_path, size) != expected:
+                print '%s: copy does not match the source' % name
+                sys.exit(1)
+            used = os.stat(dst_path).st_blocks * 512.0 / MB
+            print '%-12s %10.3f %10.1f %12.1f' % (
+                    name, elapsed, options.size_mb / elapsed, used)
+            os.unlink(dst_path)
+    finally:
+        if loop_dev:
+            subprocess.call(['losetup', '-d', loop_dev])
+        for name in os.listdir(tmpdir):
+            os.unlink(os.path.join(tmpdir, name))
+        os.rmdir(tmpdir)
+
+
+if __name__ == '__main__':
+    main()